@@ -0,0 +1,359 @@
+"""
+Modelo analítico - Trener
+Agregados del historial construidos en una sola pasada sobre `gimnasio` y
+actualizados en cada escritura: totales, conteos por tipo y grupo muscular,
+apariciones de cada ejercicio, PRs y 1RM. Lo comparten los endpoints de
+estadísticas, progreso, métricas y logros y las herramientas MCP, así todos
+usan las mismas reglas de normalización:
+
+- Ejercicio: se agrupa por nombre.strip().lower() y se muestra el nombre
+  tal como se registró.
+- Grupo muscular: strip().lower(); tipo vacío: "otro". Las mismas claves que
+  el rollup semanal (ver normalizacion.grupos_entrenamiento).
+- Peso de una aparición: peso_max (ver normalizacion.metricas_ejercicio).
+
+Es también la única copia en memoria de las apariciones: la búsqueda por
+nombre (sugerencias de peso, progreso por ejercicio) usa el índice de
+nombres de indice_ejercicios.py, que el modelo mantiene junto con ellas.
+
+Vive en el proceso de la API y se actualiza con sus escrituras. Las hechas
+por fuera (otro worker, migraciones.py, otro cliente de la base) se detectan
+en asegurar_cargado(), como mucho cada INTERVALO_REVISION segundos: si cambia
+el número de documentos o aparece un _id que el modelo no tiene, se recarga.
+Una reescritura que no cambia ninguno de los dos se ve al reiniciar.
+"""
+
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+from pymongo import DESCENDING
+from pymongo.collection import Collection
+
+from indice_ejercicios import IndiceEjercicios
+from normalizacion import (
+    clave_ejercicio, grupos_entrenamiento, metricas_ejercicio, series_ejercicio, tipo_entrenamiento
+)
+
+PROYECCION_ANALITICA = {
+    "fecha": 1, "tipo": 1, "grupos_musculares": 1,
+    "ejercicios.nombre": 1, "ejercicios.series": 1, "ejercicios.repeticiones": 1,
+    "ejercicios.peso_kg": 1, "ejercicios.peso_max": 1, "ejercicios.reps_min": 1,
+}
+
+# El 1RM estimado solo es preciso con pocas repeticiones
+MAX_REPS_1RM = 12
+
+# Segundos entre comprobaciones de escrituras hechas fuera del proceso
+INTERVALO_REVISION = 10
+
+
+def calcular_1rm(peso: float, repeticiones: int) -> float:
+    """Calcula el 1RM usando la fórmula de Brzycki"""
+    if repeticiones <= 0 or peso <= 0:
+        return 0
+    if repeticiones == 1:
+        return peso
+    return round(peso * (36 / (37 - repeticiones)), 1)
+
+
+def _orden(ap: dict):
+    return (ap["fecha"], str(ap["entrenamiento_id"]), ap["idx"])
+
+
+class ModeloAnalitico:
+    """Agregados en memoria del historial de gimnasio"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.cargado = False
+        self._revisado = 0.0
+        self._limpiar()
+
+    def _limpiar(self):
+        self._por_tipo: Counter = Counter()
+        self._por_grupo: Counter = Counter()
+        # grupo -> series de los entrenamientos que lo trabajan
+        self._series_grupo: Counter = Counter()
+        self._fechas: Counter = Counter()
+        self._ejercicios = 0
+        self._series = 0
+        # clave de ejercicio -> apariciones (una por ejercicio y entrenamiento)
+        self._apariciones: Dict[str, List[dict]] = defaultdict(list)
+        self._sin_ordenar: set = set()
+        # _id -> aporte del entrenamiento, para restarlo al eliminar
+        self._entrenamientos: Dict[object, dict] = {}
+        # Búsqueda por palabras clave sobre las claves de _apariciones
+        self._nombres = IndiceEjercicios()
+
+    # ---- Mantenimiento ----
+
+    def cargar(self, coleccion: Collection):
+        """Construye el modelo desde cero recorriendo la colección una vez"""
+        with self._lock:
+            self._limpiar()
+            for doc in coleccion.find({}, PROYECCION_ANALITICA):
+                self._agregar(doc)
+            self.cargado = True
+            self._revisado = time.monotonic()
+
+    def asegurar_cargado(self, coleccion: Collection) -> bool:
+        """
+        Carga el modelo si no lo está y lo recarga si `coleccion` cambió por
+        fuera de este proceso (se comprueba cada INTERVALO_REVISION segundos).
+
+        Returns:
+            True si se cargó o recargó
+        """
+        if not self.cargado:
+            self.cargar(coleccion)
+            return True
+        if time.monotonic() - self._revisado < INTERVALO_REVISION:
+            return False
+        self._revisado = time.monotonic()
+        if not self._desactualizado(coleccion):
+            return False
+        self.cargar(coleccion)
+        return True
+
+    def _desactualizado(self, coleccion: Collection) -> bool:
+        """Conteo distinto o un _id más reciente que el modelo no conoce"""
+        total = coleccion.estimated_document_count()
+        ultimo = coleccion.find_one({}, {"_id": 1}, sort=[("_id", DESCENDING)])
+        with self._lock:
+            if total != len(self._entrenamientos):
+                return True
+            return ultimo is not None and ultimo["_id"] not in self._entrenamientos
+
+    def agregar(self, doc: dict):
+        """Suma un entrenamiento recién guardado (con _id)"""
+        with self._lock:
+            self._agregar(doc)
+
+    def _agregar(self, doc: dict):
+        if doc["_id"] in self._entrenamientos:
+            return
+        tipo = tipo_entrenamiento(doc)
+        grupos = grupos_entrenamiento(doc)
+        fecha = doc.get("fecha") or ""
+        ejercicios = doc.get("ejercicios", [])
+        series = sum(series_ejercicio(ej) for ej in ejercicios)
+
+        claves = set()
+        for idx, ej in enumerate(ejercicios):
+            nombre = ej.get("nombre") or ""
+            clave = clave_ejercicio(nombre)
+            if not clave:
+                continue
+            metricas = metricas_ejercicio(ej) if "peso_max" not in ej or "reps_min" not in ej else ej
+            if clave not in self._apariciones:
+                self._nombres.agregar(clave)
+            self._apariciones[clave].append({
+                "entrenamiento_id": doc["_id"],
+                "idx": idx,
+                "fecha": fecha,
+                "nombre": nombre,
+                "peso": metricas["peso_max"],
+                "reps_min": metricas["reps_min"],
+                "series": ej.get("series"),
+                "repeticiones": ej.get("repeticiones"),
+                "grupos": grupos,
+            })
+            claves.add(clave)
+        self._sin_ordenar.update(claves)
+
+        self._por_tipo[tipo] += 1
+        for grupo in grupos:
+            self._por_grupo[grupo] += 1
+            self._series_grupo[grupo] += series
+        if fecha:
+            self._fechas[fecha] += 1
+        self._ejercicios += len(ejercicios)
+        self._series += series
+        self._entrenamientos[doc["_id"]] = {
+            "tipo": tipo, "grupos": grupos, "fecha": fecha,
+            "ejercicios": len(ejercicios), "series": series, "claves": claves,
+        }
+
+    def eliminar(self, entrenamiento_id):
+        """Resta el aporte de un entrenamiento borrado"""
+        with self._lock:
+            aporte = self._entrenamientos.pop(entrenamiento_id, None)
+            if not aporte:
+                return
+            self._por_tipo[aporte["tipo"]] -= 1
+            for grupo in aporte["grupos"]:
+                self._por_grupo[grupo] -= 1
+                self._series_grupo[grupo] -= aporte["series"]
+            if aporte["fecha"]:
+                self._fechas[aporte["fecha"]] -= 1
+            self._ejercicios -= aporte["ejercicios"]
+            self._series -= aporte["series"]
+            for clave in aporte["claves"]:
+                restantes = [a for a in self._apariciones[clave] if a["entrenamiento_id"] != entrenamiento_id]
+                if restantes:
+                    self._apariciones[clave] = restantes
+                else:
+                    del self._apariciones[clave]
+                    self._sin_ordenar.discard(clave)
+                    self._nombres.eliminar(clave)
+            # Los Counter conservan claves en 0; se limpian para que no aparezcan
+            for contador in (self._por_tipo, self._por_grupo, self._series_grupo, self._fechas):
+                for clave in [c for c, n in contador.items() if n <= 0]:
+                    del contador[clave]
+
+    def _ordenadas(self, clave: str) -> List[dict]:
+        """Apariciones de `clave` por fecha ascendente (se ordena al consultar)"""
+        if clave in self._sin_ordenar:
+            self._apariciones[clave].sort(key=_orden)
+            self._sin_ordenar.discard(clave)
+        return self._apariciones[clave]
+
+    # ---- Consultas ----
+
+    def totales(self) -> dict:
+        """Totales, conteos por tipo y por grupo muscular"""
+        with self._lock:
+            pesos = [a["peso"] for lista in self._apariciones.values() for a in lista if a["peso"]]
+            return {
+                "entrenamientos": len(self._entrenamientos),
+                "ejercicios": self._ejercicios,
+                "series": self._series,
+                "ejercicios_unicos": len(self._apariciones),
+                "dias": len(self._fechas),
+                "max_peso": max(pesos) if pesos else 0,
+                "por_tipo": dict(self._por_tipo),
+                "por_grupo": {
+                    grupo: {"entrenamientos": n, "series": self._series_grupo[grupo]}
+                    for grupo, n in self._por_grupo.items()
+                },
+            }
+
+    def ejercicios(self) -> List[dict]:
+        """Resumen por ejercicio ordenado por frecuencia"""
+        with self._lock:
+            resultado = []
+            for clave in list(self._apariciones):
+                apariciones = self._ordenadas(clave)
+                pesos = [a["peso"] for a in apariciones if a["peso"]]
+                resumen = {
+                    "nombre": apariciones[-1]["nombre"],
+                    "veces": len(apariciones),
+                    "ultimo_peso": pesos[-1] if pesos else None,
+                    "max_peso": max(pesos) if pesos else 0,
+                    "primera_fecha": apariciones[0]["fecha"],
+                    "ultima_fecha": apariciones[-1]["fecha"],
+                }
+                if pesos:
+                    resumen["promedio_peso"] = round(sum(pesos) / len(pesos), 1)
+                resultado.append(resumen)
+        resultado.sort(key=lambda x: x["veces"], reverse=True)
+        return resultado
+
+    def buscar(self, texto: str, limite: int = 10) -> List[dict]:
+        """
+        Busca nombres de ejercicio por palabras clave con puntuación BM25.
+
+        Returns:
+            [{"nombre", "score", "apariciones"}] ordenado por score desc
+        """
+        with self._lock:
+            return [
+                {"nombre": nombre, "score": score, "apariciones": self._copias(claves)}
+                for nombre, score, claves in self._nombres.buscar(texto, limite)
+            ]
+
+    def apariciones_de(self, texto: str) -> List[dict]:
+        """
+        Apariciones de los ejercicios cuyo nombre contiene todas las palabras
+        clave de `texto` o el texto como subcadena (sin distinguir mayúsculas
+        ni tildes), ordenadas por fecha ascendente.
+        """
+        with self._lock:
+            return self._copias(self._nombres.claves_de(texto))
+
+    def _copias(self, claves) -> List[dict]:
+        resultado = [dict(a) for clave in claves for a in self._ordenadas(clave)]
+        resultado.sort(key=_orden)
+        return resultado
+
+    @staticmethod
+    def ultimo_peso(apariciones: List[dict]) -> Optional[dict]:
+        """La aparición más reciente con peso numérico"""
+        con_peso = [a for a in apariciones if a["peso"]]
+        return max(con_peso, key=lambda a: a["fecha"]) if con_peso else None
+
+    def pesos_recientes_por_grupo(self, grupos: List[str], ultimos_entrenamientos: int = 30) -> List[float]:
+        """Pesos de los últimos N entrenamientos que trabajaron alguno de los grupos"""
+        grupos_lower = {g.strip().lower() for g in grupos}
+        with self._lock:
+            apariciones = [
+                a for lista in self._apariciones.values() for a in lista
+                if a["peso"] and grupos_lower.intersection(a["grupos"])
+            ]
+        apariciones.sort(key=lambda a: a["fecha"], reverse=True)
+
+        entrenamientos = set()
+        pesos = []
+        for a in apariciones:
+            if a["entrenamiento_id"] not in entrenamientos:
+                if len(entrenamientos) >= ultimos_entrenamientos:
+                    break
+                entrenamientos.add(a["entrenamiento_id"])
+            pesos.append(a["peso"])
+        return pesos
+
+    def prs(self, limite: Optional[int] = None) -> List[dict]:
+        """
+        Récord de peso por ejercicio (la primera vez que se alcanzó),
+        ordenados de mayor a menor peso.
+        """
+        with self._lock:
+            resultado = []
+            for clave in list(self._apariciones):
+                con_peso = [a for a in self._ordenadas(clave) if a["peso"] and a["peso"] > 0]
+                if not con_peso:
+                    continue
+                # max() devuelve el primero en caso de empate: la fecha más antigua
+                mejor = max(con_peso, key=lambda a: a["peso"])
+                resultado.append({
+                    "ejercicio": mejor["nombre"], "peso": mejor["peso"], "fecha": mejor["fecha"],
+                    "series": mejor["series"], "reps": mejor["repeticiones"],
+                })
+        resultado.sort(key=lambda x: x["peso"], reverse=True)
+        return resultado[:limite] if limite else resultado
+
+    def estimaciones_1rm(self, limite: Optional[int] = None) -> List[dict]:
+        """Mejor 1RM estimado (Brzycki) por ejercicio, de mayor a menor"""
+        with self._lock:
+            resultado = []
+            for clave in list(self._apariciones):
+                mejor = None
+                # Recorrido de la más reciente a la más antigua: en empate gana la reciente
+                for a in reversed(self._ordenadas(clave)):
+                    if not a["peso"] or a["peso"] <= 0 or not a["reps_min"] or not 0 < a["reps_min"] <= MAX_REPS_1RM:
+                        continue
+                    rm = calcular_1rm(a["peso"], int(a["reps_min"]))
+                    if mejor is None or rm > mejor["rm_estimado"]:
+                        mejor = {
+                            "ejercicio": a["nombre"], "rm_estimado": rm, "peso_usado": a["peso"],
+                            "repeticiones": int(a["reps_min"]), "fecha": a["fecha"],
+                        }
+                if mejor:
+                    resultado.append(mejor)
+        resultado.sort(key=lambda x: x["rm_estimado"], reverse=True)
+        return resultado[:limite] if limite else resultado
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "entrenamientos": len(self._entrenamientos),
+                "ejercicios": len(self._apariciones),
+                "apariciones": sum(len(a) for a in self._apariciones.values()),
+                "indice": self._nombres.estadisticas(),
+            }
+
+
+# Instancia compartida por la API y las herramientas MCP (mismo proceso)
+modelo_analitico = ModeloAnalitico()
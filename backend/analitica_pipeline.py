@@ -0,0 +1,314 @@
+"""
+Analítica en MongoDB - Trener
+Variantes de las consultas del modelo analítico calculadas por el servidor
+con pipelines de agregación: nada de traer los entrenamientos a Python para
+contarlos. La salida es la misma que la de los endpoints en modo memoria
+(mismas claves, tipos y orden); main.py las usa con ANALITICA_MOTOR=pipeline
+para totales, grupos, ejercicios frecuentes y volumen semanal.
+
+Las mismas reglas de normalización que analitica.py, con dos matices:
+- Ejercicios y grupos se agrupan por las claves guardadas al escribir
+  (`ejercicios.clave`, `grupos_clave`): $toLower solo pliega ASCII y
+  separaría "BÍCEPS" de "bíceps". Sin ellas se usa $toLower como respaldo;
+  para documentos antiguos: python migraciones.py metricas-ejercicios.
+  El peso de cada ejercicio es peso_max, del mismo origen.
+- Las claves de por_tipo/por_grupo y los empates de frecuencia siguen el
+  orden de _id, que coincide con el de inserción salvo _id asignados a mano.
+
+$dateTrunc requiere MongoDB 5.0: main.py comprueba la versión al arrancar y
+sigue con el motor en memoria si el servidor es anterior. La equivalencia con
+los endpoints en memoria la verifica tests/test_analitica_pipeline.py.
+"""
+
+from typing import List
+
+from pymongo.collection import Collection
+from pymongo.database import Database
+
+# Primera versión con $dateTrunc
+VERSION_MINIMA = (5, 0)
+
+
+def servidor_compatible(db: Database) -> bool:
+    """True si el servidor de `db` puede ejecutar estos pipelines"""
+    return tuple(db.client.server_info()["versionArray"][:2]) >= VERSION_MINIMA
+
+
+def _clave_ejercicio(ejercicio: str) -> dict:
+    """normalizacion.clave_ejercicio: la clave guardada o nombre.strip().lower()"""
+    return {"$ifNull": [f"{ejercicio}.clave", {"$toLower": {"$trim": {"input": {"$ifNull": [f"{ejercicio}.nombre", ""]}}}}]}
+
+
+_CLAVE_EJERCICIO = _clave_ejercicio("$ejercicios")
+
+# Suma de normalizacion.series_ejercicio: series numéricas truncadas a int
+# (bool no cuenta: $isNumber lo excluye)
+_SERIES_ENTRENAMIENTO = {"$sum": {"$map": {
+    "input": {"$ifNull": ["$ejercicios", []]},
+    "as": "ej",
+    "in": {"$cond": [{"$isNumber": "$$ej.series"}, {"$toInt": {"$trunc": "$$ej.series"}}, 0]},
+}}}
+
+# normalizacion.grupos_entrenamiento (los repetidos se descartan al agrupar)
+_GRUPOS_ENTRENAMIENTO = {"$ifNull": ["$grupos_clave", {"$map": {
+    "input": {"$filter": {
+        "input": {"$ifNull": ["$grupos_musculares", []]},
+        "cond": {"$eq": [{"$type": "$$this"}, "string"]},
+    }},
+    "in": {"$toLower": {"$trim": {"input": "$$this"}}},
+}}]}
+
+# Peso "verdadero" en Python: ni None (o ausente) ni 0
+_PESO_VALIDO = {"$and": [{"$ne": [{"$ifNull": ["$peso", None]}, None]}, {"$ne": ["$peso", 0]}]}
+
+
+def _facet_totales() -> List[dict]:
+    """Todas las cuentas de totales() en un solo round-trip con $facet"""
+    # El orden de las claves en Python es el de primera aparición; aquí se
+    # reproduce ordenando por el menor (_id, posición) que las contiene
+    por_primera_aparicion = [{"$sort": {"primero": 1}}]
+    return [
+        {"$project": {
+            "fecha": 1,
+            "tipo": {"$cond": [{"$in": [{"$ifNull": ["$tipo", ""]}, ["", False, 0]]}, "otro", "$tipo"]},
+            "grupos": _GRUPOS_ENTRENAMIENTO,
+            "series": _SERIES_ENTRENAMIENTO,
+            "n_ejercicios": {"$size": {"$ifNull": ["$ejercicios", []]}},
+            "claves": {"$map": {
+                "input": {"$ifNull": ["$ejercicios", []]},
+                "as": "ej",
+                "in": {"clave": _clave_ejercicio("$$ej"), "peso": "$$ej.peso_max"},
+            }},
+        }},
+        {"$facet": {
+            "totales": [{"$group": {
+                "_id": None,
+                "entrenamientos": {"$sum": 1},
+                "ejercicios": {"$sum": "$n_ejercicios"},
+                "series": {"$sum": "$series"},
+            }}],
+            "dias": [
+                {"$match": {"fecha": {"$nin": [None, ""]}}},
+                {"$group": {"_id": "$fecha"}},
+                {"$count": "n"},
+            ],
+            "ejercicios": [
+                {"$unwind": "$claves"},
+                {"$match": {"claves.clave": {"$ne": ""}}},
+                {"$group": {"_id": "$claves.clave", "max_peso": {"$max": {"$cond": [
+                    {"$eq": [{"$ifNull": ["$claves.peso", 0]}, 0]}, None, "$claves.peso",
+                ]}}}},
+                {"$group": {"_id": None, "unicos": {"$sum": 1}, "max_peso": {"$max": "$max_peso"}}},
+            ],
+            "por_tipo": [
+                {"$group": {"_id": "$tipo", "n": {"$sum": 1}, "primero": {"$min": "$_id"}}},
+                *por_primera_aparicion,
+            ],
+            "por_grupo": [
+                {"$unwind": {"path": "$grupos", "includeArrayIndex": "pos"}},
+                # Un grupo repetido en el mismo entrenamiento cuenta una vez
+                {"$group": {
+                    "_id": {"doc": "$_id", "grupo": "$grupos"},
+                    "series": {"$first": "$series"},
+                    "pos": {"$min": "$pos"},
+                }},
+                {"$group": {
+                    "_id": "$_id.grupo",
+                    "entrenamientos": {"$sum": 1},
+                    "series": {"$sum": "$series"},
+                    "primero": {"$min": {"doc": "$_id.doc", "pos": "$pos"}},
+                }},
+                *por_primera_aparicion,
+            ],
+        }},
+    ]
+
+
+def totales(coleccion: Collection) -> dict:
+    """Igual que ModeloAnalitico.totales()"""
+    r = next(coleccion.aggregate(_facet_totales(), allowDiskUse=True))
+    t = r["totales"][0] if r["totales"] else {}
+    ej = r["ejercicios"][0] if r["ejercicios"] else {}
+    return {
+        "entrenamientos": t.get("entrenamientos", 0),
+        "ejercicios": t.get("ejercicios", 0),
+        "series": t.get("series", 0),
+        "ejercicios_unicos": ej.get("unicos", 0),
+        "dias": r["dias"][0]["n"] if r["dias"] else 0,
+        "max_peso": ej.get("max_peso") or 0,
+        "por_tipo": {g["_id"]: g["n"] for g in r["por_tipo"]},
+        "por_grupo": {
+            g["_id"]: {"entrenamientos": g["entrenamientos"], "series": g["series"]}
+            for g in r["por_grupo"]
+        },
+    }
+
+
+def _pipeline_ejercicios() -> List[dict]:
+    return [
+        {"$project": {"fecha": {"$ifNull": ["$fecha", ""]}, "ejercicios": 1}},
+        {"$unwind": {"path": "$ejercicios", "includeArrayIndex": "idx"}},
+        {"$project": {
+            "fecha": 1,
+            "idx": 1,
+            "clave": _CLAVE_EJERCICIO,
+            "nombre": {"$ifNull": ["$ejercicios.nombre", ""]},
+            "peso": "$ejercicios.peso_max",
+        }},
+        {"$match": {"clave": {"$ne": ""}}},
+        # Mismo orden que las apariciones del modelo: (fecha, _id, índice)
+        {"$sort": {"fecha": 1, "_id": 1, "idx": 1}},
+        {"$set": {"valido": _PESO_VALIDO}},
+        {"$group": {
+            "_id": "$clave",
+            "nombre": {"$last": "$nombre"},
+            "veces": {"$sum": 1},
+            "primera_fecha": {"$first": "$fecha"},
+            "ultima_fecha": {"$last": "$fecha"},
+            "primero": {"$min": {"doc": "$_id", "idx": "$idx"}},
+            # Solo acumuladores de tamaño fijo: nada crece con el historial
+            "max_peso": {"$max": {"$cond": ["$valido", "$peso", None]}},
+            # La última aparición con peso: el mayor (fecha, _id, índice); $max ignora los null
+            "ultimo": {"$max": {"$cond": [
+                "$valido", {"fecha": "$fecha", "doc": "$_id", "idx": "$idx", "peso": "$peso"}, None,
+            ]}},
+            "suma_pesos": {"$sum": {"$cond": ["$valido", "$peso", 0]}},
+            "con_peso": {"$sum": {"$cond": ["$valido", 1, 0]}},
+        }},
+        # sort estable por veces en Python: empates en orden de primera aparición
+        {"$sort": {"veces": -1, "primero": 1}},
+    ]
+
+
+def ejercicios(coleccion: Collection) -> List[dict]:
+    """Igual que ModeloAnalitico.ejercicios()"""
+    resultado = []
+    for r in coleccion.aggregate(_pipeline_ejercicios(), allowDiskUse=True):
+        resumen = {
+            "nombre": r["nombre"],
+            "veces": r["veces"],
+            "ultimo_peso": r["ultimo"]["peso"] if r["con_peso"] else None,
+            "max_peso": r["max_peso"] if r["con_peso"] else 0,
+            "primera_fecha": r["primera_fecha"],
+            "ultima_fecha": r["ultima_fecha"],
+        }
+        # Solo el redondeo se hace aquí, con el mismo round() que el modelo
+        if r["con_peso"]:
+            resumen["promedio_peso"] = round(r["suma_pesos"] / r["con_peso"], 1)
+        resultado.append(resumen)
+    return resultado
+
+
+def _pipeline_volumen() -> List[dict]:
+    return [
+        {"$project": {
+            "dia": {"$cond": [
+                {"$eq": [{"$type": "$fecha"}, "date"]},
+                "$fecha",
+                {"$dateFromString": {"dateString": "$fecha", "format": "%Y-%m-%d", "onError": None, "onNull": None}},
+            ]},
+            "series": _SERIES_ENTRENAMIENTO,
+            "ejercicios": {"$size": {"$ifNull": ["$ejercicios", []]}},
+        }},
+        {"$match": {"dia": {"$ne": None}}},
+        {"$group": {
+            "_id": {"$dateTrunc": {"date": "$dia", "unit": "week", "startOfWeek": "monday"}},
+            "entrenamientos": {"$sum": 1},
+            "series": {"$sum": "$series"},
+            "ejercicios": {"$sum": "$ejercicios"},
+        }},
+        {"$project": {
+            "_id": 0,
+            # Lunes de la semana, como el campo `semana` del rollup: "2025-02-10"
+            "semana": {"$dateToString": {"date": "$_id", "format": "%Y-%m-%d"}},
+            "series": 1,
+            "ejercicios": 1,
+            "entrenamientos": 1,
+        }},
+        {"$sort": {"semana": 1}},
+    ]
+
+
+def volumen_semanal(coleccion: Collection) -> List[dict]:
+    """Mismas filas que el rollup semanal (semana, series, ejercicios, entrenamientos)"""
+    return [
+        {"semana": r["semana"], "series": r["series"], "ejercicios": r["ejercicios"], "entrenamientos": r["entrenamientos"]}
+        for r in coleccion.aggregate(_pipeline_volumen(), allowDiskUse=True)
+    ]
+
+
+# Benchmark contra una base real: MONGO_URI=... python analitica_pipeline.py
+# Llama a las funciones de los endpoints de main.py con cada motor sobre
+# colecciones temporales y exige la misma respuesta byte a byte
+if __name__ == "__main__":
+    import random
+    import time
+    from datetime import date, timedelta
+
+    import main
+    from serializacion import codificar
+
+    coleccion = main.db["bench_analitica"]
+    coleccion_rollup = main.db["bench_analitica_rollup"]
+    main.collection = coleccion
+    main.rollup_collection = coleccion_rollup
+
+    nombres = ["Press banca", "press banca ", "Sentadilla", "Remo con barra", "Curl bíceps", "CURL BÍCEPS", "Jalón al pecho"]
+    grupos = ["Pecho", "pecho", "espalda", "Piernas", "bíceps", "BÍCEPS", "hombro"]
+
+    def entrenamiento_sintetico(i: int) -> dict:
+        return {
+            "fecha": (date(2020, 1, 1) + timedelta(days=i % 2000)).isoformat(),
+            "nombre": "Sintético",
+            "tipo": random.choice(["push", "pull", "legs", None]),
+            "grupos_musculares": random.sample(grupos, 2),
+            "ejercicios": [
+                {
+                    "nombre": random.choice(nombres),
+                    "series": random.choice([3, 4, 4.0, 3.5]),
+                    "repeticiones": random.choice([10, [12, 10, 8], 5]),
+                    "peso_kg": random.choice([60, 62.5, "ajustar", [40, 45, 50], 0]),
+                }
+                for _ in range(5)
+            ],
+        }
+
+    endpoints = {
+        "/api/estadisticas": main.calcular_estadisticas,
+        "/api/progreso/grupos": main.progreso_grupos,
+        "/api/progreso/ejercicios-frecuentes": main.ejercicios_frecuentes,
+        "/api/progreso/volumen": main.volumen_semanal,
+    }
+
+    def medir(motor: str):
+        main.ANALITICA_MOTOR = motor
+        salidas, tiempos = {}, {}
+        for ruta, funcion in endpoints.items():
+            inicio = time.perf_counter()
+            salidas[ruta] = codificar(funcion())
+            tiempos[ruta] = (time.perf_counter() - inicio) * 1000
+        return salidas, tiempos
+
+    try:
+        coleccion.drop()
+        coleccion_rollup.drop()
+        total = 0
+        for tamano in (1_000, 10_000, 50_000):
+            # Mismo camino de escritura que la API: métricas, claves y rollup
+            main.guardar_entrenamientos([entrenamiento_sintetico(i) for i in range(total, tamano)])
+            total = tamano
+
+            inicio = time.perf_counter()
+            main.modelo_analitico.cargar(coleccion)
+            ms_carga = (time.perf_counter() - inicio) * 1000
+
+            en_memoria, ms_memoria = medir("memoria")
+            en_mongo, ms_mongo = medir("pipeline")
+            for ruta in endpoints:
+                assert en_memoria[ruta] == en_mongo[ruta], f"{ruta} difiere entre memoria y pipeline"
+            print(f"{tamano} entrenamientos (carga del modelo {ms_carga:.0f} ms), salida idéntica byte a byte:")
+            for ruta in endpoints:
+                print(f"  {ruta}: memoria {ms_memoria[ruta]:.1f} ms, pipeline {ms_mongo[ruta]:.1f} ms")
+    finally:
+        coleccion.drop()
+        coleccion_rollup.drop()
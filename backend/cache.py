@@ -0,0 +1,58 @@
+"""
+Cache en memoria - Trener
+Snapshots de cálculos caros invalidados por un contador de versión.
+Cada escritura en `gimnasio` incrementa la versión y el siguiente acceso
+recalcula. Es por proceso: /api/estadisticas también invalida cuando el
+modelo analítico se recarga por escrituras hechas fuera (ver analitica.py).
+"""
+
+import copy
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+
+class CacheVersionada:
+    """Cache clave -> valor válida mientras no cambie la versión"""
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._valores: Dict[str, Tuple[int, Any]] = {}
+        self._lock = threading.Lock()
+
+    def invalidar(self):
+        """Incrementa la versión: todos los snapshots quedan obsoletos"""
+        with self._lock:
+            self.version += 1
+
+    def obtener(self, clave: str, calcular: Callable[[], Any]) -> Any:
+        """Devuelve el snapshot de `clave` o lo recalcula si la versión cambió"""
+        with self._lock:
+            version = self.version
+            entrada = self._valores.get(clave)
+            if entrada and entrada[0] == version:
+                self.hits += 1
+                return copy.deepcopy(entrada[1])
+            self.misses += 1
+
+        # Se calcula fuera del lock; si hubo una escritura mientras tanto
+        # el snapshot queda guardado con la versión vieja y se recalcula luego
+        valor = calcular()
+        with self._lock:
+            self._valores[clave] = (version, valor)
+        return copy.deepcopy(valor)
+
+    def metricas(self) -> dict:
+        """Contadores para monitoreo"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "cache": self.nombre,
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0,
+                "claves": len(self._valores),
+            }
@@ -0,0 +1,108 @@
+"""
+Difusión de eventos - Trener
+Hub en memoria que reparte a los suscriptores (SSE) los cambios del
+entrenamiento activo: serie agregada, ejercicio completado, entrenamiento
+finalizado... Solo viaja el fragmento que cambió.
+
+publicar() se puede llamar desde los endpoints síncronos (threadpool de
+FastAPI): cada evento se entrega en el event loop del suscriptor con
+call_soon_threadsafe. Es por proceso, igual que CacheVersionada.
+"""
+
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+
+class Difusor:
+    """Publicación/suscripción con una cola acotada por suscriptor"""
+
+    def __init__(self, nombre: str, tamano_cola: int = 100):
+        self.nombre = nombre
+        self.tamano_cola = tamano_cola
+        self.version = 0
+        self.publicados = 0
+        self.descartados = 0
+        self._suscriptores: Dict[asyncio.Queue, asyncio.AbstractEventLoop] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _encolar(cola: asyncio.Queue, mensaje: Optional[Tuple[int, str, dict]]):
+        """Corre en el loop del suscriptor; si la cola está llena se le desconecta"""
+        try:
+            cola.put_nowait(mensaje)
+        except asyncio.QueueFull:
+            # El cliente no da abasto: se vacía la cola y se le pide resincronizar
+            while not cola.empty():
+                cola.get_nowait()
+            cola.put_nowait(None)
+
+    def publicar(self, evento: str, datos: dict) -> int:
+        """Envía el evento a todos los suscriptores; devuelve su versión"""
+        with self._lock:
+            self.version += 1
+            self.publicados += 1
+            mensaje = (self.version, evento, datos)
+            suscriptores = list(self._suscriptores.items())
+
+        for cola, loop in suscriptores:
+            try:
+                loop.call_soon_threadsafe(self._encolar, cola, mensaje)
+            except RuntimeError:
+                # Loop cerrado: el suscriptor ya no existe
+                self._quitar(cola)
+        return mensaje[0]
+
+    def _quitar(self, cola: asyncio.Queue):
+        with self._lock:
+            self._suscriptores.pop(cola, None)
+
+    @asynccontextmanager
+    async def suscribir(self, intervalo_ping: float = 15.0) -> AsyncIterator[AsyncIterator[Optional[Tuple[int, str, dict]]]]:
+        """
+        Contexto de suscripción: al entrar registra al suscriptor (los eventos
+        publicados desde ahora no se pierden aunque el cliente lea primero el
+        estado completo) y entrega un iterador que produce (version, evento,
+        datos), o None cada `intervalo_ping` segundos sin eventos para mantener
+        viva la conexión. Al salir se quita la cola, aunque el iterador no se
+        haya llegado a recorrer. El iterador termina si el suscriptor se queda
+        atrás: el cliente debe reconectar y pedir el estado.
+
+        Usarlo dentro del generador del stream: si el cliente se va antes de
+        que empiece la respuesta, no queda nada registrado.
+        """
+        cola: asyncio.Queue = asyncio.Queue(maxsize=self.tamano_cola)
+        with self._lock:
+            self._suscriptores[cola] = asyncio.get_running_loop()
+        try:
+            yield self._escuchar(cola, intervalo_ping)
+        finally:
+            self._quitar(cola)
+
+    async def _escuchar(self, cola: asyncio.Queue, intervalo_ping: float):
+        try:
+            while True:
+                try:
+                    mensaje = await asyncio.wait_for(cola.get(), intervalo_ping)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if mensaje is None:
+                    with self._lock:
+                        self.descartados += 1
+                    return
+                yield mensaje
+        finally:
+            self._quitar(cola)
+
+    def metricas(self) -> dict:
+        """Contadores para monitoreo"""
+        with self._lock:
+            return {
+                "canal": self.nombre,
+                "version": self.version,
+                "suscriptores": len(self._suscriptores),
+                "publicados": self.publicados,
+                "descartados": self.descartados,
+            }
@@ -0,0 +1,62 @@
+"""
+Exportación en streaming - Trener
+Recorre un cursor de Mongo por lotes y produce NDJSON (un documento por
+línea), opcionalmente comprimido con gzip, bloque a bloque. La memoria
+usada no depende del tamaño del historial.
+"""
+
+import zlib
+from typing import Iterable, Iterator, Optional
+
+from pymongo.database import Database
+
+from paginacion import filtro_rango
+from serializacion import codificar
+
+# coleccion -> admite filtro por fecha
+COLECCIONES_EXPORTABLES = {
+    "gimnasio": True,
+    "entrenamiento_chat": True,
+    "usuario_gym": False,
+}
+
+# Documentos por lote del cursor y por bloque escrito en la respuesta
+TAMANO_LOTE = 500
+
+
+def filtro_exportacion(coleccion: str, desde: Optional[str] = None, hasta: Optional[str] = None) -> dict:
+    """
+    Raises:
+        ValueError: Colección no exportable o rango de fechas no soportado
+    """
+    if coleccion not in COLECCIONES_EXPORTABLES:
+        raise ValueError(f"Colección no exportable. Usa: {list(COLECCIONES_EXPORTABLES)}")
+    if (desde or hasta) and not COLECCIONES_EXPORTABLES[coleccion]:
+        raise ValueError(f"La colección {coleccion} no tiene fecha para filtrar")
+    return filtro_rango(desde, hasta)
+
+
+def lineas_ndjson(db: Database, coleccion: str, filtro: dict, tamano_lote: int = TAMANO_LOTE) -> Iterator[bytes]:
+    """Produce bloques de NDJSON de `tamano_lote` documentos"""
+    cursor = db[coleccion].find(filtro).batch_size(tamano_lote)
+    bloque = []
+    try:
+        for doc in cursor:
+            bloque.append(codificar(doc))
+            if len(bloque) >= tamano_lote:
+                yield b"\n".join(bloque) + b"\n"
+                bloque = []
+        if bloque:
+            yield b"\n".join(bloque) + b"\n"
+    finally:
+        cursor.close()
+
+
+def comprimir_gzip(bloques: Iterable[bytes]) -> Iterator[bytes]:
+    """Comprime un stream de bloques como un único archivo gzip"""
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> formato gzip
+    for bloque in bloques:
+        comprimido = compresor.compress(bloque)
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
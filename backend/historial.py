@@ -0,0 +1,99 @@
+"""
+Historial de series - Trener
+Colección plana con una fila por ejercicio y serie, derivada de `gimnasio`.
+Se mantiene en cada escritura para consultar series sueltas con índices
+(ejercicio_norm + fecha) en lugar de recorrer los documentos anidados: la
+usan las herramientas MCP de consulta y agregación. Los agregados de
+estadísticas, PRs y 1RM salen del modelo analítico (analitica.py).
+"""
+
+from typing import Iterable, List
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.collection import Collection
+
+from normalizacion import clave_ejercicio, expandir_series, grupos_entrenamiento
+
+COLECCION_HISTORIAL = "historial_series"
+
+INDICES_HISTORIAL = [
+    ([("ejercicio_norm", ASCENDING), ("fecha", ASCENDING)], {"name": "ejercicio_fecha"}),
+    ([("fecha", DESCENDING)], {"name": "fecha"}),
+    ([("entrenamiento_id", ASCENDING)], {"name": "entrenamiento"}),
+]
+
+TAMANO_LOTE = 1000
+
+
+def filas_entrenamiento(doc: dict) -> List[dict]:
+    """Convierte un entrenamiento (con _id) en filas de historial, una por serie"""
+    grupos = grupos_entrenamiento(doc)
+    filas = []
+
+    for idx, ej in enumerate(doc.get("ejercicios", [])):
+        nombre = ej.get("nombre", "") or ""
+        for numero_serie, (peso, reps) in enumerate(expandir_series(ej), 1):
+            filas.append({
+                "entrenamiento_id": doc["_id"],
+                "fecha": doc.get("fecha"),
+                "tipo": doc.get("tipo"),
+                "grupos": grupos,
+                "ejercicio": nombre,
+                "ejercicio_norm": clave_ejercicio(nombre),
+                "ejercicio_idx": idx,
+                "serie": numero_serie,
+                "peso_kg": peso,
+                "repeticiones": reps,
+            })
+
+    return filas
+
+
+def registrar_series(coleccion: Collection, docs: Iterable[dict]) -> int:
+    """Inserta las filas de historial de uno o varios entrenamientos ya guardados"""
+    filas = [fila for doc in docs for fila in filas_entrenamiento(doc)]
+    if not filas:
+        return 0
+    coleccion.insert_many(filas, ordered=False)
+    return len(filas)
+
+
+def eliminar_series(coleccion: Collection, entrenamiento_id) -> int:
+    """Elimina las filas de historial de un entrenamiento"""
+    return coleccion.delete_many({"entrenamiento_id": entrenamiento_id}).deleted_count
+
+
+def asegurar_indices(coleccion: Collection):
+    """Crea los índices del historial si no existen"""
+    for claves, opciones in INDICES_HISTORIAL:
+        coleccion.create_index(claves, **opciones)
+
+
+def reconstruir_historial(db) -> dict:
+    """
+    Reconstruye `historial_series` desde cero a partir de `gimnasio`.
+
+    Returns:
+        Conteo de entrenamientos procesados y filas insertadas
+    """
+    coleccion = db[COLECCION_HISTORIAL]
+    coleccion.delete_many({})
+    asegurar_indices(coleccion)
+
+    entrenamientos = 0
+    filas = 0
+    lote = []
+
+    for doc in db.gimnasio.find({}).batch_size(TAMANO_LOTE):
+        entrenamientos += 1
+        lote.extend(filas_entrenamiento(doc))
+        if len(lote) >= TAMANO_LOTE:
+            coleccion.insert_many(lote, ordered=False)
+            filas += len(lote)
+            lote = []
+
+    if lote:
+        coleccion.insert_many(lote, ordered=False)
+        filas += len(lote)
+
+    return {"entrenamientos": entrenamientos, "filas": filas}
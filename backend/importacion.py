@@ -0,0 +1,156 @@
+"""
+Importación masiva - Trener
+Lee historiales en NDJSON (un entrenamiento por línea) o CSV (un ejercicio
+por fila) y los entrega como dicts con su número de línea, para validarlos y
+guardarlos por lotes. Los errores de lectura se reportan por línea sin
+detener la importación. El cuerpo se vuelca a un archivo temporal
+(volcar_cuerpo) y se lee línea a línea: nunca está entero en memoria.
+
+Columnas CSV: id (opcional), fecha, nombre, tipo, grupos_musculares,
+ejercicio, series, repeticiones, peso_kg. Las filas consecutivas con el
+mismo id (o misma fecha + nombre si no hay id) forman un entrenamiento.
+Los valores múltiples van separados por ";": "pecho;tríceps", "10;10;8".
+"""
+
+import codecs
+import csv
+import io
+import json
+from itertools import islice
+from tempfile import SpooledTemporaryFile
+from typing import AsyncIterator, Iterable, Iterator, List, Tuple, Union
+
+COLUMNAS_CSV = ["fecha", "nombre", "tipo", "grupos_musculares", "ejercicio", "series", "repeticiones", "peso_kg"]
+
+FORMATOS = ("ndjson", "csv")
+
+# Entrenamientos por lote de validación + insert_many
+TAMANO_LOTE = 500
+
+# Bytes del cuerpo que se guardan en memoria antes de pasar a disco
+TAMANO_SPOOL = 1024 * 1024
+
+# (linea, documento) o (linea, mensaje de error)
+Fila = Tuple[int, Union[dict, str]]
+
+
+def _numero_o_texto(valor: str):
+    """'60' -> 60, '62.5' -> 62.5, 'ajustar' -> 'ajustar'"""
+    valor = valor.strip()
+    try:
+        return int(valor)
+    except ValueError:
+        pass
+    try:
+        return float(valor)
+    except ValueError:
+        return valor
+
+
+def _multiple(valor: str):
+    """'10;10;8' -> [10, 10, 8]; '10' -> 10"""
+    partes = [p for p in (valor or "").split(";") if p.strip()]
+    if len(partes) > 1:
+        return [_numero_o_texto(p) for p in partes]
+    return _numero_o_texto(partes[0]) if partes else None
+
+
+class CuerpoDemasiadoGrande(ValueError):
+    pass
+
+
+async def volcar_cuerpo(trozos: AsyncIterator[bytes], max_bytes: int) -> io.TextIOWrapper:
+    """
+    Copia el cuerpo de la petición a un SpooledTemporaryFile y lo devuelve
+    abierto como texto UTF-8 (con o sin BOM) listo para leer línea a línea.
+    La codificación se valida mientras llega, antes de importar nada.
+
+    Raises:
+        CuerpoDemasiadoGrande: Si supera `max_bytes`
+        UnicodeDecodeError: Si no es UTF-8 válido
+    """
+    archivo = SpooledTemporaryFile(max_size=TAMANO_SPOOL)
+    decodificador = codecs.getincrementaldecoder("utf-8")()
+    total = 0
+    try:
+        async for trozo in trozos:
+            total += len(trozo)
+            if total > max_bytes:
+                raise CuerpoDemasiadoGrande(f"El cuerpo supera el máximo de {max_bytes} bytes")
+            decodificador.decode(trozo)
+            archivo.write(trozo)
+        decodificador.decode(b"", final=True)
+    except BaseException:
+        archivo.close()
+        raise
+    archivo.seek(0)
+    return io.TextIOWrapper(archivo, encoding="utf-8-sig", newline="")
+
+
+def leer_ndjson(lineas: Iterable[str]) -> Iterator[Fila]:
+    for linea, contenido in enumerate(lineas, 1):
+        if not contenido.strip():
+            continue
+        try:
+            doc = json.loads(contenido)
+        except json.JSONDecodeError as e:
+            yield linea, f"JSON inválido: {e}"
+            continue
+        yield (linea, doc) if isinstance(doc, dict) else (linea, "Se esperaba un objeto JSON")
+
+
+def leer_csv(lineas: Iterable[str]) -> Iterator[Fila]:
+    lector = csv.DictReader(lineas)
+    faltantes = [c for c in COLUMNAS_CSV if c not in (lector.fieldnames or [])]
+    if faltantes:
+        yield 1, f"Faltan columnas: {', '.join(faltantes)}"
+        return
+
+    actual, clave_actual, linea_actual = None, None, 0
+    for fila in lector:
+        linea = lector.line_num
+        clave = fila.get("id") or (fila["fecha"], fila["nombre"])
+        if clave != clave_actual:
+            if actual:
+                yield linea_actual, actual
+            actual = {
+                "nombre": fila["nombre"],
+                "tipo": fila["tipo"],
+                "fecha": fila["fecha"],
+                "grupos_musculares": [g.strip() for g in fila["grupos_musculares"].split(";") if g.strip()],
+                "ejercicios": [],
+            }
+            if fila.get("id"):
+                actual["id"] = fila["id"]
+            clave_actual, linea_actual = clave, linea
+
+        series = _numero_o_texto(fila["series"] or "")
+        actual["ejercicios"].append({
+            "nombre": fila["ejercicio"],
+            "series": series,
+            "repeticiones": _multiple(fila["repeticiones"]),
+            "peso_kg": _multiple(fila["peso_kg"]),
+        })
+    if actual:
+        yield linea_actual, actual
+
+
+def leer_filas(lineas: Iterable[str], formato: str) -> Iterator[Fila]:
+    """
+    `lineas` es cualquier iterable de líneas: un archivo abierto con
+    newline="" o texto.splitlines().
+
+    Raises:
+        ValueError: Formato no soportado
+    """
+    if formato == "ndjson":
+        return leer_ndjson(lineas)
+    if formato == "csv":
+        return leer_csv(lineas)
+    raise ValueError("Formato no soportado. Usa: ndjson, csv")
+
+
+def en_lotes(filas: Iterable[Fila], tamano: int = TAMANO_LOTE) -> Iterator[List[Fila]]:
+    iterador = iter(filas)
+    while lote := list(islice(iterador, tamano)):
+        yield lote
@@ -0,0 +1,125 @@
+"""
+Índice invertido de ejercicios - Trener
+Mapea palabra clave (sin tildes) -> nombres de ejercicio -> claves del modelo
+analítico. Solo guarda los nombres distintos: las apariciones viven en
+ModeloAnalitico (analitica.py), que mantiene este índice al agregar o
+eliminar entrenamientos, así la búsqueda por nombre no recorre todo el
+historial y no hay una segunda copia de cada aparición.
+
+Las búsquedas puntúan con BM25 sobre los nombres distintos: una palabra que
+aparece en muchos ejercicios ("press") pesa menos que una específica ("banca").
+"""
+
+import math
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+
+from normalizacion import extraer_palabras_clave, plegar_acentos
+
+# Parámetros estándar de BM25
+K1 = 1.2
+B = 0.75
+
+
+def tokens(texto: str) -> List[str]:
+    """Palabras clave normalizadas (sin tildes ni plural simple)"""
+    resultado = []
+    for palabra in extraer_palabras_clave(texto):
+        if len(palabra) > 4 and palabra.endswith("s"):
+            palabra = palabra[:-1]
+        resultado.append(palabra)
+    return resultado
+
+
+def _nombre_normalizado(nombre: str) -> str:
+    return plegar_acentos(nombre.lower().strip())
+
+
+class IndiceEjercicios:
+    """
+    Índice de los nombres de ejercicio distintos. No tiene lock propio: lo
+    usa ModeloAnalitico bajo el suyo.
+    """
+
+    def __init__(self):
+        # palabra -> nombres normalizados que la contienen
+        self._postings: Dict[str, set] = defaultdict(set)
+        # nombre normalizado -> tokens del nombre
+        self._tokens_nombre: Dict[str, List[str]] = {}
+        # nombre normalizado -> claves del modelo ("Jalón" y "jalon" comparten nombre)
+        self._claves: Dict[str, Set[str]] = defaultdict(set)
+
+    # ---- Mantenimiento ----
+
+    def agregar(self, clave: str):
+        """Registra una clave de ejercicio nueva (normalizacion.clave_ejercicio)"""
+        nombre = _nombre_normalizado(clave)
+        if nombre not in self._tokens_nombre:
+            self._tokens_nombre[nombre] = tokens(clave)
+            for t in self._tokens_nombre[nombre]:
+                self._postings[t].add(nombre)
+        self._claves[nombre].add(clave)
+
+    def eliminar(self, clave: str):
+        """Quita una clave que ya no tiene apariciones"""
+        nombre = _nombre_normalizado(clave)
+        self._claves[nombre].discard(clave)
+        if self._claves[nombre]:
+            return
+        del self._claves[nombre]
+        for t in self._tokens_nombre.pop(nombre, []):
+            self._postings[t].discard(nombre)
+            if not self._postings[t]:
+                del self._postings[t]
+
+    # ---- Consultas ----
+
+    def buscar(self, texto: str, limite: int = 10) -> List[Tuple[str, float, Set[str]]]:
+        """
+        Busca nombres de ejercicio por palabras clave con puntuación BM25.
+
+        Returns:
+            [(nombre normalizado, score, claves del modelo)] ordenado por score desc
+        """
+        consulta = tokens(texto)
+        total_nombres = len(self._tokens_nombre)
+        if not consulta or not total_nombres:
+            return []
+        largo_medio = sum(len(t) for t in self._tokens_nombre.values()) / total_nombres
+
+        scores: Dict[str, float] = defaultdict(float)
+        for t in set(consulta):
+            nombres = self._postings.get(t)
+            if not nombres:
+                continue
+            idf = math.log(1 + (total_nombres - len(nombres) + 0.5) / (len(nombres) + 0.5))
+            for nombre in nombres:
+                toks = self._tokens_nombre[nombre]
+                tf = toks.count(t)
+                scores[nombre] += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * len(toks) / largo_medio))
+
+        mejores = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:limite]
+        return [(nombre, round(score, 4), set(self._claves[nombre])) for nombre, score in mejores]
+
+    def claves_de(self, texto: str) -> Set[str]:
+        """
+        Claves de los ejercicios cuyo nombre contiene todas las palabras clave
+        de `texto` o el texto como subcadena (sin distinguir mayúsculas ni
+        tildes: "banc" y "pres" encuentran "Press banca").
+        """
+        consulta = tokens(texto)
+        buscado = _nombre_normalizado(texto)
+        nombres = set()
+        if consulta:
+            conjuntos = [self._postings.get(t, set()) for t in consulta]
+            nombres = set.intersection(*conjuntos)
+        # Subcadena sobre los nombres distintos (pocos cientos, no apariciones)
+        if buscado:
+            nombres |= {nombre for nombre in self._tokens_nombre if buscado in nombre}
+        return {clave for nombre in nombres for clave in self._claves[nombre]}
+
+    def estadisticas(self) -> dict:
+        return {
+            "palabras": len(self._postings),
+            "nombres": len(self._tokens_nombre),
+        }
@@ -0,0 +1,132 @@
+"""
+Índices de MongoDB - Trener
+Declara los índices que necesitan las consultas calientes, los crea al
+arrancar y verifica con explain() que ninguna consulta canónica haga COLLSCAN.
+"""
+
+import logging
+from typing import List
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+from historial import COLECCION_HISTORIAL, INDICES_HISTORIAL
+from rollup import COLECCION_ROLLUP, INDICES_ROLLUP
+
+logger = logging.getLogger("trener")
+
+# coleccion -> [(claves, opciones)]
+INDICES = {
+    "gimnasio": [
+        # Orden y keyset de la paginación de /api/entrenamientos (cubre también fecha sola)
+        ([("fecha", DESCENDING), ("_id", DESCENDING)], {"name": "fecha_id"}),
+        ([("id", ASCENDING)], {"name": "id"}),
+    ],
+    "entrenamiento_activo": [
+        # Solo puede existir un entrenamiento activo a la vez
+        ([("completado", ASCENDING)], {
+            "name": "un_activo",
+            "unique": True,
+            "partialFilterExpression": {"completado": False},
+        }),
+    ],
+    "entrenamiento_chat": [
+        ([("usuario_id", ASCENDING), ("completado", ASCENDING)], {"name": "usuario_completado"}),
+        # Un entrenamiento de chat en curso por usuario
+        ([("usuario_id", ASCENDING)], {
+            "name": "un_activo_por_usuario",
+            "unique": True,
+            "partialFilterExpression": {"completado": False},
+        }),
+    ],
+    "usuario_gym": [
+        ([("user_id", ASCENDING)], {"name": "user_id", "unique": True}),
+    ],
+    COLECCION_HISTORIAL: INDICES_HISTORIAL,
+    COLECCION_ROLLUP: INDICES_ROLLUP,
+}
+
+# (coleccion, filtro, orden, limite) de las consultas que se hacen en cada carga
+CONSULTAS_CANONICAS = [
+    ("gimnasio", {}, [("fecha", DESCENDING)], 30),
+    ("gimnasio", {"fecha": {"$gte": "2000-01-01"}}, None, 0),
+    ("gimnasio", {"$or": [{"fecha": {"$lt": "2000-01-01"}}, {"fecha": "2000-01-01", "_id": {"$lt": ObjectId()}}]},
+     [("fecha", DESCENDING), ("_id", DESCENDING)], 50),
+    ("gimnasio", {"id": ""}, None, 1),
+    ("entrenamiento_activo", {"completado": False}, None, 1),
+    ("entrenamiento_chat", {"usuario_id": "", "completado": False}, None, 1),
+    ("usuario_gym", {"user_id": "default"}, None, 1),
+    # Prefijo anclado: un $regex sin ^ recorre el índice completo y no cuenta como uso real
+    (COLECCION_HISTORIAL, {"ejercicio_norm": {"$regex": "^press"}}, None, 0),
+    (COLECCION_HISTORIAL, {"entrenamiento_id": {"$in": [ObjectId()]}}, None, 0),
+    (COLECCION_ROLLUP, {"semana": {"$gte": "2000-01-01"}}, [("semana", ASCENDING)], 0),
+]
+
+
+def crear_indices(db) -> List[str]:
+    """Crea los índices declarados. Devuelve los que no se pudieron crear."""
+    fallidos = []
+    for coleccion, indices in INDICES.items():
+        for claves, opciones in indices:
+            try:
+                db[coleccion].create_index(claves, **opciones)
+            except OperationFailure as e:
+                # Ej: datos duplicados que impiden un índice único
+                logger.error(f"No se pudo crear el índice {coleccion}.{opciones['name']}: {e}")
+                fallidos.append(f"{coleccion}.{opciones['name']}")
+    return fallidos
+
+
+def _etapas(plan) -> List[str]:
+    """Recorre un plan de explain() y devuelve todas sus etapas"""
+    etapas = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            etapas.append(plan["stage"])
+        for valor in plan.values():
+            etapas.extend(_etapas(valor))
+    elif isinstance(plan, list):
+        for valor in plan:
+            etapas.extend(_etapas(valor))
+    return etapas
+
+
+def verificar_consultas(db) -> List[dict]:
+    """Ejecuta explain() sobre las consultas canónicas y devuelve las que hacen COLLSCAN"""
+    collscans = []
+    for coleccion, filtro, orden, limite in CONSULTAS_CANONICAS:
+        cursor = db[coleccion].find(filtro)
+        if orden:
+            cursor = cursor.sort(orden)
+        if limite:
+            cursor = cursor.limit(limite)
+        plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in _etapas(plan):
+            collscans.append({"coleccion": coleccion, "filtro": str(filtro), "orden": str(orden)})
+    return collscans
+
+
+def provisionar_indices(db, estricto: bool = False) -> dict:
+    """
+    Crea los índices y verifica los planes de las consultas canónicas.
+
+    Args:
+        estricto: Si es True lanza RuntimeError cuando algo falla (no arranca)
+
+    Returns:
+        Índices fallidos y consultas que hacen COLLSCAN
+    """
+    fallidos = crear_indices(db)
+    collscans = verificar_consultas(db)
+
+    for c in collscans:
+        logger.warning(f"COLLSCAN en {c['coleccion']} con filtro {c['filtro']} orden {c['orden']}")
+
+    if estricto and (fallidos or collscans):
+        raise RuntimeError(f"Verificación de índices fallida: {len(fallidos)} índices, {len(collscans)} COLLSCAN")
+
+    if not fallidos and not collscans:
+        logger.info("Índices verificados: ninguna consulta canónica hace COLLSCAN")
+
+    return {"indices_fallidos": fallidos, "collscans": collscans}
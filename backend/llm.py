@@ -0,0 +1,167 @@
+"""
+Gateway de LLM - Trener
+Todas las llamadas a OpenAI pasan por aquí: cliente asíncrono, un semáforo
+que limita las llamadas simultáneas, timeout por llamada y métricas de la
+espera en cola. Una conversación lenta ya no bloquea el event loop.
+"""
+
+import asyncio
+import threading
+import time
+from typing import AsyncIterator, Optional
+
+import anyio
+from openai import AsyncOpenAI
+
+
+class GatewayLLM:
+    """Cliente AsyncOpenAI con concurrencia acotada y métricas"""
+
+    def __init__(self, api_key: Optional[str], concurrencia: int = 4, timeout: float = 60.0,
+                 espera_maxima: float = 30.0):
+        """
+        Args:
+            concurrencia: Llamadas simultáneas permitidas a OpenAI
+            timeout: Segundos máximos por llamada (sin contar la cola)
+            espera_maxima: Segundos máximos esperando turno en la cola
+        """
+        self.client = AsyncOpenAI(api_key=api_key, timeout=timeout, max_retries=1)
+        self.concurrencia = concurrencia
+        self.timeout = timeout
+        self.espera_maxima = espera_maxima
+        self._semaforo = asyncio.Semaphore(concurrencia)
+        self._lock = threading.Lock()
+        self._metricas = {
+            "llamadas": 0,
+            "errores": 0,
+            "timeouts": 0,
+            "rechazadas_cola": 0,
+            "en_cola": 0,
+            "activas": 0,
+            "espera_total_ms": 0.0,
+            "espera_max_ms": 0.0,
+            "duracion_total_ms": 0.0,
+        }
+
+    def _sumar(self, **valores):
+        with self._lock:
+            for clave, valor in valores.items():
+                self._metricas[clave] += valor
+
+    async def _esperar_turno(self) -> float:
+        """Espera un lugar en el semáforo; devuelve los ms de espera"""
+        inicio = time.perf_counter()
+        self._sumar(en_cola=1)
+        try:
+            await asyncio.wait_for(self._semaforo.acquire(), self.espera_maxima)
+        except asyncio.TimeoutError:
+            self._sumar(rechazadas_cola=1)
+            raise
+        finally:
+            self._sumar(en_cola=-1)
+
+        espera_ms = (time.perf_counter() - inicio) * 1000
+        with self._lock:
+            self._metricas["espera_max_ms"] = max(self._metricas["espera_max_ms"], espera_ms)
+        self._sumar(activas=1, llamadas=1, espera_total_ms=espera_ms)
+        return espera_ms
+
+    def _liberar(self, inicio_llamada: float):
+        self._semaforo.release()
+        self._sumar(activas=-1, duracion_total_ms=(time.perf_counter() - inicio_llamada) * 1000)
+
+    async def completar(self, timeout: Optional[float] = None, **kwargs):
+        """
+        Ejecuta chat.completions.create esperando turno en el semáforo.
+
+        Raises:
+            asyncio.TimeoutError: Si la cola o la llamada superan su límite
+        """
+        await self._esperar_turno()
+        inicio_llamada = time.perf_counter()
+        try:
+            return await asyncio.wait_for(
+                self.client.chat.completions.create(**kwargs),
+                timeout or self.timeout
+            )
+        except asyncio.TimeoutError:
+            self._sumar(timeouts=1)
+            raise
+        except Exception:
+            self._sumar(errores=1)
+            raise
+        finally:
+            self._liberar(inicio_llamada)
+
+    async def transmitir(self, timeout: Optional[float] = None, **kwargs) -> AsyncIterator:
+        """
+        Como completar() pero con stream=True: produce los chunks a medida
+        que llegan. El timeout aplica a la primera respuesta y a la espera de
+        cada chunk, así un stream que se queda colgado suelta su turno en el
+        semáforo (que se mantiene hasta terminar el stream).
+
+        Raises:
+            asyncio.TimeoutError: Si la cola, la respuesta o un chunk superan su límite
+        """
+        limite = timeout or self.timeout
+        await self._esperar_turno()
+        inicio_llamada = time.perf_counter()
+        stream = None
+        try:
+            stream = await asyncio.wait_for(
+                self.client.chat.completions.create(stream=True, **kwargs),
+                limite
+            )
+            chunks = stream.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), limite)
+                except StopAsyncIteration:
+                    break
+                yield chunk
+        except asyncio.TimeoutError:
+            self._sumar(timeouts=1)
+            raise
+        except Exception:
+            self._sumar(errores=1)
+            raise
+        finally:
+            if stream is not None:
+                # Cierra la conexión HTTP del stream (timeout o cliente desconectado)
+                await stream.close()
+            self._liberar(inicio_llamada)
+
+    def completar_sync(self, timeout: Optional[float] = None, **kwargs):
+        """
+        Versión para endpoints síncronos (corren en el threadpool de FastAPI):
+        la llamada se ejecuta en el event loop y respeta el mismo semáforo.
+        """
+        return anyio.from_thread.run(lambda: self.completar(timeout=timeout, **kwargs))
+
+    def metricas(self) -> dict:
+        """Contadores para monitoreo"""
+        with self._lock:
+            m = dict(self._metricas)
+        llamadas = m["llamadas"]
+        return {
+            "concurrencia": self.concurrencia,
+            "timeout_s": self.timeout,
+            "llamadas": llamadas,
+            "activas": m["activas"],
+            "en_cola": m["en_cola"],
+            "errores": m["errores"],
+            "timeouts": m["timeouts"],
+            "rechazadas_cola": m["rechazadas_cola"],
+            "espera_media_ms": round(m["espera_total_ms"] / llamadas, 1) if llamadas else 0,
+            "espera_max_ms": round(m["espera_max_ms"], 1),
+            "duracion_media_ms": round(m["duracion_total_ms"] / llamadas, 1) if llamadas else 0,
+        }
+
+
+def tokens_uso(uso) -> int:
+    """total_tokens de un objeto usage (o dict, en los chunks de stream)"""
+    if not uso:
+        return 0
+    if isinstance(uso, dict):
+        return uso.get("total_tokens", 0) or 0
+    return getattr(uso, "total_tokens", 0) or 0
@@ -1,15 +1,21 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pymongo import MongoClient
+from pymongo import MongoClient, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
 from bson import ObjectId
-from pydantic import BaseModel, Field
-from typing import List, Optional, Union
+from pydantic import BaseModel, Field, ValidationError
+from typing import Iterable, List, Optional, Union
 from datetime import date, datetime, timedelta
+from contextlib import asynccontextmanager
 import os
+import time
+import asyncio
+import pymongo
 import json
 import logging
 from dotenv import load_dotenv
-from openai import OpenAI
 import httpx
 
 # Configurar logging
@@ -33,12 +39,52 @@ from mcp_mongo import (
     consulta_personalizada,
     agregacion_personalizada,
     resumen_semanal,
-    comparar_semanas
+    comparar_semanas,
+    estimar_tokens
 )
+from normalizacion import agregar_metricas, extraer_palabras_clave
+from historial import COLECCION_HISTORIAL, registrar_series, eliminar_series
+from rollup import (
+    COLECCION_ROLLUP, aplicar_entrenamiento, aplicar_entrenamientos, leer_semana,
+    reconstruir_rollup, rollup_desactualizado
+)
+from indices import provisionar_indices
+from cache import CacheVersionada
+from difusion import Difusor
+from analitica import modelo_analitico
+import analitica_pipeline
+from llm import GatewayLLM, tokens_uso
+from serializacion import RespuestaMongo
+from exportacion import comprimir_gzip, filtro_exportacion, lineas_ndjson
+from importacion import FORMATOS, CuerpoDemasiadoGrande, en_lotes, leer_filas, volcar_cuerpo
+from paginacion import (
+    LIMITE_MAXIMO, ORDEN_PAGINACION, codificar_cursor, filtro_despues, filtro_rango, proyeccion
+)
+from parser_ejercicios import UMBRAL_CONFIANZA, parsear_ejercicio, normalizar_nombre_ejercicio
 
 load_dotenv()
 
-app = FastAPI(title="Trener API", description="API para gestionar entrenamientos de gimnasio")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Arranque: crea y verifica los índices de MongoDB, valida ANALITICA_MOTOR, reconstruye el rollup si cambió de versión y carga el modelo analítico"""
+    global ANALITICA_MOTOR
+    estricto = os.getenv("INDICES_ESTRICTO", "false").lower() in ("1", "true", "si")
+    app.state.indices = provisionar_indices(db, estricto=estricto)
+    if ANALITICA_MOTOR not in ("memoria", "pipeline"):
+        logger.warning(f"ANALITICA_MOTOR={ANALITICA_MOTOR} no existe, se usa memoria")
+        ANALITICA_MOTOR = "memoria"
+    elif ANALITICA_MOTOR == "pipeline" and not analitica_pipeline.servidor_compatible(db):
+        logger.warning("ANALITICA_MOTOR=pipeline requiere MongoDB 5.0+ ($dateTrunc), se usa memoria")
+        ANALITICA_MOTOR = "memoria"
+    if rollup_desactualizado(rollup_collection):
+        logger.warning(f"Rollup semanal con claves de otra versión, reconstruyendo: {reconstruir_rollup(db)}")
+    modelo_analitico.cargar(collection)
+    logger.info(f"Modelo analítico cargado: {modelo_analitico.estadisticas()}")
+    yield
+
+
+app = FastAPI(title="Trener API", description="API para gestionar entrenamientos de gimnasio", lifespan=lifespan)
 
 # CORS - Deshabilitado porque nginx ya lo maneja en producción
 # Si corres localmente, descomenta esto:
@@ -62,9 +108,21 @@ entrenamiento_activo_collection = db["entrenamiento_activo"]
 equipamiento_collection = db["equipamiento"]
 logros_collection = db["logros"]
 usuario_collection = db["usuario_gym"]
+historial_collection = db[COLECCION_HISTORIAL]
+rollup_collection = db[COLECCION_ROLLUP]
+
+# Snapshot de estadísticas, invalidado en cada escritura a gimnasio
+cache_estadisticas = CacheVersionada("estadisticas")
 
-# OpenAI
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Cambios del entrenamiento activo para los suscriptores de /eventos
+difusion_activo = Difusor("entrenamiento_activo")
+
+# OpenAI, con concurrencia acotada y timeout por llamada
+gateway_llm = GatewayLLM(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    concurrencia=int(os.getenv("LLM_CONCURRENCIA", "4")),
+    timeout=float(os.getenv("LLM_TIMEOUT", "60"))
+)
 
 # Matrix config
 MATRIX_HOMESERVER = os.getenv("MATRIX_HOMESERVER", "https://matrix.juanmontoya.me")
@@ -144,6 +202,14 @@ class ActualizarEjercicioRequest(BaseModel):
     serie: SerieRealizada
 
 
+class SerieLote(ActualizarEjercicioRequest):
+    seq: int  # Número de secuencia del cliente; una serie con seq repetido se ignora
+
+
+class RegistrarSeriesRequest(BaseModel):
+    series: List[SerieLote]
+
+
 class FinalizarEntrenamientoRequest(BaseModel):
     enviar_matrix: bool = True
 
@@ -209,7 +275,8 @@ def health_check():
         return {
             "status": "healthy",
             "database": "connected",
-            "version": "1.1.0"
+            "version": "1.1.0",
+            "indices": getattr(app.state, "indices", None)
         }
     except Exception as e:
         logger.error(f"Health check fallido: {e}")
@@ -220,32 +287,13 @@ def health_check():
         }
 
 
-# ---- Utilidades compartidas ----
-
-PALABRAS_IGNORAR = {'de', 'con', 'en', 'la', 'el', 'las', 'los', 'a', 'y', 'o', 'para', 'al'}
-
-
-def extraer_palabras_clave(texto: str) -> List[str]:
-    """Extrae palabras clave de un texto, ignorando palabras comunes"""
-    return [p for p in texto.lower().strip().split() if p not in PALABRAS_IGNORAR and len(p) > 2]
+@app.get("/api/llm/metricas")
+def get_llm_metricas():
+    """Métricas del gateway de OpenAI: cola, concurrencia y timeouts"""
+    return gateway_llm.metricas()
 
 
-def normalizar_peso(peso) -> Optional[float]:
-    """Normaliza un valor de peso a float, retorna None si no es válido"""
-    if peso is None or peso == "ajustar" or peso == "peso corporal":
-        return None
-    if isinstance(peso, list):
-        validos = [p for p in peso if isinstance(p, (int, float))]
-        return max(validos) if validos else None
-    if isinstance(peso, (int, float)):
-        return float(peso)
-    if isinstance(peso, str):
-        try:
-            return float(peso)
-        except ValueError:
-            return None
-    return None
-
+# ---- Utilidades compartidas ----
 
 def limpiar_json_ai(respuesta: str) -> str:
     """Limpia una respuesta de AI que puede venir con markdown"""
@@ -256,50 +304,141 @@ def limpiar_json_ai(respuesta: str) -> str:
     return respuesta.strip()
 
 
+def guardar_entrenamiento(doc: dict):
+    """Inserta un entrenamiento en gimnasio y mantiene las colecciones derivadas"""
+    agregar_metricas(doc)
+    result = collection.insert_one(doc)
+    modelo_analitico.agregar(doc)
+    # Después del modelo: un cálculo concurrente con la versión nueva ya lo ve actualizado
+    cache_estadisticas.invalidar()
+    try:
+        registrar_series(historial_collection, [doc])
+    except Exception as e:
+        logger.error(f"Error registrando historial de {result.inserted_id}: {e} (ejecuta migraciones.py historial-series)")
+    try:
+        aplicar_entrenamiento(rollup_collection, doc, 1)
+    except Exception as e:
+        logger.error(f"Error actualizando rollup de {result.inserted_id}: {e} (ejecuta migraciones.py rollup-semanal)")
+    return result
+
+
+def guardar_entrenamientos(docs: List[dict]) -> List[dict]:
+    """
+    Versión por lotes de guardar_entrenamiento: un insert_many sin orden (un
+    documento fallido no detiene al resto) y colecciones derivadas en bloque.
+    Devuelve los documentos insertados.
+    """
+    for doc in docs:
+        agregar_metricas(doc)
+    try:
+        collection.insert_many(docs, ordered=False)
+        insertados = docs
+    except BulkWriteError as e:
+        fallidos = {err["index"] for err in e.details.get("writeErrors", [])}
+        insertados = [doc for i, doc in enumerate(docs) if i not in fallidos]
+    if not insertados:
+        return insertados
+
+    for doc in insertados:
+        modelo_analitico.agregar(doc)
+    cache_estadisticas.invalidar()
+    try:
+        registrar_series(historial_collection, insertados)
+    except Exception as e:
+        logger.error(f"Error registrando historial de {len(insertados)} entrenamientos: {e} (ejecuta migraciones.py historial-series)")
+    try:
+        aplicar_entrenamientos(rollup_collection, insertados)
+    except Exception as e:
+        logger.error(f"Error actualizando rollup de {len(insertados)} entrenamientos: {e} (ejecuta migraciones.py rollup-semanal)")
+    return insertados
+
+
+def borrar_entrenamiento(filtro: dict) -> Optional[dict]:
+    """Elimina un entrenamiento de gimnasio y sus colecciones derivadas"""
+    doc = collection.find_one_and_delete(filtro)
+    if doc:
+        modelo_analitico.eliminar(doc["_id"])
+        cache_estadisticas.invalidar()
+        try:
+            eliminar_series(historial_collection, doc["_id"])
+        except Exception as e:
+            logger.error(f"Error borrando historial de {doc['_id']}: {e} (ejecuta migraciones.py historial-series)")
+        try:
+            aplicar_entrenamiento(rollup_collection, doc, -1)
+        except Exception as e:
+            logger.error(f"Error actualizando rollup de {doc['_id']}: {e} (ejecuta migraciones.py rollup-semanal)")
+    return doc
+
+
 @app.get("/api/debug/pesos/{ejercicio}")
 def debug_pesos(ejercicio: str):
     """Debug: ver qué peso encuentra para un ejercicio"""
     try:
-        historial = list(collection.find({}).sort("fecha", -1).limit(20))
-        
-        nombre_lower = ejercicio.lower().strip()
-        palabras_ignorar = {'de', 'con', 'en', 'la', 'el', 'las', 'los', 'a', 'y', 'o', 'para'}
-        palabras_clave = [p for p in nombre_lower.split() if p not in palabras_ignorar and len(p) > 2]
+        modelo_analitico.asegurar_cargado(collection)
         
         matches = []
-        for doc in historial:
-            for ej in doc.get("ejercicios", []):
-                ej_nombre = ej.get("nombre", "").lower()
-                score = sum(1 for p in palabras_clave if p in ej_nombre)
-                if score > 0:
-                    matches.append({
-                        "ejercicio_historial": ej.get("nombre"),
-                        "peso": ej.get("peso_kg"),
-                        "score": score,
-                        "fecha": doc.get("fecha")
-                    })
-        
-        matches.sort(key=lambda x: x["score"], reverse=True)
-        
-        peso_sugerido = obtener_ultimo_peso(ejercicio, ["pecho", "biceps"])
+        for resultado in modelo_analitico.buscar(ejercicio, limite=10):
+            ultimo = modelo_analitico.ultimo_peso(resultado["apariciones"])
+            matches.append({
+                "ejercicio_historial": resultado["apariciones"][-1]["nombre"],
+                "peso": ultimo["peso"] if ultimo else None,
+                "score": resultado["score"],
+                "fecha": ultimo["fecha"] if ultimo else None,
+                "apariciones": len(resultado["apariciones"])
+            })
+        
+        sugerencia = sugerir_pesos([ejercicio], ["pecho", "biceps"])[0]
         
         return {
             "ejercicio_buscado": ejercicio,
-            "palabras_clave": palabras_clave,
-            "total_entrenamientos": len(historial),
-            "matches_encontrados": matches[:10],
-            "peso_sugerido": peso_sugerido
+            "palabras_clave": extraer_palabras_clave(ejercicio),
+            "indice": modelo_analitico.estadisticas(),
+            "matches_encontrados": matches,
+            "peso_sugerido": sugerencia["peso"],
+            "fuente": sugerencia["fuente"]
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/entrenamientos", response_model=List[dict])
-def get_entrenamientos():
-    """Obtener todos los entrenamientos"""
+@app.get("/api/entrenamientos", response_class=RespuestaMongo)
+def get_entrenamientos(
+    limit: Optional[int] = None,
+    after: Optional[str] = None,
+    desde: Optional[str] = None,
+    hasta: Optional[str] = None,
+    fields: Optional[str] = None,
+    incluir_total: bool = False
+):
+    """
+    Obtener entrenamientos. Sin `limit` devuelve la lista completa (contrato
+    original); con `limit` devuelve una página ordenada por fecha desc y el
+    cursor `siguiente` para pedir la próxima con `after`.
+    `fields` ("fecha,nombre,tipo") limita los campos de cada documento.
+    """
     try:
-        docs = list(collection.find({}))
-        return [serialize_doc(doc) for doc in docs]
+        filtro = filtro_rango(desde, hasta)
+        campos = proyeccion(fields)
+        
+        if limit is None:
+            return RespuestaMongo(list(collection.find(filtro, campos)))
+        
+        limit = max(1, min(limit, LIMITE_MAXIMO))
+        filtro_pagina = {**filtro, **filtro_despues(after)} if after else filtro
+        # Se pide uno de más para saber si hay página siguiente
+        docs = list(collection.find(filtro_pagina, campos).sort(ORDEN_PAGINACION).limit(limit + 1))
+        hay_mas = len(docs) > limit
+        docs = docs[:limit]
+        
+        pagina = {
+            "entrenamientos": docs,
+            "siguiente": codificar_cursor(docs[-1]) if hay_mas else None
+        }
+        if incluir_total:
+            pagina["total"] = collection.count_documents(filtro)
+        return RespuestaMongo(pagina)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -332,25 +471,159 @@ def create_entrenamiento(entrenamiento: EntrenamientoCreate):
         if not doc.get("id"):
             doc["id"] = f"{doc['fecha']}-{doc['tipo']}-{ObjectId()}"
         
-        result = collection.insert_one(doc)
+        result = guardar_entrenamiento(doc)
         doc["_id"] = str(result.inserted_id)
         return {"success": True, "entrenamiento": doc}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Errores (y filas omitidas) por fila que se devuelven en el detalle de una importación
+MAX_ERRORES_IMPORTACION = 100
+
+# Tamaño máximo del cuerpo de /api/entrenamientos/importar
+IMPORTACION_MAX_MB = float(os.getenv("IMPORTACION_MAX_MB", "100"))
+
+
+def clave_importacion(doc: dict):
+    """Identidad de un entrenamiento importado: su id o, sin id, (fecha, nombre)"""
+    return doc["id"] if doc.get("id") else (doc["fecha"], doc["nombre"])
+
+
+def claves_existentes(docs: List[dict]) -> set:
+    """Claves de importación de `docs` que ya están en gimnasio (una consulta por tipo de clave)"""
+    ids = [doc["id"] for doc in docs if doc.get("id")]
+    fechas = list({doc["fecha"] for doc in docs if not doc.get("id")})
+    existentes = set()
+    if ids:
+        existentes.update(d["id"] for d in collection.find({"id": {"$in": ids}}, {"id": 1}))
+    if fechas:
+        existentes.update(
+            (d.get("fecha"), d.get("nombre"))
+            for d in collection.find({"fecha": {"$in": fechas}}, {"fecha": 1, "nombre": 1})
+        )
+    return existentes
+
+
+def importar_entrenamientos(lineas: Iterable[str], formato: str) -> dict:
+    """
+    Valida y guarda por lotes las filas de un NDJSON/CSV. Un entrenamiento que
+    ya existe (mismo id o, sin id, misma fecha y nombre) se omite y se
+    reporta, así reimportar un export no duplica el historial.
+    """
+    inicio = time.perf_counter()
+    recibidos = insertados = 0
+    errores = []
+    errores_total = 0
+    omitidos = []
+    omitidos_total = 0
+    vistos = set()
+
+    def registrar_error(linea: int, error: str):
+        nonlocal errores_total
+        errores_total += 1
+        if len(errores) < MAX_ERRORES_IMPORTACION:
+            errores.append({"linea": linea, "error": error})
+
+    def registrar_omitido(linea: int, clave):
+        nonlocal omitidos_total
+        omitidos_total += 1
+        if len(omitidos) < MAX_ERRORES_IMPORTACION:
+            omitidos.append({"linea": linea, "clave": clave if isinstance(clave, str) else " / ".join(clave)})
+
+    for lote in en_lotes(leer_filas(lineas, formato)):
+        validos = []
+        for linea, fila in lote:
+            recibidos += 1
+            if isinstance(fila, str):
+                registrar_error(linea, fila)
+                continue
+            try:
+                doc = EntrenamientoCreate.model_validate(fila).model_dump()
+            except ValidationError as e:
+                registrar_error(linea, "; ".join(
+                    f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+                ))
+                continue
+            validos.append((linea, doc))
+
+        existentes = claves_existentes([doc for _, doc in validos])
+        docs, lineas = [], []
+        for linea, doc in validos:
+            clave = clave_importacion(doc)
+            # Ya en la base o repetido dentro del mismo archivo
+            if clave in existentes or clave in vistos:
+                registrar_omitido(linea, clave)
+                continue
+            vistos.add(clave)
+            if not doc.get("id"):
+                doc["id"] = f"{doc['fecha']}-{doc['tipo']}-{ObjectId()}"
+            docs.append(doc)
+            lineas.append(linea)
+
+        if not docs:
+            continue
+        guardados = {id(doc) for doc in guardar_entrenamientos(docs)}
+        insertados += len(guardados)
+        for doc, linea in zip(docs, lineas):
+            if id(doc) not in guardados:
+                registrar_error(linea, f"No se pudo insertar {doc['id']}")
+
+    segundos = time.perf_counter() - inicio
+    return {
+        "success": True,
+        "formato": formato,
+        "recibidos": recibidos,
+        "insertados": insertados,
+        "omitidos_total": omitidos_total,
+        "omitidos": omitidos,
+        "errores_total": errores_total,
+        "errores": errores,
+        "segundos": round(segundos, 3),
+        "docs_por_segundo": round(insertados / segundos, 1) if segundos else insertados,
+    }
+
+
+@app.post("/api/entrenamientos/importar")
+async def importar_entrenamientos_endpoint(request: Request, formato: Optional[str] = None):
+    """
+    Importación masiva de historial. El cuerpo es NDJSON (un entrenamiento
+    por línea) o CSV (un ejercicio por fila, ver importacion.py); el formato
+    sale de `formato` o del Content-Type. Las filas inválidas se reportan
+    sin abortar el resto; los entrenamientos que ya existen se omiten
+    (`omitidos`). El cuerpo se lee en streaming hasta IMPORTACION_MAX_MB.
+    """
+    if not formato:
+        tipo_contenido = request.headers.get("content-type", "")
+        formato = "csv" if "csv" in tipo_contenido else "ndjson"
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail=f"Formato no soportado. Usa: {', '.join(FORMATOS)}")
+    max_bytes = int(IMPORTACION_MAX_MB * 1024 * 1024)
+    if int(request.headers.get("content-length") or 0) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"El cuerpo supera el máximo de {IMPORTACION_MAX_MB:g} MB")
+    try:
+        with await volcar_cuerpo(request.stream(), max_bytes) as lineas:
+            return await run_in_threadpool(importar_entrenamientos, lineas, formato)
+    except CuerpoDemasiadoGrande:
+        raise HTTPException(status_code=413, detail=f"El cuerpo supera el máximo de {IMPORTACION_MAX_MB:g} MB")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.delete("/api/entrenamientos/{entrenamiento_id}")
 def delete_entrenamiento(entrenamiento_id: str):
     """Eliminar un entrenamiento"""
     try:
         # Intentar eliminar por _id de MongoDB
         try:
-            result = collection.delete_one({"_id": ObjectId(entrenamiento_id)})
+            eliminado = borrar_entrenamiento({"_id": ObjectId(entrenamiento_id)})
         except:
             # Si no es un ObjectId válido, eliminar por campo 'id'
-            result = collection.delete_one({"id": entrenamiento_id})
+            eliminado = borrar_entrenamiento({"id": entrenamiento_id})
         
-        if result.deleted_count == 0:
+        if not eliminado:
             raise HTTPException(status_code=404, detail="Entrenamiento no encontrado")
         return {"success": True}
     except HTTPException:
@@ -363,44 +636,48 @@ def delete_entrenamiento(entrenamiento_id: str):
 def get_estadisticas():
     """Obtener estadísticas generales"""
     try:
-        docs = list(collection.find({}))
-        
-        total_entrenamientos = len(docs)
-        total_ejercicios = sum(len(doc.get("ejercicios", [])) for doc in docs)
-        
-        # Contar por tipo
-        por_tipo = {}
-        for doc in docs:
-            tipo = doc.get("tipo", "otro")
-            por_tipo[tipo] = por_tipo.get(tipo, 0) + 1
-        
-        # Contar por grupo muscular
-        por_grupo = {}
-        for doc in docs:
-            for grupo in doc.get("grupos_musculares", []):
-                por_grupo[grupo] = por_grupo.get(grupo, 0) + 1
-        
-        # Ejercicios únicos
-        ejercicios_unicos = set()
-        for doc in docs:
-            for ej in doc.get("ejercicios", []):
-                ejercicios_unicos.add(ej.get("nombre", ""))
-        
-        # Fechas únicas
-        fechas = set(doc.get("fecha") for doc in docs if doc.get("fecha"))
-        
-        return {
-            "totalEntrenamientos": total_entrenamientos,
-            "totalEjercicios": total_ejercicios,
-            "ejerciciosUnicos": len(ejercicios_unicos),
-            "diasEntrenados": len(fechas),
-            "porTipo": por_tipo,
-            "porGrupo": por_grupo,
-        }
+        # Si el modelo se recargó por escrituras de fuera del proceso, el snapshot también caduca
+        if modelo_analitico.asegurar_cargado(collection):
+            cache_estadisticas.invalidar()
+        return cache_estadisticas.obtener("estadisticas", calcular_estadisticas)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/estadisticas/cache")
+def get_estadisticas_cache():
+    """Métricas de hits/misses del cache de estadísticas"""
+    return cache_estadisticas.metricas()
+
+
+# memoria: modelo analítico del proceso y rollup semanal; pipeline: totales,
+# grupos, ejercicios frecuentes y volumen agregados en MongoDB en cada consulta.
+# PRs, 1RM, progreso por ejercicio y sugerencias de peso siempre leen el
+# modelo y el índice del proceso.
+ANALITICA_MOTOR = os.getenv("ANALITICA_MOTOR", "memoria")
+
+
+def totales_analiticos() -> dict:
+    if ANALITICA_MOTOR == "pipeline":
+        return analitica_pipeline.totales(collection)
+    modelo_analitico.asegurar_cargado(collection)
+    return modelo_analitico.totales()
+
+
+def calcular_estadisticas() -> dict:
+    """Estadísticas generales a partir del modelo analítico"""
+    totales = totales_analiticos()
+    
+    return {
+        "totalEntrenamientos": totales["entrenamientos"],
+        "totalEjercicios": totales["ejercicios"],
+        "ejerciciosUnicos": totales["ejercicios_unicos"],
+        "diasEntrenados": totales["dias"],
+        "porTipo": totales["por_tipo"],
+        "porGrupo": {grupo: datos["entrenamientos"] for grupo, datos in totales["por_grupo"].items()},
+    }
+
+
 @app.post("/api/generar-rutina")
 def generar_rutina(request: GenerarRutinaRequest):
     """Generar una rutina con OpenAI"""
@@ -459,7 +736,7 @@ IMPORTANTE:
 - 3-4 series por ejercicio como mínimo
 - Empieza con compuestos pesados, termina con aislados"""
 
-        completion = openai_client.chat.completions.create(
+        completion = gateway_llm.completar_sync(
             model="gpt-5-mini",
             messages=[
                 {"role": "system", "content": "Eres un entrenador experto. Solo respondes con JSON válido."},
@@ -482,89 +759,108 @@ IMPORTANTE:
         
         # Calcular pesos reales basados en historial
         grupos = rutina.get("grupos_musculares", [])
-        for ejercicio in rutina.get("ejercicios", []):
-            nombre = ejercicio.get("nombre", "")
-            peso_sugerido = obtener_ultimo_peso(nombre, grupos)
-            ejercicio["peso_kg"] = peso_sugerido
-            logger.info(f"Rutina generada - {nombre} -> {peso_sugerido}")
+        ejercicios = rutina.get("ejercicios", [])
+        sugerencias = sugerir_pesos([ej.get("nombre", "") for ej in ejercicios], grupos)
+        for ejercicio, sugerencia in zip(ejercicios, sugerencias):
+            ejercicio["peso_kg"] = sugerencia["peso"]
+            logger.info(f"Rutina generada - {sugerencia['ejercicio']} -> {sugerencia['peso']}")
 
         return {"rutina": rutina}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-# ================= ENTRENAMIENTO ACTIVO =================
+# ================= EXPORTACIÓN =================
 
-def obtener_ultimo_peso(nombre_ejercicio: str, grupos_musculares: List[str]) -> Union[int, float, str]:
-    """Busca el último peso usado para un ejercicio en el historial"""
-    
-    # Normalizar nombre para búsqueda
-    nombre_lower = nombre_ejercicio.lower().strip()
-    
-    # Extraer palabras clave del ejercicio (ignorar palabras comunes)
-    palabras_ignorar = {'de', 'con', 'en', 'la', 'el', 'las', 'los', 'a', 'y', 'o', 'para', 'al'}
-    palabras_clave = [p for p in nombre_lower.split() if p not in palabras_ignorar and len(p) > 2]
-    
-    logger.debug(f"Buscando peso para: {nombre_ejercicio} | Palabras: {palabras_clave} | Grupos: {grupos_musculares}")
-    
-    # Buscar en todos los entrenamientos recientes
-    historial = list(collection.find({}).sort("fecha", -1).limit(30))
-    logger.debug(f"Entrenamientos en historial: {len(historial)}")
-    
-    mejor_match = None
-    mejor_score = 0
-    mejor_nombre = ""
+@app.get("/api/exportar")
+def exportar(
+    coleccion: str = "gimnasio",
+    desde: Optional[str] = None,
+    hasta: Optional[str] = None,
+    gzip: bool = False
+):
+    """
+    Exporta una colección completa como NDJSON en streaming (un documento
+    por línea). Con gzip=true la respuesta va comprimida.
+    """
+    try:
+        filtro = filtro_exportacion(coleccion, desde, hasta)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    for doc in historial:
-        for ej in doc.get("ejercicios", []):
-            ej_nombre = ej.get("nombre", "").lower()
-            
-            # Calcular score de coincidencia
-            score = 0
-            for palabra in palabras_clave:
-                if palabra in ej_nombre:
-                    score += 1
-            
-            # Si hay al menos UNA palabra clave que coincide
-            if score >= 1:
-                peso = ej.get("peso_kg")
-                if peso and peso != "ajustar":
-                    if score > mejor_score:
-                        mejor_score = score
-                        mejor_nombre = ej.get("nombre")
-                        if isinstance(peso, list):
-                            mejor_match = max(peso)
-                        else:
-                            mejor_match = peso
+    bloques = lineas_ndjson(db, coleccion, filtro)
+    nombre = f"{coleccion}-{date.today().isoformat()}.ndjson"
+    if gzip:
+        bloques = comprimir_gzip(bloques)
+        nombre += ".gz"
     
-    if mejor_match is not None:
-        logger.debug(f"Match encontrado: {mejor_nombre} -> {mejor_match}kg (score: {mejor_score})")
-        return mejor_match
+    return StreamingResponse(
+        bloques,
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{nombre}"'}
+    )
+
+
+# ================= ENTRENAMIENTO ACTIVO =================
+
+def sugerir_pesos(nombres_ejercicios: List[str], grupos_musculares: List[str]) -> List[dict]:
+    """
+    Sugiere el peso de varios ejercicios usando el índice de nombres del modelo analítico.
     
-    # Si no encontró por nombre, buscar promedio por grupo muscular
-    logger.debug(f"No match por nombre, buscando por grupo muscular...")
-    pesos_grupo = []
-    grupos_lower = [g.lower() for g in grupos_musculares]
+    Returns:
+        Por cada ejercicio (mismo orden): peso sugerido, ejercicio del historial
+        usado como fuente y score BM25 de coincidencia
+    """
+    modelo_analitico.asegurar_cargado(collection)
     
-    for doc in historial:
-        doc_grupos = [g.lower() for g in doc.get("grupos_musculares", [])]
-        # Verificar si hay intersección de grupos
-        if any(g in doc_grupos for g in grupos_lower):
-            for ej in doc.get("ejercicios", []):
-                peso = ej.get("peso_kg")
-                if peso and peso != "ajustar":
-                    if isinstance(peso, list):
-                        pesos_grupo.extend([p for p in peso if isinstance(p, (int, float))])
-                    elif isinstance(peso, (int, float)):
-                        pesos_grupo.append(peso)
+    # Promedio por grupo muscular, solo si algún ejercicio lo necesita
+    promedio_grupo = None
     
-    if pesos_grupo:
-        promedio = round(sum(pesos_grupo) / len(pesos_grupo), 1)
-        logger.debug(f"Promedio grupo muscular: {promedio}kg (de {len(pesos_grupo)} pesos)")
-        return promedio
+    sugerencias = []
+    for nombre_ejercicio in nombres_ejercicios:
+        # Mejor nombre por BM25 que tenga algún peso registrado
+        mejor = None
+        for resultado in modelo_analitico.buscar(nombre_ejercicio, limite=5):
+            ultimo = modelo_analitico.ultimo_peso(resultado["apariciones"])
+            if ultimo:
+                mejor = (ultimo, resultado["score"])
+                break
+        
+        if mejor:
+            ultimo, score = mejor
+            sugerencia = {"ejercicio": nombre_ejercicio, "peso": ultimo["peso"], "fuente": ultimo["nombre"], "score": score}
+        else:
+            if promedio_grupo is None:
+                pesos_grupo = modelo_analitico.pesos_recientes_por_grupo(grupos_musculares)
+                promedio_grupo = round(sum(pesos_grupo) / len(pesos_grupo), 1) if pesos_grupo else "ajustar"
+            if promedio_grupo != "ajustar":
+                sugerencia = {"ejercicio": nombre_ejercicio, "peso": promedio_grupo, "fuente": "promedio_grupo_muscular", "score": 0}
+            else:
+                sugerencia = {"ejercicio": nombre_ejercicio, "peso": "ajustar", "fuente": None, "score": 0}
+        
+        logger.debug(f"Peso sugerido: {nombre_ejercicio} -> {sugerencia['peso']} ({sugerencia['fuente']}, score {sugerencia['score']})")
+        sugerencias.append(sugerencia)
     
-    logger.debug(f"No se encontró peso para '{nombre_ejercicio}', retornando 'ajustar'")
-    return "ajustar"
+    return sugerencias
+
+
+def obtener_ultimo_peso(nombre_ejercicio: str, grupos_musculares: List[str]) -> Union[int, float, str]:
+    """Busca el último peso usado para un ejercicio en el historial"""
+    return sugerir_pesos([nombre_ejercicio], grupos_musculares)[0]["peso"]
+
+
+class SugerirPesosRequest(BaseModel):
+    ejercicios: List[str]
+    grupos_musculares: List[str] = []
+
+
+@app.post("/api/pesos/sugerir")
+def sugerir_pesos_endpoint(request: SugerirPesosRequest):
+    """Sugerir pesos para una lista de ejercicios en una sola consulta"""
+    try:
+        return {"sugerencias": sugerir_pesos(request.ejercicios, request.grupos_musculares)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/api/entrenamiento-activo/iniciar")
@@ -584,11 +880,12 @@ async def iniciar_entrenamiento(entrenamiento: IniciarEntrenamientoRequest):
         
         # Convertir ejercicios al formato de seguimiento con pesos del historial
         ejercicios_activos = []
-        for ej in doc["ejercicios"]:
+        sugerencias = sugerir_pesos([ej.get("nombre", "") for ej in doc["ejercicios"]], grupos)
+        for ej, sugerencia in zip(doc["ejercicios"], sugerencias):
             nombre = ej.get("nombre", "")
             
-            # Buscar último peso en historial
-            peso_historial = obtener_ultimo_peso(nombre, grupos)
+            # Último peso en historial
+            peso_historial = sugerencia["peso"]
             peso_original = ej.get("peso_kg") or ej.get("peso_sugerido", "ajustar")
             
             # Usar peso del historial si existe, sino el original
@@ -612,8 +909,13 @@ async def iniciar_entrenamiento(entrenamiento: IniciarEntrenamientoRequest):
         
         doc["ejercicios"] = ejercicios_activos
         
-        result = entrenamiento_activo_collection.insert_one(doc)
+        try:
+            result = entrenamiento_activo_collection.insert_one(doc)
+        except DuplicateKeyError:
+            # El índice único parcial garantiza un solo entrenamiento activo
+            raise HTTPException(status_code=400, detail="Ya hay un entrenamiento en curso")
         doc["_id"] = str(result.inserted_id)
+        difusion_activo.publicar("iniciado", {"entrenamiento": doc})
         
         # Enviar rutina a Matrix
         mensaje = f"🏋️ ¡Nuevo entrenamiento iniciado!\n\n"
@@ -655,6 +957,38 @@ def get_entrenamiento_activo():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/entrenamiento-activo/eventos")
+async def eventos_entrenamiento_activo():
+    """
+    Cambios del entrenamiento activo por SSE, para dejar de hacer polling.
+    Primero `estado` con el documento completo y después solo deltas:
+    `iniciado`, `serie_agregada`, `series_agregadas`, `ejercicio_completado`,
+    `pesos_recalculados`, `finalizado` y `cancelado`. Cada evento lleva su
+    versión en `id:`; si el cliente se queda atrás se cierra el stream y al
+    reconectar recibe el estado de nuevo.
+    """
+    async def eventos():
+        # Suscribirse antes de leer el estado: ningún cambio cae entre ambos.
+        # Al desconectarse el cliente, el contexto libera la cola
+        async with difusion_activo.suscribir() as suscripcion:
+            activo = await run_in_threadpool(entrenamiento_activo_collection.find_one, {"completado": False})
+            yield evento_sse("estado", {"activo": bool(activo), "entrenamiento": serialize_doc(activo)})
+            async for mensaje in suscripcion:
+                if mensaje is None:
+                    yield ": ping\n\n"
+                    continue
+                version, evento, datos = mensaje
+                yield f"id: {version}\n" + evento_sse(evento, datos)
+
+    return respuesta_sse(eventos())
+
+
+@app.get("/api/entrenamiento-activo/eventos/metricas")
+def metricas_eventos_entrenamiento_activo():
+    """Suscriptores y eventos publicados del canal del entrenamiento activo"""
+    return difusion_activo.metricas()
+
+
 @app.put("/api/entrenamiento-activo/recalcular-pesos")
 def recalcular_pesos():
     """Recalcular pesos sugeridos basándose en el historial"""
@@ -666,19 +1000,24 @@ def recalcular_pesos():
         grupos = activo.get("grupos_musculares", [])
         ejercicios = activo.get("ejercicios", [])
         
-        for ej in ejercicios:
-            nombre = ej.get("nombre", "")
-            peso_actual = ej.get("peso_sugerido")
-            
-            # Si el peso es "ajustar", recalcular
-            if peso_actual == "ajustar" or peso_actual is None:
-                nuevo_peso = obtener_ultimo_peso(nombre, grupos)
-                ej["peso_sugerido"] = nuevo_peso
+        # Solo se recalculan los que tienen peso "ajustar"
+        pendientes = [i for i, ej in enumerate(ejercicios) if ej.get("peso_sugerido") in ("ajustar", None)]
+        if pendientes:
+            sugerencias = sugerir_pesos([ejercicios[i].get("nombre", "") for i in pendientes], grupos)
+            # Solo los huecos cambiados: una serie registrada mientras tanto
+            # (actualizar-serie, sincronizar) no se pisa con la lectura de arriba
+            filtro = {"_id": activo["_id"], "completado": False}
+            cambios = {}
+            for i, sugerencia in zip(pendientes, sugerencias):
+                filtro[f"ejercicios.{i}.nombre"] = ejercicios[i].get("nombre")
+                cambios[f"ejercicios.{i}.peso_sugerido"] = sugerencia["peso"]
+            activo = entrenamiento_activo_collection.find_one_and_update(
+                filtro, {"$set": cambios}, return_document=ReturnDocument.AFTER
+            )
+            if activo is None:
+                raise HTTPException(status_code=409, detail="El entrenamiento activo cambió, reintenta")
         
-        entrenamiento_activo_collection.update_one(
-            {"_id": activo["_id"]},
-            {"$set": {"ejercicios": ejercicios}}
-        )
+        difusion_activo.publicar("pesos_recalculados", {"pesos": [ej.get("peso_sugerido") for ej in activo.get("ejercicios", [])]})
         
         return {"success": True, "entrenamiento": serialize_doc(activo)}
     except HTTPException:
@@ -687,32 +1026,142 @@ def recalcular_pesos():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def actualizar_ejercicio_activo(ejercicio_index: int, actualizacion: dict, filtro_extra: Optional[dict] = None) -> Optional[dict]:
+    """
+    Aplica `actualizacion` sobre el entrenamiento activo en un solo
+    find_one_and_update, solo si existe ejercicios.<ejercicio_index>.
+    Devuelve el documento actualizado (None si `filtro_extra` no coincide).
+
+    Raises:
+        HTTPException: 404 si no hay entrenamiento activo, 400 si el índice no existe
+    """
+    if ejercicio_index < 0:
+        raise HTTPException(status_code=400, detail="Índice de ejercicio inválido")
+    filtro = {"completado": False, f"ejercicios.{ejercicio_index}": {"$exists": True}, **(filtro_extra or {})}
+    activo = entrenamiento_activo_collection.find_one_and_update(
+        filtro, actualizacion, return_document=ReturnDocument.AFTER
+    )
+    if activo is None and filtro_extra is None:
+        # Solo en el camino de error: distinguir "sin entrenamiento" de "índice inválido"
+        if entrenamiento_activo_collection.count_documents({"completado": False}, limit=1):
+            raise HTTPException(status_code=400, detail="Índice de ejercicio inválido")
+        raise HTTPException(status_code=404, detail="No hay entrenamiento activo")
+    return activo
+
+
 @app.put("/api/entrenamiento-activo/actualizar-serie")
 def actualizar_serie(request: ActualizarEjercicioRequest):
     """Actualizar una serie de un ejercicio"""
     try:
-        activo = entrenamiento_activo_collection.find_one({"completado": False})
-        if not activo:
-            raise HTTPException(status_code=404, detail="No hay entrenamiento activo")
-        
-        ejercicios = activo.get("ejercicios", [])
-        if request.ejercicio_index >= len(ejercicios):
-            raise HTTPException(status_code=400, detail="Índice de ejercicio inválido")
-        
-        serie_dict = request.serie.model_dump()
-        ejercicios[request.ejercicio_index]["series_realizadas"].append(serie_dict)
+        i = request.ejercicio_index
+        activo = actualizar_ejercicio_activo(
+            i, {"$push": {f"ejercicios.{i}.series_realizadas": request.serie.model_dump()}}
+        )
+        ejercicio = activo["ejercicios"][i]
+        
+        # Marcar como completado si ya se hicieron todas las series. El filtro
+        # condicional hace que dos registros concurrentes no se pisen: solo
+        # aplica si la serie N ya existe y el ejercicio sigue sin completar
+        series_planificadas = ejercicio.get("series_planificadas", 4)
+        if not ejercicio.get("completado") and len(ejercicio["series_realizadas"]) >= series_planificadas:
+            completado = actualizar_ejercicio_activo(
+                i,
+                {"$set": {f"ejercicios.{i}.completado": True}},
+                {f"ejercicios.{i}.completado": {"$ne": True},
+                 f"ejercicios.{i}.series_realizadas.{max(series_planificadas - 1, 0)}": {"$exists": True}}
+            )
+            ejercicio = completado["ejercicios"][i] if completado else {**ejercicio, "completado": True}
         
-        # Marcar como completado si ya se hicieron todas las series
-        series_planificadas = ejercicios[request.ejercicio_index].get("series_planificadas", 4)
-        if len(ejercicios[request.ejercicio_index]["series_realizadas"]) >= series_planificadas:
-            ejercicios[request.ejercicio_index]["completado"] = True
+        difusion_activo.publicar("serie_agregada", {
+            "ejercicio_index": i,
+            "serie": request.serie.model_dump(),
+            "total_series": len(ejercicio["series_realizadas"]),
+            "completado": ejercicio.get("completado", False),
+        })
+        return {"success": True, "ejercicio": ejercicio}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Reintentos si otra sincronización aplica seqs entre la lectura y el update
+REINTENTOS_LOTE_SERIES = 3
+
+
+@app.post("/api/entrenamiento-activo/series")
+def registrar_series_lote(request: RegistrarSeriesRequest):
+    """
+    Registra un lote de series (p. ej. una sesión sin señal) en un solo update
+    atómico. Cada serie trae un `seq` del cliente; los seq ya aplicados se
+    guardan en `seqs_aplicados` y se ignoran, así reenviar el lote es seguro.
+    """
+    try:
+        # Orden del cliente; el primer seq repetido dentro del lote gana
+        lote = {}
+        for item in sorted(request.series, key=lambda item: item.seq):
+            lote.setdefault(item.seq, item)
+        
+        for _ in range(REINTENTOS_LOTE_SERIES):
+            activo = entrenamiento_activo_collection.find_one({"completado": False})
+            if not activo:
+                raise HTTPException(status_code=404, detail="No hay entrenamiento activo")
+            
+            total_ejercicios = len(activo.get("ejercicios", []))
+            invalidos = sorted({item.ejercicio_index for item in lote.values()
+                                if not 0 <= item.ejercicio_index < total_ejercicios})
+            if invalidos:
+                raise HTTPException(status_code=400, detail=f"Índices de ejercicio inválidos: {invalidos}")
+            
+            aplicados = set(activo.get("seqs_aplicados", []))
+            nuevos = [item for seq, item in lote.items() if seq not in aplicados]
+            duplicados = [seq for seq in lote if seq in aplicados]
+            if not nuevos:
+                return {"success": True, "aplicadas": [], "duplicadas": duplicados, "entrenamiento": serialize_doc(activo)}
+            
+            por_ejercicio = {}
+            for item in nuevos:
+                por_ejercicio.setdefault(item.ejercicio_index, []).append(item.serie.model_dump())
+            seqs_nuevos = [item.seq for item in nuevos]
+            
+            # Falla (y se reintenta) si otra petición aplicó alguno de estos seq
+            actualizado = entrenamiento_activo_collection.find_one_and_update(
+                {"_id": activo["_id"], "completado": False, "seqs_aplicados": {"$nin": seqs_nuevos}},
+                {"$push": {
+                    **{f"ejercicios.{i}.series_realizadas": {"$each": series} for i, series in por_ejercicio.items()},
+                    "seqs_aplicados": {"$each": seqs_nuevos},
+                }},
+                return_document=ReturnDocument.AFTER
+            )
+            if actualizado:
+                break
+        else:
+            raise HTTPException(status_code=409, detail="Conflicto sincronizando series, reintenta")
         
-        entrenamiento_activo_collection.update_one(
-            {"_id": activo["_id"]},
-            {"$set": {"ejercicios": ejercicios}}
-        )
+        # Completar los ejercicios que alcanzaron sus series planificadas (idempotente)
+        listos = [
+            i for i in por_ejercicio
+            if not actualizado["ejercicios"][i].get("completado")
+            and len(actualizado["ejercicios"][i]["series_realizadas"]) >= actualizado["ejercicios"][i].get("series_planificadas", 4)
+        ]
+        if listos:
+            # Mismo guard que el push: no tocar un entrenamiento finalizado o cancelado entretanto
+            completado = entrenamiento_activo_collection.find_one_and_update(
+                {"_id": actualizado["_id"], "completado": False},
+                {"$set": {f"ejercicios.{i}.completado": True for i in listos}},
+                return_document=ReturnDocument.AFTER
+            )
+            if completado:
+                actualizado = completado
+            else:
+                listos = []
         
-        return {"success": True, "ejercicio": ejercicios[request.ejercicio_index]}
+        difusion_activo.publicar("series_agregadas", {
+            "series": [{"ejercicio_index": item.ejercicio_index, "seq": item.seq, "serie": item.serie.model_dump()} for item in nuevos],
+            "completados": listos,
+        })
+        return {"success": True, "aplicadas": seqs_nuevos, "duplicadas": duplicados,
+                "entrenamiento": serialize_doc(actualizado)}
     except HTTPException:
         raise
     except Exception as e:
@@ -723,22 +1172,11 @@ def actualizar_serie(request: ActualizarEjercicioRequest):
 def completar_ejercicio(ejercicio_index: int):
     """Marcar un ejercicio como completado"""
     try:
-        activo = entrenamiento_activo_collection.find_one({"completado": False})
-        if not activo:
-            raise HTTPException(status_code=404, detail="No hay entrenamiento activo")
-        
-        ejercicios = activo.get("ejercicios", [])
-        if ejercicio_index >= len(ejercicios):
-            raise HTTPException(status_code=400, detail="Índice de ejercicio inválido")
-        
-        ejercicios[ejercicio_index]["completado"] = True
-        
-        entrenamiento_activo_collection.update_one(
-            {"_id": activo["_id"]},
-            {"$set": {"ejercicios": ejercicios}}
+        activo = actualizar_ejercicio_activo(
+            ejercicio_index, {"$set": {f"ejercicios.{ejercicio_index}.completado": True}}
         )
-        
-        return {"success": True}
+        difusion_activo.publicar("ejercicio_completado", {"ejercicio_index": ejercicio_index})
+        return {"success": True, "ejercicio": activo["ejercicios"][ejercicio_index]}
     except HTTPException:
         raise
     except Exception as e:
@@ -762,6 +1200,7 @@ async def finalizar_entrenamiento(request: FinalizarEntrenamientoRequest):
             {"_id": activo["_id"]},
             {"$set": {"completado": True, "fin": fin.isoformat()}}
         )
+        difusion_activo.publicar("finalizado", {"duracion_minutos": duracion_minutos})
         
         # Preparar resumen para guardar en gimnasio
         ejercicios_realizados = []
@@ -803,7 +1242,7 @@ async def finalizar_entrenamiento(request: FinalizarEntrenamientoRequest):
             "notas": f"Entrenamiento completado. Duración: {duracion_minutos} min"
         }
         
-        collection.insert_one(entrenamiento_guardado)
+        guardar_entrenamiento(entrenamiento_guardado)
         
         # Enviar a Matrix si está habilitado
         mensaje_matrix = None
@@ -830,6 +1269,8 @@ def cancelar_entrenamiento():
     """Cancelar el entrenamiento activo"""
     try:
         result = entrenamiento_activo_collection.delete_many({"completado": False})
+        if result.deleted_count:
+            difusion_activo.publicar("cancelado", {})
         return {"success": True, "eliminados": result.deleted_count}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -837,12 +1278,11 @@ def cancelar_entrenamiento():
 
 # ================= EQUIPAMIENTO =================
 
-@app.get("/api/equipamiento")
+@app.get("/api/equipamiento", response_class=RespuestaMongo)
 def get_equipamiento():
     """Obtener todo el equipamiento disponible"""
     try:
-        docs = list(equipamiento_collection.find({}))
-        return [serialize_doc(doc) for doc in docs]
+        return RespuestaMongo(list(equipamiento_collection.find({})))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -943,54 +1383,22 @@ def calcular_racha() -> dict:
 
 def obtener_prs() -> List[dict]:
     """Obtiene los récords personales de peso por ejercicio"""
-    docs = list(collection.find({}))
-    prs = {}
-    
-    for doc in docs:
-        for ej in doc.get("ejercicios", []):
-            nombre = ej.get("nombre", "").lower()
-            peso = ej.get("peso_kg")
-            
-            if peso and peso != "ajustar":
-                if isinstance(peso, list):
-                    peso_max = max(p for p in peso if isinstance(p, (int, float)))
-                elif isinstance(peso, (int, float)):
-                    peso_max = peso
-                else:
-                    continue
-                
-                if nombre not in prs or peso_max > prs[nombre]["peso"]:
-                    prs[nombre] = {
-                        "ejercicio": ej.get("nombre"),
-                        "peso": peso_max,
-                        "fecha": doc.get("fecha")
-                    }
-    
-    return sorted(prs.values(), key=lambda x: x["peso"], reverse=True)[:10]
+    modelo_analitico.asegurar_cargado(collection)
+    return [
+        {"ejercicio": pr["ejercicio"], "peso": pr["peso"], "fecha": pr["fecha"]}
+        for pr in modelo_analitico.prs(limite=10)
+    ]
 
 
 def resumen_semana() -> dict:
     """Resumen de la semana actual"""
     hoy = date.today()
-    inicio_semana = hoy - timedelta(days=hoy.weekday())
-    
-    docs = list(collection.find({
-        "fecha": {"$gte": inicio_semana.isoformat()}
-    }))
-    
-    total_entrenamientos = len(docs)
-    grupos_trabajados = set()
-    total_series = 0
-    
-    for doc in docs:
-        grupos_trabajados.update(doc.get("grupos_musculares", []))
-        for ej in doc.get("ejercicios", []):
-            total_series += ej.get("series", 0)
+    semana = leer_semana(rollup_collection, hoy)
     
     return {
-        "entrenamientos": total_entrenamientos,
-        "grupos_trabajados": list(grupos_trabajados),
-        "total_series": total_series,
+        "entrenamientos": semana["entrenamientos"],
+        "grupos_trabajados": list(semana["grupos"].keys()),
+        "total_series": semana["series"],
         "dias_restantes": 7 - hoy.weekday()
     }
 
@@ -1123,68 +1531,41 @@ NIVELES = [
 
 def calcular_stats_para_logros() -> dict:
     """Calcula estadísticas necesarias para verificar logros"""
-    docs = list(collection.find({}))
-    
-    total = len(docs)
+    totales = totales_analiticos()
     racha_data = calcular_racha()
-    grupos = set()
-    total_series = 0
-    max_peso = 0
-    
-    for doc in docs:
-        grupos.update(doc.get("grupos_musculares", []))
-        for ej in doc.get("ejercicios", []):
-            total_series += ej.get("series", 0)
-            peso = ej.get("peso_kg")
-            if peso and peso != "ajustar":
-                if isinstance(peso, list):
-                    max_peso = max(max_peso, max(p for p in peso if isinstance(p, (int, float))))
-                elif isinstance(peso, (int, float)):
-                    max_peso = max(max_peso, peso)
     
     return {
-        "total": total,
+        "total": totales["entrenamientos"],
         "racha": racha_data["racha_actual"],
-        "grupos_unicos": len(grupos),
-        "total_series": total_series,
-        "max_peso": max_peso
+        "grupos_unicos": len(totales["por_grupo"]),
+        "total_series": totales["series"],
+        "max_peso": totales["max_peso"]
     }
 
 
-def obtener_logros_usuario() -> dict:
-    """Obtiene el estado de logros del usuario"""
-    # Obtener o crear perfil de usuario
-    usuario = usuario_collection.find_one({"user_id": "default"})
-    if not usuario:
-        usuario = {
-            "user_id": "default",
-            "xp": 0,
-            "logros_desbloqueados": [],
-            "created_at": datetime.now().isoformat()
-        }
-        usuario_collection.insert_one(usuario)
-    
+def evaluar_logros(usuario: dict) -> tuple:
+    """
+    Logros del usuario más los que cumple ahora.
+
+    Returns:
+        (ids desbloqueados, xp total, logros recién cumplidos)
+    """
     stats = calcular_stats_para_logros()
-    logros_actuales = usuario.get("logros_desbloqueados", [])
+    logros_actuales = list(usuario.get("logros_desbloqueados", []))
     xp_total = usuario.get("xp", 0)
     nuevos_logros = []
     
-    # Verificar logros nuevos
     for logro in LOGROS_DEFINIDOS:
         if logro["id"] not in logros_actuales:
             if logro["condicion"](stats):
                 logros_actuales.append(logro["id"])
                 xp_total += logro["xp"]
                 nuevos_logros.append(logro)
-    
-    # Actualizar en BD si hay cambios
-    if nuevos_logros:
-        usuario_collection.update_one(
-            {"user_id": "default"},
-            {"$set": {"logros_desbloqueados": logros_actuales, "xp": xp_total}}
-        )
-    
-    # Calcular nivel
+    return logros_actuales, xp_total, nuevos_logros
+
+
+def perfil_gamificacion(logros_actuales: List[str], xp_total: int, nuevos_logros: List[dict]) -> dict:
+    """Nivel, XP y logros en el formato de /api/gamificacion/perfil"""
     nivel_actual = NIVELES[0]
     xp_siguiente = NIVELES[1]["xp_requerido"] if len(NIVELES) > 1 else 9999
     
@@ -1205,6 +1586,45 @@ def obtener_logros_usuario() -> dict:
     }
 
 
+def leer_perfil_gamificacion() -> dict:
+    """
+    Perfil sin escribir en la base (dashboard, contexto de la IA): los logros
+    que ya se cumplen cuentan, pero se registran y se anuncian en
+    `nuevos_logros` solo desde /api/gamificacion/perfil.
+    """
+    usuario = usuario_collection.find_one({"user_id": "default"}) or {}
+    logros_actuales, xp_total, _ = evaluar_logros(usuario)
+    return perfil_gamificacion(logros_actuales, xp_total, [])
+
+
+def obtener_logros_usuario() -> dict:
+    """Obtiene el estado de logros del usuario y registra los nuevos"""
+    # Obtener o crear perfil de usuario en una sola operación: con el índice
+    # único en user_id, un find + insert concurrente (contexto del chat y
+    # dashboard a la vez) fallaría con DuplicateKeyError
+    try:
+        usuario = usuario_collection.find_one_and_update(
+            {"user_id": "default"},
+            {"$setOnInsert": {"xp": 0, "logros_desbloqueados": [], "created_at": datetime.now().isoformat()}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # Antes de MongoDB 4.2 el servidor no reintenta el upsert que pierde la carrera
+        usuario = usuario_collection.find_one({"user_id": "default"})
+    
+    logros_actuales, xp_total, nuevos_logros = evaluar_logros(usuario)
+    
+    # Actualizar en BD si hay cambios
+    if nuevos_logros:
+        usuario_collection.update_one(
+            {"user_id": "default"},
+            {"$set": {"logros_desbloqueados": logros_actuales, "xp": xp_total}}
+        )
+    
+    return perfil_gamificacion(logros_actuales, xp_total, nuevos_logros)
+
+
 @app.get("/api/gamificacion/perfil")
 def get_perfil_gamificacion():
     """Obtener perfil de gamificación del usuario"""
@@ -1238,287 +1658,138 @@ def get_todos_logros():
 
 # ================= PROGRESO Y GRÁFICAS =================
 
-@app.get("/api/progreso/ejercicio/{nombre_ejercicio}")
-def get_progreso_ejercicio(nombre_ejercicio: str):
+@app.get("/api/progreso/ejercicio/{nombre_ejercicio}", response_class=RespuestaMongo)
+def get_progreso_ejercicio(nombre_ejercicio: str, desde: Optional[str] = None, hasta: Optional[str] = None):
     """Obtener historial de pesos para un ejercicio específico"""
     try:
-        docs = list(collection.find({}).sort("fecha", 1))
+        modelo_analitico.asegurar_cargado(collection)
         
         progreso = []
-        nombre_lower = nombre_ejercicio.lower()
-        
-        for doc in docs:
-            for ej in doc.get("ejercicios", []):
-                if nombre_lower in ej.get("nombre", "").lower():
-                    peso = ej.get("peso_kg")
-                    if peso and peso != "ajustar":
-                        if isinstance(peso, list):
-                            peso_max = max(p for p in peso if isinstance(p, (int, float)))
-                        elif isinstance(peso, (int, float)):
-                            peso_max = peso
-                        else:
-                            continue
-                        
-                        progreso.append({
-                            "fecha": doc.get("fecha"),
-                            "peso": peso_max,
-                            "series": ej.get("series"),
-                            "repeticiones": ej.get("repeticiones")
-                        })
-        
-        return {"ejercicio": nombre_ejercicio, "progreso": progreso}
+        for ap in modelo_analitico.apariciones_de(nombre_ejercicio):
+            if not ap["peso"]:
+                continue
+            if (desde and ap["fecha"] < desde) or (hasta and ap["fecha"] > hasta):
+                continue
+            progreso.append({
+                "fecha": ap["fecha"],
+                "peso": ap["peso"],
+                "series": ap["series"],
+                "repeticiones": ap["repeticiones"]
+            })
+        
+        return RespuestaMongo({"ejercicio": nombre_ejercicio, "progreso": progreso})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/progreso/volumen")
-def get_progreso_volumen():
-    """Obtener volumen total por semana"""
-    try:
-        docs = list(collection.find({}).sort("fecha", 1))
-        logger.debug(f"Volumen: {len(docs)} documentos encontrados")
-        
-        volumen_por_semana = {}
-        
-        for doc in docs:
-            fecha_str = doc.get("fecha")
-            if not fecha_str:
-                continue
-            
-            try:
-                fecha = datetime.strptime(fecha_str, "%Y-%m-%d")
-                # Obtener inicio de semana (lunes)
-                inicio_semana = fecha - timedelta(days=fecha.weekday())
-                semana_key = inicio_semana.strftime("%Y-%m-%d")
-                
-                if semana_key not in volumen_por_semana:
-                    volumen_por_semana[semana_key] = {"series": 0, "ejercicios": 0, "entrenamientos": 0}
-                
-                volumen_por_semana[semana_key]["entrenamientos"] += 1
-                
-                for ej in doc.get("ejercicios", []):
-                    series = ej.get("series", 0)
-                    if isinstance(series, (int, float)):
-                        volumen_por_semana[semana_key]["series"] += int(series)
-                    volumen_por_semana[semana_key]["ejercicios"] += 1
-            except Exception as inner_e:
-                logger.warning(f"Volumen: error procesando doc {fecha_str}: {inner_e}")
-                continue
-        
-        # Convertir a lista ordenada
-        resultado = [
-            {"semana": k, **v}
-            for k, v in sorted(volumen_por_semana.items())
-        ]
-        
-        logger.debug(f"Volumen: {len(resultado)} semanas calculadas")
-        return {"volumen_semanal": resultado}
+def volumen_semanal() -> dict:
+    """Volumen por semana desde el rollup semanal (o agregado en MongoDB con ANALITICA_MOTOR=pipeline)"""
+    if ANALITICA_MOTOR == "pipeline":
+        return {"volumen_semanal": analitica_pipeline.volumen_semanal(collection)}
+    semanas = rollup_collection.find(
+        {"entrenamientos": {"$gt": 0}},
+        {"_id": 0, "semana": 1, "series": 1, "ejercicios": 1, "entrenamientos": 1}
+    ).sort("semana", 1)
+    
+    resultado = [
+        {
+            "semana": s["semana"],
+            "series": s.get("series", 0),
+            "ejercicios": s.get("ejercicios", 0),
+            "entrenamientos": s["entrenamientos"]
+        }
+        for s in semanas
+    ]
+    
+    logger.debug(f"Volumen: {len(resultado)} semanas calculadas")
+    return {"volumen_semanal": resultado}
+
+
+@app.get("/api/progreso/volumen", response_class=RespuestaMongo)
+def get_progreso_volumen():
+    """Obtener volumen total por semana"""
+    try:
+        return RespuestaMongo(volumen_semanal())
     except Exception as e:
         logger.error(f"Error en get_progreso_volumen: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/progreso/grupos")
+def progreso_grupos() -> dict:
+    return {"por_grupo": totales_analiticos()["por_grupo"]}
+
+
+@app.get("/api/progreso/grupos", response_class=RespuestaMongo)
 def get_progreso_grupos():
     """Obtener distribución de entrenamientos por grupo muscular"""
     try:
-        docs = list(collection.find({}))
-        
-        por_grupo = {}
-        
-        for doc in docs:
-            for grupo in doc.get("grupos_musculares", []):
-                grupo_lower = grupo.lower()
-                if grupo_lower not in por_grupo:
-                    por_grupo[grupo_lower] = {"entrenamientos": 0, "series": 0}
-                
-                por_grupo[grupo_lower]["entrenamientos"] += 1
-                
-                for ej in doc.get("ejercicios", []):
-                    por_grupo[grupo_lower]["series"] += ej.get("series", 0)
-        
-        return {"por_grupo": por_grupo}
+        return RespuestaMongo(progreso_grupos())
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/progreso/ejercicios-frecuentes")
+def ejercicios_frecuentes(limit: int = 0) -> dict:
+    if ANALITICA_MOTOR == "pipeline":
+        resultado = analitica_pipeline.ejercicios(collection)
+    else:
+        modelo_analitico.asegurar_cargado(collection)
+        resultado = modelo_analitico.ejercicios()
+    
+    # Aplicar límite si se especifica
+    if limit > 0:
+        resultado = resultado[:limit]
+    
+    return {"ejercicios": resultado, "total": len(resultado)}
+
+
+@app.get("/api/progreso/ejercicios-frecuentes", response_class=RespuestaMongo)
 def get_ejercicios_frecuentes(limit: int = 0):
     """Obtener los ejercicios con sus stats. Si limit=0 devuelve todos."""
     try:
-        docs = list(collection.find({}).sort("fecha", 1))
-        
-        ejercicios = {}
-        
-        for doc in docs:
-            for ej in doc.get("ejercicios", []):
-                nombre = ej.get("nombre", "")
-                if not nombre:
-                    continue
-                
-                if nombre not in ejercicios:
-                    ejercicios[nombre] = {
-                        "nombre": nombre,
-                        "veces": 0,
-                        "pesos": [],
-                        "ultimo_peso": None,
-                        "max_peso": 0,
-                        "primera_fecha": doc.get("fecha"),
-                        "ultima_fecha": doc.get("fecha")
-                    }
-                
-                ejercicios[nombre]["veces"] += 1
-                ejercicios[nombre]["ultima_fecha"] = doc.get("fecha")
-                
-                peso = ej.get("peso_kg")
-                if peso and peso != "ajustar" and peso != "peso corporal":
-                    if isinstance(peso, list):
-                        # Filtrar None y strings, tomar máximo
-                        pesos_validos = [p for p in peso if isinstance(p, (int, float))]
-                        if pesos_validos:
-                            peso_val = max(pesos_validos)
-                        else:
-                            continue
-                    elif isinstance(peso, (int, float)):
-                        peso_val = peso
-                    else:
-                        continue
-                    
-                    ejercicios[nombre]["pesos"].append(peso_val)
-                    ejercicios[nombre]["ultimo_peso"] = peso_val
-                    ejercicios[nombre]["max_peso"] = max(ejercicios[nombre]["max_peso"], peso_val)
-        
-        # Ordenar por frecuencia
-        resultado = sorted(ejercicios.values(), key=lambda x: x["veces"], reverse=True)
-        
-        # Aplicar límite si se especifica
-        if limit > 0:
-            resultado = resultado[:limit]
-        
-        # Limpiar y calcular promedios
-        for ej in resultado:
-            if ej["pesos"]:
-                ej["promedio_peso"] = round(sum(ej["pesos"]) / len(ej["pesos"]), 1)
-            del ej["pesos"]
-        
-        return {"ejercicios": resultado, "total": len(resultado)}
+        return RespuestaMongo(ejercicios_frecuentes(limit))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 # ================= MÉTRICAS AVANZADAS =================
 
-def calcular_1rm(peso: float, repeticiones: int) -> float:
-    """Calcula el 1RM usando la fórmula de Brzycki"""
-    if repeticiones <= 0 or peso <= 0:
-        return 0
-    if repeticiones == 1:
-        return peso
-    return round(peso * (36 / (37 - repeticiones)), 1)
+def estimaciones_1rm() -> dict:
+    modelo_analitico.asegurar_cargado(collection)
+    return {"estimaciones": modelo_analitico.estimaciones_1rm(limite=20)}  # Top 20
 
 
-@app.get("/api/metricas/1rm")
+@app.get("/api/metricas/1rm", response_class=RespuestaMongo)
 def get_todos_1rm():
     """Obtener 1RM estimado para todos los ejercicios principales"""
     try:
-        docs = list(collection.find({}).sort("fecha", -1))
-        
-        ejercicios_1rm = {}
-        
-        for doc in docs:
-            for ej in doc.get("ejercicios", []):
-                nombre = ej.get("nombre", "")
-                peso = ej.get("peso_kg")
-                reps = ej.get("repeticiones")
-                
-                if not nombre or not peso or peso == "ajustar":
-                    continue
-                
-                # Normalizar peso
-                if isinstance(peso, list):
-                    peso = max(p for p in peso if isinstance(p, (int, float)))
-                if isinstance(peso, str):
-                    try:
-                        peso = float(peso)
-                    except:
-                        continue
-                if not isinstance(peso, (int, float)):
-                    continue
-                    
-                # Normalizar reps
-                if isinstance(reps, list):
-                    reps = min(r for r in reps if isinstance(r, (int, float)))
-                if isinstance(reps, str):
-                    try:
-                        reps = int(reps)
-                    except:
-                        continue
-                if not isinstance(reps, (int, float)) or reps > 12 or reps <= 0:
-                    continue  # 1RM solo es preciso con menos de 12 reps
-                
-                rm = calcular_1rm(peso, int(reps))
-                
-                if nombre not in ejercicios_1rm or rm > ejercicios_1rm[nombre]["rm_estimado"]:
-                    ejercicios_1rm[nombre] = {
-                        "ejercicio": nombre,
-                        "rm_estimado": rm,
-                        "peso_usado": peso,
-                        "repeticiones": int(reps),
-                        "fecha": doc.get("fecha")
-                    }
-        
-        resultado = sorted(ejercicios_1rm.values(), key=lambda x: x["rm_estimado"], reverse=True)
-        return {"estimaciones": resultado[:20]}  # Top 20
+        return RespuestaMongo(estimaciones_1rm())
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/metricas/comparativa-semanal")
 def get_comparativa_semanal():
-    """Comparar esta semana vs semana pasada"""
+    """
+    Comparar esta semana vs semana pasada, leyendo el rollup semanal.
+
+    `volumen` es el tonelaje de la semana: suma de peso x reps de cada serie
+    (normalizacion.metricas_ejercicio). Antes era series x reps promedio x
+    peso promedio por ejercicio, así que con pesos o reps distintos por serie
+    el número cambia respecto a versiones anteriores.
+    """
     try:
         hoy = date.today()
         inicio_esta_semana = hoy - timedelta(days=hoy.weekday())
         inicio_semana_pasada = inicio_esta_semana - timedelta(days=7)
         
-        docs = list(collection.find({
-            "fecha": {"$gte": inicio_semana_pasada.isoformat()}
-        }))
-        
-        esta_semana = {"entrenamientos": 0, "series": 0, "ejercicios": 0, "volumen": 0.0}
-        semana_pasada = {"entrenamientos": 0, "series": 0, "ejercicios": 0, "volumen": 0.0}
-        
-        for doc in docs:
-            fecha = doc.get("fecha", "")
-            datos = esta_semana if fecha >= inicio_esta_semana.isoformat() else semana_pasada
-            
-            datos["entrenamientos"] += 1
-            ejercicios = doc.get("ejercicios", [])
-            datos["ejercicios"] += len(ejercicios)
-            
-            for ej in ejercicios:
-                series = ej.get("series", 0)
-                if isinstance(series, (int, float)):
-                    datos["series"] += int(series)
-                
-                peso = ej.get("peso_kg")
-                if peso and peso != "ajustar":
-                    try:
-                        if isinstance(peso, list):
-                            peso = sum(p for p in peso if isinstance(p, (int, float))) / len([p for p in peso if isinstance(p, (int, float))])
-                        elif isinstance(peso, str):
-                            peso = float(peso)
-                        
-                        reps = ej.get("repeticiones", 10)
-                        if isinstance(reps, list):
-                            reps = sum(r for r in reps if isinstance(r, (int, float))) / max(len([r for r in reps if isinstance(r, (int, float))]), 1)
-                        elif isinstance(reps, str):
-                            reps = float(reps)
-                        
-                        if isinstance(peso, (int, float)) and isinstance(reps, (int, float)) and isinstance(series, (int, float)):
-                            datos["volumen"] += float(series) * float(reps) * float(peso)
-                    except:
-                        pass
+        esta_semana = {}
+        semana_pasada = {}
+        for datos, fecha in ((esta_semana, inicio_esta_semana), (semana_pasada, inicio_semana_pasada)):
+            semana = leer_semana(rollup_collection, fecha)
+            datos["entrenamientos"] = semana["entrenamientos"]
+            datos["series"] = semana["series"]
+            datos["ejercicios"] = semana["ejercicios"]
+            datos["volumen"] = float(semana["tonelaje"])
         
         # Calcular porcentajes de cambio
         def calcular_cambio(actual, anterior):
@@ -1540,17 +1811,117 @@ def get_comparativa_semanal():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ================= DASHBOARD =================
+
+def entrenamientos_recientes(limite: int = 4) -> List[dict]:
+    return list(collection.find({}).sort(ORDEN_PAGINACION).limit(limite))
+
+
+# sección -> función síncrona con el mismo cuerpo que su endpoint individual
+SECCIONES_DASHBOARD = {
+    "estadisticas": get_estadisticas,
+    "recientes": entrenamientos_recientes,
+    "volumen": volumen_semanal,
+    "grupos": progreso_grupos,
+    "ejercicios_frecuentes": ejercicios_frecuentes,
+    "1rm": estimaciones_1rm,
+    "comparativa": get_comparativa_semanal,
+    "perfil": leer_perfil_gamificacion,
+}
+
+
+@app.get("/api/dashboard", response_class=RespuestaMongo)
+def get_dashboard(secciones: Optional[str] = None):
+    """
+    Todos los widgets del dashboard en una respuesta, con el mismo cuerpo que
+    sus endpoints individuales: estadisticas, grupos, ejercicios_frecuentes y
+    1rm salen del modelo analítico; volumen y comparativa, del rollup semanal;
+    recientes es una consulta a gimnasio. perfil es de solo lectura (los
+    logros nuevos se registran en /api/gamificacion/perfil), así el GET no
+    escribe en la base.
+
+    `secciones` (separadas por coma) limita cuáles se calculan; por defecto
+    todas. `tiempos_ms` trae lo que tardó cada una y `errores` las que
+    fallaron, sin tumbar el resto.
+    """
+    pedidas = [s.strip() for s in secciones.split(",") if s.strip()] if secciones else list(SECCIONES_DASHBOARD)
+    invalidas = [s for s in pedidas if s not in SECCIONES_DASHBOARD]
+    if invalidas:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Secciones inválidas: {', '.join(invalidas)}. Usa: {', '.join(SECCIONES_DASHBOARD)}"
+        )
+    
+    inicio_total = time.perf_counter()
+    try:
+        modelo_analitico.asegurar_cargado(collection)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    respuesta = {}
+    tiempos = {}
+    errores = {}
+    for seccion in pedidas:
+        inicio = time.perf_counter()
+        try:
+            respuesta[seccion] = SECCIONES_DASHBOARD[seccion]()
+        except HTTPException as e:
+            errores[seccion] = e.detail
+        except Exception as e:
+            logger.error(f"Error en sección {seccion} del dashboard: {e}")
+            errores[seccion] = str(e)
+        tiempos[seccion] = round((time.perf_counter() - inicio) * 1000, 2)
+    
+    tiempos["total"] = round((time.perf_counter() - inicio_total) * 1000, 2)
+    respuesta["tiempos_ms"] = tiempos
+    if errores:
+        respuesta["errores"] = errores
+    return RespuestaMongo(respuesta)
+
+
+# ================= CONTEXTO PARA AI =================
+
+def ultimo_entrenamiento() -> Optional[dict]:
+    """Último entrenamiento registrado"""
+    return collection.find_one({}, sort=[("fecha", -1)])
+
+
+# nombre -> función síncrona que produce esa parte del contexto
+FUENTES_CONTEXTO = {
+    "stats": get_estadisticas,
+    "racha": calcular_racha,
+    "semana": resumen_semana,
+    "comparativa": get_comparativa_semanal,
+    "prs": lambda: obtener_prs()[:5],
+    "logros": leer_perfil_gamificacion,
+    "ultimo": ultimo_entrenamiento,
+}
+
+
+async def recopilar_contexto(*fuentes: str) -> dict:
+    """
+    Ejecuta las consultas de contexto en paralelo en el threadpool.
+    El event loop no se bloquea y la latencia total es la de la consulta
+    más lenta en lugar de la suma de todas.
+    """
+    inicio = time.perf_counter()
+    resultados = await asyncio.gather(*(run_in_threadpool(FUENTES_CONTEXTO[f]) for f in fuentes))
+    logger.info(f"Contexto {', '.join(fuentes)} en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+    return dict(zip(fuentes, resultados))
+
+
 @app.get("/api/metricas/resumen-inteligente")
 async def get_resumen_inteligente():
     """Genera un resumen inteligente con insights usando AI"""
     try:
         # Recopilar datos
-        stats = get_estadisticas()
-        racha = calcular_racha()
-        semana = resumen_semana()
-        comparativa = get_comparativa_semanal()
-        prs = obtener_prs()[:5]
-        logros = obtener_logros_usuario()
+        datos = await recopilar_contexto("stats", "racha", "semana", "comparativa", "prs", "logros")
+        stats = datos["stats"]
+        racha = datos["racha"]
+        semana = datos["semana"]
+        comparativa = datos["comparativa"]
+        prs = datos["prs"]
+        logros = datos["logros"]
         
         # Construir contexto para AI
         contexto = f"""
@@ -1573,7 +1944,7 @@ con un insight motivacional y una sugerencia práctica. Usa emojis. Sé directo
 
 Responde en español de forma natural y motivadora:"""
 
-        completion = openai_client.chat.completions.create(
+        completion = await gateway_llm.completar(
             model="gpt-5-mini",
             messages=[
                 {"role": "system", "content": "Eres un coach de fitness amigable y motivador. Respuestas cortas y directas."},
@@ -1606,19 +1977,22 @@ class ChatRequest(BaseModel):
     contexto: Optional[List[dict]] = None
 
 
-@app.post("/api/chat")
-async def chat_inteligente(request: ChatRequest):
-    """Chat conversacional inteligente con contexto del usuario"""
-    try:
-        # Obtener contexto del usuario
-        stats = get_estadisticas()
-        racha = calcular_racha()
-        semana = resumen_semana()
-        ultimo = collection.find_one({}, sort=[("fecha", -1)])
-        prs = obtener_prs()[:5]
-        logros = obtener_logros_usuario()
-        
-        contexto_usuario = f"""
+async def preparar_chat(request: ChatRequest) -> dict:
+    """
+    Prepara una respuesta de /api/chat. Devuelve {"respuesta": ...} cuando
+    se resuelve sin LLM conversacional (rutina generada) o {"messages": ...}
+    con la conversación lista para enviar al modelo.
+    """
+    # Obtener contexto del usuario
+    datos = await recopilar_contexto("stats", "racha", "semana", "ultimo", "prs", "logros")
+    stats = datos["stats"]
+    racha = datos["racha"]
+    semana = datos["semana"]
+    ultimo = datos["ultimo"]
+    prs = datos["prs"]
+    logros = datos["logros"]
+    
+    contexto_usuario = f"""
 DATOS DEL USUARIO:
 - Total entrenamientos: {stats['totalEntrenamientos']}
 - Racha actual: {racha['racha_actual']}
@@ -1628,69 +2002,69 @@ DATOS DEL USUARIO:
 - Último entrenamiento: {ultimo.get('nombre') if ultimo else 'ninguno'} ({ultimo.get('fecha') if ultimo else 'N/A'})
 - PRs: {', '.join([f"{p['ejercicio']}: {p['peso']}kg" for p in prs]) if prs else 'ninguno'}
 """
+    
+    mensaje_lower = request.mensaje.lower()
+    
+    # Detectar si quiere generar rutina
+    if any(word in mensaje_lower for word in ["genera", "generar", "crea", "crear", "hazme", "dame"]) and \
+       any(word in mensaje_lower for word in ["rutina", "entrenamiento", "workout"]):
+        
+        # Extraer parámetros del mensaje
+        tipo = "full"
+        if any(w in mensaje_lower for w in ["push", "pecho", "empuje"]):
+            tipo = "push"
+        elif any(w in mensaje_lower for w in ["pull", "espalda", "tirón", "jalon"]):
+            tipo = "pull"
+        elif any(w in mensaje_lower for w in ["pierna", "legs", "leg day"]):
+            tipo = "legs"
+        elif any(w in mensaje_lower for w in ["hombro", "shoulder"]):
+            tipo = "hombro"
+        
+        duracion = 45
+        if "30" in mensaje_lower or "media hora" in mensaje_lower:
+            duracion = 30
+        elif "60" in mensaje_lower or "una hora" in mensaje_lower or "1 hora" in mensaje_lower:
+            duracion = 60
+        
+        nivel = "intermedio"
+        if any(w in mensaje_lower for w in ["principiante", "básico", "inicio"]):
+            nivel = "principiante"
+        elif any(w in mensaje_lower for w in ["avanzado", "difícil", "intenso"]):
+            nivel = "avanzado"
+        
+        # Generar rutina
+        rutina_request = GenerarRutinaRequest(
+            tipo=tipo,
+            objetivo="hipertrofia",
+            duracion_minutos=duracion,
+            nivel=nivel
+        )
         
-        mensaje_lower = request.mensaje.lower()
+        resultado = await run_in_threadpool(generar_rutina, rutina_request)
+        rutina = resultado["rutina"]
         
-        # Detectar si quiere generar rutina
-        if any(word in mensaje_lower for word in ["genera", "generar", "crea", "crear", "hazme", "dame"]) and \
-           any(word in mensaje_lower for word in ["rutina", "entrenamiento", "workout"]):
-            
-            # Extraer parámetros del mensaje
-            tipo = "full"
-            if any(w in mensaje_lower for w in ["push", "pecho", "empuje"]):
-                tipo = "push"
-            elif any(w in mensaje_lower for w in ["pull", "espalda", "tirón", "jalon"]):
-                tipo = "pull"
-            elif any(w in mensaje_lower for w in ["pierna", "legs", "leg day"]):
-                tipo = "legs"
-            elif any(w in mensaje_lower for w in ["hombro", "shoulder"]):
-                tipo = "hombro"
-            
-            duracion = 45
-            if "30" in mensaje_lower or "media hora" in mensaje_lower:
-                duracion = 30
-            elif "60" in mensaje_lower or "una hora" in mensaje_lower or "1 hora" in mensaje_lower:
-                duracion = 60
-            
-            nivel = "intermedio"
-            if any(w in mensaje_lower for w in ["principiante", "básico", "inicio"]):
-                nivel = "principiante"
-            elif any(w in mensaje_lower for w in ["avanzado", "difícil", "intenso"]):
-                nivel = "avanzado"
-            
-            # Generar rutina
-            rutina_request = GenerarRutinaRequest(
-                tipo=tipo,
-                objetivo="hipertrofia",
-                duracion_minutos=duracion,
-                nivel=nivel
-            )
-            
-            resultado = generar_rutina(rutina_request)  # Sin await - no es async
-            rutina = resultado["rutina"]
-            
-            # Formatear respuesta
-            ejercicios_texto = "\n".join([
-                f"  • {ej['nombre']}: {ej['series']}x{ej['repeticiones']} @ {ej['peso_kg']}kg"
-                for ej in rutina["ejercicios"]
-            ])
-            
-            respuesta = f"""🏋️ **{rutina['nombre']}**
+        # Formatear respuesta
+        ejercicios_texto = "\n".join([
+            f"  • {ej['nombre']}: {ej['series']}x{ej['repeticiones']} @ {ej['peso_kg']}kg"
+            for ej in rutina["ejercicios"]
+        ])
+        
+        respuesta = f"""🏋️ **{rutina['nombre']}**
 
 📋 **Ejercicios:**
 {ejercicios_texto}
 
 💡 Los pesos están basados en tu historial. ¿Quieres que la inicie o la modifico?"""
 
-            return {
-                "respuesta": respuesta,
-                "tipo": "rutina_generada",
-                "rutina": rutina,
-                "accion_sugerida": "iniciar_entrenamiento"
-            }
-        
-        # Chat general con AI
-        system_prompt = f"""Eres el asistente de entrenamiento personal de Trener. Tu nombre es Trener AI.
+        return {"respuesta": {
+            "respuesta": respuesta,
+            "tipo": "rutina_generada",
+            "rutina": rutina,
+            "accion_sugerida": "iniciar_entrenamiento"
+        }}
+    
+    # Chat general con AI
+    system_prompt = f"""Eres el asistente de entrenamiento personal de Trener. Tu nombre es Trener AI.
 Eres experto en HIPERTROFIA MASCULINA, nutrición para ganar músculo y entrenamiento de fuerza.
 Tu objetivo principal es ayudar al usuario a GANAR MASA MUSCULAR (hipertrofia).
 
@@ -1715,15 +2089,26 @@ CAPACIDADES:
 
 Responde en español."""
 
-        messages = [{"role": "system", "content": system_prompt}]
-        
-        # Agregar historial de conversación si existe
-        if request.contexto:
-            messages.extend(request.contexto[-6:])  # Últimos 6 mensajes
-        
-        messages.append({"role": "user", "content": request.mensaje})
+    messages = [{"role": "system", "content": system_prompt}]
+    
+    # Agregar historial de conversación si existe
+    if request.contexto:
+        messages.extend(request.contexto[-6:])  # Últimos 6 mensajes
+    
+    messages.append({"role": "user", "content": request.mensaje})
+    return {"messages": messages}
+
+
+@app.post("/api/chat")
+async def chat_inteligente(request: ChatRequest):
+    """Chat conversacional inteligente con contexto del usuario"""
+    try:
+        preparado = await preparar_chat(request)
+        if "respuesta" in preparado:
+            return preparado["respuesta"]
+        messages = preparado["messages"]
         
-        completion = openai_client.chat.completions.create(
+        completion = await gateway_llm.completar(
             model="gpt-5-mini",
             messages=messages,
             max_completion_tokens=3500,
@@ -1745,6 +2130,60 @@ Responde en español."""
         }
 
 
+def evento_sse(evento: str, datos) -> str:
+    """Formatea un evento Server-Sent Events con datos JSON"""
+    return f"event: {evento}\ndata: {json.dumps(datos, ensure_ascii=False, default=str)}\n\n"
+
+
+def respuesta_sse(eventos) -> StreamingResponse:
+    """StreamingResponse de eventos SSE (sin buffering en nginx)"""
+    return StreamingResponse(
+        eventos,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/api/chat/stream")
+async def chat_inteligente_stream(request: ChatRequest):
+    """
+    Igual que /api/chat pero emite la respuesta por SSE a medida que se genera.
+    Eventos: `token` {texto}, `fin` (mismo cuerpo que /api/chat) y `error`.
+    """
+    async def eventos():
+        try:
+            preparado = await preparar_chat(request)
+            if "respuesta" in preparado:
+                yield evento_sse("fin", preparado["respuesta"])
+                return
+            messages = preparado["messages"]
+            
+            partes = []
+            async for chunk in gateway_llm.transmitir(
+                model="gpt-5-mini",
+                messages=messages,
+                max_completion_tokens=3500,
+            ):
+                if chunk.choices and chunk.choices[0].delta.content:
+                    partes.append(chunk.choices[0].delta.content)
+                    yield evento_sse("token", {"texto": chunk.choices[0].delta.content})
+            
+            yield evento_sse("fin", {
+                "respuesta": "".join(partes).strip(),
+                "tipo": "chat",
+                "contexto_actualizado": messages[-6:]
+            })
+        except Exception as e:
+            logger.error(f"Error en chat stream: {e}")
+            yield evento_sse("error", {
+                "respuesta": "Ups, algo salió mal. ¿Puedes reformular tu pregunta? 🤔",
+                "tipo": "error",
+                "error": str(e)
+            })
+    
+    return respuesta_sse(eventos())
+
+
 # ================= MCP MONGODB - ENDPOINTS =================
 
 class MCPRequest(BaseModel):
@@ -1888,7 +2327,7 @@ OPENAI_TOOLS = [
             "parameters": {
                 "type": "object",
                 "properties": {
-                    "coleccion": {"type": "string", "description": "Colección: gimnasio, entrenamiento_activo, logros"},
+                    "coleccion": {"type": "string", "description": "Colección: gimnasio, entrenamiento_activo, logros, historial_series (una fila por serie: fecha, ejercicio_norm, serie, peso_kg, repeticiones)"},
                     "filtro": {"type": "object", "description": "Filtro MongoDB"},
                     "limite": {"type": "integer", "default": 10}
                 },
@@ -1900,7 +2339,11 @@ OPENAI_TOOLS = [
 
 
 def ejecutar_tool_call(tool_name: str, arguments: dict) -> str:
-    """Ejecuta una herramienta y devuelve el resultado como string"""
+    """
+    Ejecuta una herramienta en modo compacto (filas planas, listas acotadas)
+    y devuelve el resultado como JSON sin espacios para el modelo
+    """
+    arguments = {**arguments, "compacto": True}
     try:
         if tool_name == "listar_entrenamientos":
             result = listar_entrenamientos(**arguments)
@@ -1909,11 +2352,11 @@ def ejecutar_tool_call(tool_name: str, arguments: dict) -> str:
         elif tool_name == "calcular_progreso":
             result = calcular_progreso_ejercicio(**arguments)
         elif tool_name == "obtener_estadisticas":
-            result = obtener_estadisticas_generales()
+            result = obtener_estadisticas_generales(**arguments)
         elif tool_name == "obtener_prs":
-            result = mcp_obtener_prs()
+            result = mcp_obtener_prs(**arguments)
         elif tool_name == "comparar_semanas":
-            result = comparar_semanas()
+            result = comparar_semanas(**arguments)
         elif tool_name == "resumen_semanal":
             result = resumen_semanal(**arguments)
         elif tool_name == "consulta_mongodb":
@@ -1921,24 +2364,38 @@ def ejecutar_tool_call(tool_name: str, arguments: dict) -> str:
         else:
             result = {"error": f"Herramienta no encontrada: {tool_name}"}
         
-        return json.dumps(result, ensure_ascii=False, default=str)
+        return json.dumps(result, ensure_ascii=False, default=str, separators=(",", ":"))
     except Exception as e:
+        # El timeout de ejecutar_tool_call_acotada se propaga para marcarlo como tal
+        if isinstance(e, PyMongoError) and e.timeout:
+            raise
         return json.dumps({"error": str(e)})
 
 
-class ChatMCPRequest(BaseModel):
-    mensaje: str
-    contexto: Optional[List[dict]] = None
+# Segundos máximos por herramienta antes de responder al modelo con un error
+MCP_TOOL_TIMEOUT = float(os.getenv("MCP_TOOL_TIMEOUT", "15"))
 
 
-@app.post("/api/chat/mcp")
-async def chat_con_mcp(request: ChatMCPRequest):
+def ejecutar_tool_call_acotada(tool_name: str, arguments: dict) -> str:
     """
-    Chat inteligente con acceso a herramientas MCP.
-    El agente puede consultar la base de datos directamente.
+    ejecutar_tool_call con timeout del lado de pymongo: cada consulta de la
+    herramienta lleva el tiempo restante como maxTimeMS, así el servidor la
+    corta aunque la corrutina ya haya dejado de esperarla.
+
+    Raises:
+        PyMongoError: Con `timeout` True si se agotó MCP_TOOL_TIMEOUT
     """
-    try:
-        system_prompt = """Eres el asistente de entrenamiento Trener AI, experto en HIPERTROFIA MASCULINA.
+    with pymongo.timeout(MCP_TOOL_TIMEOUT):
+        return ejecutar_tool_call(tool_name, arguments)
+
+# Límites del loop de agente de /api/chat/mcp
+MCP_MAX_RONDAS = int(os.getenv("MCP_MAX_RONDAS", "4"))
+MCP_DEADLINE = float(os.getenv("MCP_DEADLINE", "45"))
+MCP_TOKENS_MAX = int(os.getenv("MCP_TOKENS_MAX", "20000"))
+# Segundos mínimos para la respuesta forzada, aunque el deadline ya se agotó
+MCP_TIMEOUT_RESPUESTA = float(os.getenv("MCP_TIMEOUT_RESPUESTA", "15"))
+
+SYSTEM_PROMPT_MCP = """Eres el asistente de entrenamiento Trener AI, experto en HIPERTROFIA MASCULINA.
 
 TIENES ACCESO A HERRAMIENTAS para consultar la base de datos del usuario:
 - Puedes ver su historial de entrenamientos
@@ -1955,58 +2412,178 @@ SIEMPRE usa las herramientas cuando el usuario pregunte sobre:
 
 Responde en español, sé amigable y usa emojis. Basa tus respuestas en los DATOS REALES del usuario."""
 
-        messages = [{"role": "system", "content": system_prompt}]
-        
-        if request.contexto:
-            messages.extend(request.contexto[-6:])
-        
-        messages.append({"role": "user", "content": request.mensaje})
-        
-        # Primera llamada - puede pedir tools
-        response = openai_client.chat.completions.create(
-            model="gpt-5-mini",
-            messages=messages,
-            tools=OPENAI_TOOLS,
-            tool_choice="auto",
-            max_completion_tokens=3500,
-        )
-        
-        assistant_message = response.choices[0].message
-        
-        # Si hay tool calls, ejecutarlas
-        if assistant_message.tool_calls:
-            messages.append(assistant_message)
-            
-            for tool_call in assistant_message.tool_calls:
-                function_name = tool_call.function.name
-                arguments = json.loads(tool_call.function.arguments)
-                
-                logger.info(f"MCP ejecutando: {function_name}({arguments})")
-                
-                result = ejecutar_tool_call(function_name, arguments)
-                
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call.id,
-                    "content": result
-                })
-            
-            # Segunda llamada con los resultados
-            response = openai_client.chat.completions.create(
-                model="gpt-5-mini",
-                messages=messages,
-                max_completion_tokens=3500,
+
+async def ejecutar_tool_call_async(tool_call: dict, cache: dict) -> dict:
+    """
+    Ejecuta una tool call del modelo en el threadpool con timeout y mide su
+    latencia. `cache` guarda (nombre, argumentos) -> tarea: las llamadas
+    idénticas dentro de la misma conversación no repiten la consulta.
+    """
+    nombre = tool_call["function"]["name"]
+    inicio = time.perf_counter()
+    try:
+        arguments = json.loads(tool_call["function"]["arguments"] or "{}")
+    except json.JSONDecodeError as e:
+        return {"tool_call_id": tool_call["id"], "nombre": nombre, "resultado": json.dumps({"error": f"Argumentos inválidos: {e}"}),
+                "ms": 0.0, "tokens": 0, "timeout": False, "cache": False}
+
+    async def correr():
+        try:
+            resultado = await asyncio.wait_for(
+                run_in_threadpool(ejecutar_tool_call_acotada, nombre, arguments),
+                MCP_TOOL_TIMEOUT
             )
-            
-            respuesta = response.choices[0].message.content.strip()
-        else:
-            respuesta = assistant_message.content.strip()
-        
-        return {
-            "respuesta": respuesta,
-            "tipo": "chat_mcp",
-            "tools_usados": [tc.function.name for tc in (assistant_message.tool_calls or [])]
+            return resultado, False
+        except (asyncio.TimeoutError, PyMongoError):
+            # PyMongoError solo llega aquí si es timeout (ver ejecutar_tool_call)
+            return json.dumps({"error": f"La herramienta {nombre} superó {MCP_TOOL_TIMEOUT}s"}), True
+
+    clave = f"{nombre}:{json.dumps(arguments, sort_keys=True, default=str)}"
+    en_cache = clave in cache
+    if not en_cache:
+        logger.info(f"MCP ejecutando: {nombre}({arguments})")
+        cache[clave] = asyncio.ensure_future(correr())
+    resultado, timeout = await cache[clave]
+    if timeout:
+        # No guardar timeouts: la siguiente ronda puede reintentar
+        cache.pop(clave, None)
+
+    ms = round((time.perf_counter() - inicio) * 1000, 1)
+    tokens = estimar_tokens(resultado)
+    logger.info(f"MCP {nombre} terminó en {ms} ms, ~{tokens} tokens{' (cache)' if en_cache else ''}{' (timeout)' if timeout else ''}")
+    return {"tool_call_id": tool_call["id"], "nombre": nombre, "resultado": resultado, "ms": ms, "tokens": tokens,
+            "timeout": timeout, "cache": en_cache}
+
+
+async def agente_mcp(messages: List[dict]):
+    """
+    Loop de agente con herramientas MCP. El modelo puede pedir herramientas
+    varias veces hasta responder o agotar rondas, tiempo o tokens; entonces
+    la siguiente llamada va sin herramientas y se fuerza la respuesta.
+
+    Produce tuplas (evento, datos): `token`, `tool_inicio`, `tool_fin` y
+    al final `fin` con la respuesta completa y el tiempo por ronda.
+    Las tools de una ronda se ejecutan en paralelo.
+    """
+    inicio = time.perf_counter()
+    cache_tools = {}
+    rondas = []
+    tools_usados = []
+    tokens = 0
+    motivo_fin = "respuesta"
+    respuesta = ""
+    
+    for numero_ronda in range(1, MCP_MAX_RONDAS + 1):
+        restante = MCP_DEADLINE - (time.perf_counter() - inicio)
+        forzar_respuesta = numero_ronda == MCP_MAX_RONDAS or restante <= 0 or tokens >= MCP_TOKENS_MAX
+        if forzar_respuesta:
+            motivo_fin = "rondas" if numero_ronda == MCP_MAX_RONDAS else "deadline" if restante <= 0 else "tokens"
+        
+        parametros = {
+            "model": "gpt-5-mini",
+            "messages": messages,
+            "max_completion_tokens": 3500,
+            "extra_body": {"stream_options": {"include_usage": True}},
         }
+        if forzar_respuesta:
+            parametros["timeout"] = max(restante, MCP_TIMEOUT_RESPUESTA)
+        else:
+            parametros.update(timeout=restante, tools=OPENAI_TOOLS, tool_choice="auto")
+        
+        inicio_ronda = time.perf_counter()
+        contenido = []
+        llamadas = {}
+        tokens_ronda = 0
+        async for chunk in gateway_llm.transmitir(**parametros):
+            tokens_ronda += tokens_uso(getattr(chunk, "usage", None))
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                contenido.append(delta.content)
+                yield "token", {"texto": delta.content}
+            # Los tool calls llegan en fragmentos indexados
+            for tc in delta.tool_calls or []:
+                llamada = llamadas.setdefault(tc.index, {"id": "", "type": "function", "function": {"name": "", "arguments": ""}})
+                if tc.id:
+                    llamada["id"] = tc.id
+                if tc.function and tc.function.name:
+                    llamada["function"]["name"] += tc.function.name
+                if tc.function and tc.function.arguments:
+                    llamada["function"]["arguments"] += tc.function.arguments
+        
+        llm_ms = round((time.perf_counter() - inicio_ronda) * 1000, 1)
+        tokens += tokens_ronda
+        ronda = {"ronda": numero_ronda, "llm_ms": llm_ms, "tokens": tokens_ronda, "tools": [], "ms": llm_ms}
+        rondas.append(ronda)
+        
+        if not llamadas:
+            respuesta = "".join(contenido).strip()
+            break
+        
+        tool_calls = [llamadas[i] for i in sorted(llamadas)]
+        messages.append({"role": "assistant", "content": "".join(contenido) or None, "tool_calls": tool_calls})
+        for tc in tool_calls:
+            yield "tool_inicio", {"ronda": numero_ronda, "nombre": tc["function"]["name"], "argumentos": tc["function"]["arguments"]}
+        
+        # Ejecutar las tools de esta ronda en paralelo, avisando a medida que terminan
+        tareas = [asyncio.ensure_future(ejecutar_tool_call_async(tc, cache_tools)) for tc in tool_calls]
+        for terminada in asyncio.as_completed(tareas):
+            e = await terminada
+            yield "tool_fin", {"ronda": numero_ronda, "nombre": e["nombre"], "ms": e["ms"], "tokens": e["tokens"],
+                               "timeout": e["timeout"], "cache": e["cache"]}
+        ejecuciones = [t.result() for t in tareas]
+        
+        for ejecucion in ejecuciones:
+            messages.append({
+                "role": "tool",
+                "tool_call_id": ejecucion["tool_call_id"],
+                "content": ejecucion["resultado"]
+            })
+            tools_usados.append(ejecucion["nombre"])
+        ronda["tools"] = [
+            {"nombre": e["nombre"], "ms": e["ms"], "tokens": e["tokens"], "timeout": e["timeout"], "cache": e["cache"]}
+            for e in ejecuciones
+        ]
+        ronda["ms"] = round((time.perf_counter() - inicio_ronda) * 1000, 1)
+    
+    yield "fin", {
+        "respuesta": respuesta,
+        "tipo": "chat_mcp",
+        "tools_usados": tools_usados,
+        "rondas": rondas,
+        "tokens": tokens,
+        "motivo_fin": motivo_fin,
+        "total_ms": round((time.perf_counter() - inicio) * 1000, 1)
+    }
+
+
+class ChatMCPRequest(BaseModel):
+    mensaje: str
+    contexto: Optional[List[dict]] = None
+
+
+def mensajes_mcp(request: ChatMCPRequest) -> List[dict]:
+    """Conversación inicial para el agente MCP"""
+    messages = [{"role": "system", "content": SYSTEM_PROMPT_MCP}]
+    if request.contexto:
+        messages.extend(request.contexto[-6:])
+    messages.append({"role": "user", "content": request.mensaje})
+    return messages
+
+
+@app.post("/api/chat/mcp")
+async def chat_con_mcp(request: ChatMCPRequest):
+    """
+    Chat inteligente con acceso a herramientas MCP.
+    El agente puede consultar la base de datos directamente.
+    """
+    try:
+        resultado = None
+        async for evento, datos in agente_mcp(mensajes_mcp(request)):
+            if evento == "fin":
+                resultado = datos
+        return resultado
         
     except Exception as e:
         logger.error(f"Error en chat MCP: {e}")
@@ -2016,76 +2593,29 @@ Responde en español, sé amigable y usa emojis. Basa tus respuestas en los DATO
         }
 
 
+@app.post("/api/chat/mcp/stream")
+async def chat_con_mcp_stream(request: ChatMCPRequest):
+    """
+    Igual que /api/chat/mcp pero por SSE: emite `token` a medida que se
+    genera la respuesta, `tool_inicio` / `tool_fin` con el progreso de las
+    herramientas y `fin` con el mismo cuerpo que /api/chat/mcp.
+    """
+    async def eventos():
+        try:
+            async for evento, datos in agente_mcp(mensajes_mcp(request)):
+                yield evento_sse(evento, datos)
+        except Exception as e:
+            logger.error(f"Error en chat MCP stream: {e}")
+            yield evento_sse("error", {"respuesta": f"Error: {str(e)}", "tipo": "error"})
+    
+    return respuesta_sse(eventos())
+
+
 # ================= REGISTRO INTELIGENTE DE EJERCICIOS =================
 
 # Colección para entrenamientos en curso por usuario (chat)
 entrenamiento_chat_collection = db["entrenamiento_chat"]
 
-# Diccionario de normalización de nombres de ejercicios
-EJERCICIOS_NORMALIZADOS = {
-    # Espalda
-    "remo t": "Remo T-Bar",
-    "remo acostado": "Remo T-Bar",
-    "remo con barra": "Remo con barra",
-    "remo mancuerna": "Remo con mancuerna",
-    "remo con mancuerna": "Remo con mancuerna",
-    "polea al pecho": "Jalón al pecho",
-    "jalon al pecho": "Jalón al pecho",
-    "jalón": "Jalón al pecho",
-    "polea": "Jalón al pecho",
-    "dominadas": "Dominadas",
-    "pull up": "Dominadas",
-    "pullup": "Dominadas",
-    # Bíceps
-    "predicador": "Curl predicador",
-    "curl predicador": "Curl predicador",
-    "biceps predicador": "Curl predicador",
-    "curl martillo": "Curl martillo",
-    "martillo": "Curl martillo",
-    "curl barra": "Curl con barra",
-    "curl mancuerna": "Curl con mancuerna",
-    "curl polea": "Curl en polea",
-    # Pecho
-    "press banca": "Press banca",
-    "press plano": "Press banca",
-    "press inclinado": "Press inclinado",
-    "press declinado": "Press declinado",
-    "aperturas": "Aperturas con mancuerna",
-    "flies": "Aperturas con mancuerna",
-    "cruces polea": "Cruces en polea",
-    "crossover": "Cruces en polea",
-    # Hombros
-    "press militar": "Press militar",
-    "press hombro": "Press militar",
-    "elevaciones laterales": "Elevaciones laterales",
-    "laterales": "Elevaciones laterales",
-    "elevaciones frontales": "Elevaciones frontales",
-    "frontales": "Elevaciones frontales",
-    "pajaros": "Pájaros",
-    "face pull": "Face pull",
-    # Tríceps
-    "fondos": "Fondos",
-    "dips": "Fondos",
-    "extension triceps": "Extensión de tríceps",
-    "triceps polea": "Extensión de tríceps en polea",
-    "copa": "Copa con mancuerna",
-    "patada triceps": "Patada de tríceps",
-    # Piernas
-    "sentadilla": "Sentadilla",
-    "squat": "Sentadilla",
-    "prensa": "Prensa",
-    "leg press": "Prensa",
-    "extension cuadriceps": "Extensión de cuádriceps",
-    "curl femoral": "Curl femoral",
-    "peso muerto": "Peso muerto",
-    "deadlift": "Peso muerto",
-    "zancadas": "Zancadas",
-    "lunges": "Zancadas",
-    "hip thrust": "Hip thrust",
-    "elevacion talones": "Elevación de talones",
-    "pantorrillas": "Elevación de talones",
-}
-
 
 class RegistrarEjercicioRequest(BaseModel):
     texto: str
@@ -2101,6 +2631,59 @@ class FinalizarEntrenamientoChatRequest(BaseModel):
     usuario_id: str
 
 
+def parsear_ejercicio_llm(texto: str) -> dict:
+    """Parsea un registro de ejercicio en texto libre usando OpenAI"""
+    prompt = f"""Analiza este texto de registro de ejercicio de gimnasio y extrae la información estructurada.
+
+TEXTO: "{texto}"
+
+El usuario puede escribir de formas variadas como:
+- "Remo T o acostado 15 kg 20 kg 25 kg 30 30" → significa series progresivas: 15kg, 20kg, 25kg, 30kg, 30kg
+- "Polea al pecho bajando. 35 ,40 45 50 55" → series descendentes o progresivas
+- "Remo con mancuerna 17.5 4*10" → 4 series de 10 reps a 17.5kg
+- "Predicador 310 7.5 por mano, luego 3 5 10 kg por mano" → primero 3x10 a 7.5kg, luego 3 series a 5kg y 10kg
+- "Press banca 60kg 10 10 8 6" → 60kg con reps 10, 10, 8, 6
+- "Press banca 80 8 8 6" → 80kg con reps 8, 8, 6
+
+REGLAS:
+1. Si hay varios números seguidos sin "x" o "*", son los pesos de cada serie
+2. Si dice "4x10" o "4*10" significa 4 series de 10 reps
+3. Si dice "por mano" o "cada lado", el peso es por mano
+4. Normaliza el nombre del ejercicio a algo estándar
+
+Responde SOLO con un JSON válido (sin markdown):
+{{
+    "nombre": "nombre normalizado del ejercicio",
+    "series": [
+        {{"peso": número, "repeticiones": número}},
+        ...
+    ],
+    "notas": "notas adicionales si las hay",
+    "confianza": 0.0-1.0
+}}"""
+
+    completion = gateway_llm.completar_sync(
+        model="gpt-5-mini",
+        messages=[{"role": "user", "content": prompt}],
+        max_completion_tokens=500,
+    )
+
+    respuesta_ai = completion.choices[0].message.content.strip()
+
+    # Limpiar respuesta de markdown si viene con ```json
+    if respuesta_ai.startswith("```"):
+        respuesta_ai = respuesta_ai.split("```")[1]
+        if respuesta_ai.startswith("json"):
+            respuesta_ai = respuesta_ai[4:]
+    respuesta_ai = respuesta_ai.strip()
+
+    ejercicio_parseado = json.loads(respuesta_ai)
+
+    # Normalizar nombre con nuestro diccionario
+    ejercicio_parseado["nombre"] = normalizar_nombre_ejercicio(ejercicio_parseado["nombre"])
+    return ejercicio_parseado
+
+
 @app.post("/api/chat/iniciar-entrenamiento")
 def iniciar_entrenamiento_chat(request: IniciarEntrenamientoChatRequest):
     """Iniciar un nuevo entrenamiento desde el chat"""
@@ -2167,61 +2750,23 @@ def registrar_ejercicio_chat(request: RegistrarEjercicioRequest):
                 "ejercicios": [],
                 "completado": False
             }
-            result = entrenamiento_chat_collection.insert_one(nuevo)
-            entrenamiento = entrenamiento_chat_collection.find_one({"_id": result.inserted_id})
-        
-        # Usar AI para parsear el texto
-        prompt = f"""Analiza este texto de registro de ejercicio de gimnasio y extrae la información estructurada.
-
-TEXTO: "{request.texto}"
-
-El usuario puede escribir de formas variadas como:
-- "Remo T o acostado 15 kg 20 kg 25 kg 30 30" → significa series progresivas: 15kg, 20kg, 25kg, 30kg, 30kg
-- "Polea al pecho bajando. 35 ,40 45 50 55" → series descendentes o progresivas
-- "Remo con mancuerna 17.5 4*10" → 4 series de 10 reps a 17.5kg
-- "Predicador 310 7.5 por mano, luego 3 5 10 kg por mano" → primero 3x10 a 7.5kg, luego 3 series a 5kg y 10kg
-- "Press banca 60kg 10 10 8 6" → 60kg con reps 10, 10, 8, 6
-
-REGLAS:
-1. Si hay varios números seguidos sin "x" o "*", son los pesos de cada serie
-2. Si dice "4x10" o "4*10" significa 4 series de 10 reps
-3. Si dice "por mano" o "cada lado", el peso es por mano
-4. Normaliza el nombre del ejercicio a algo estándar
-
-Responde SOLO con un JSON válido (sin markdown):
-{{
-    "nombre": "nombre normalizado del ejercicio",
-    "series": [
-        {{"peso": número, "repeticiones": número}},
-        ...
-    ],
-    "notas": "notas adicionales si las hay",
-    "confianza": 0.0-1.0
-}}"""
-
-        completion = openai_client.chat.completions.create(
-            model="gpt-5-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_completion_tokens=500,
-        )
-        
-        respuesta_ai = completion.choices[0].message.content.strip()
-        
-        # Limpiar respuesta de markdown si viene con ```json
-        if respuesta_ai.startswith("```"):
-            respuesta_ai = respuesta_ai.split("```")[1]
-            if respuesta_ai.startswith("json"):
-                respuesta_ai = respuesta_ai[4:]
-        respuesta_ai = respuesta_ai.strip()
-        
-        ejercicio_parseado = json.loads(respuesta_ai)
+            try:
+                result = entrenamiento_chat_collection.insert_one(nuevo)
+                entrenamiento = entrenamiento_chat_collection.find_one({"_id": result.inserted_id})
+            except DuplicateKeyError:
+                # Otra petición lo inició al mismo tiempo
+                entrenamiento = entrenamiento_chat_collection.find_one({
+                    "usuario_id": request.usuario_id,
+                    "completado": False
+                })
         
-        # Normalizar nombre con nuestro diccionario
-        nombre_lower = ejercicio_parseado["nombre"].lower()
-        for key, value in EJERCICIOS_NORMALIZADOS.items():
-            if key in nombre_lower:
-                ejercicio_parseado["nombre"] = value
-                break
+        # Parser local para los formatos conocidos; el LLM solo si la confianza es baja
+        ejercicio_parseado = parsear_ejercicio(request.texto)
+        parser = "local"
+        if ejercicio_parseado["confianza"] < UMBRAL_CONFIANZA:
+            ejercicio_parseado = parsear_ejercicio_llm(request.texto)
+            parser = "llm"
+        logger.info(f"Ejercicio parseado vía {parser} (confianza {ejercicio_parseado.get('confianza')}): {request.texto}")
         
         # Calcular totales
         series = ejercicio_parseado.get("series", [])
@@ -2262,7 +2807,9 @@ Responde SOLO con un JSON válido (sin markdown):
                       f"_Sigue agregando o di 'terminar' cuando acabes_",
             "ejercicio": ejercicio_guardar,
             "tipo": "ejercicio_registrado",
-            "total_ejercicios": total_ejercicios
+            "total_ejercicios": total_ejercicios,
+            "parser": parser,
+            "confianza": ejercicio_parseado.get("confianza")
         }
         
     except json.JSONDecodeError as e:
@@ -2354,7 +2901,7 @@ def finalizar_entrenamiento_chat(request: FinalizarEntrenamientoChatRequest):
             "hora_fin": datetime.now().isoformat()
         }
         
-        result = collection.insert_one(entrenamiento_guardar)
+        result = guardar_entrenamiento(entrenamiento_guardar)
         
         # Marcar como completado
         entrenamiento_chat_collection.update_one(
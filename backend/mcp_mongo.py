@@ -6,11 +6,14 @@ Permite al agente/bot interactuar directamente con la base de datos
 import os
 import json
 from datetime import datetime, timedelta
-from typing import Any, Optional
+from typing import Any, List, Optional
 from dotenv import load_dotenv
 from pymongo import MongoClient
 from bson import ObjectId
-from bson.json_util import dumps, loads
+
+from analitica import modelo_analitico
+from rollup import COLECCION_ROLLUP, leer_semana
+from serializacion import a_json
 
 load_dotenv()
 
@@ -35,13 +38,59 @@ def serialize(data: Any) -> str:
     return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, indent=2)
 
 
+# ==================== MODO COMPACTO (para el LLM) ====================
+
+# Máximo de filas que se devuelven al modelo en modo compacto
+LIMITE_COMPACTO = 20
+
+# Campos de un entrenamiento necesarios para su fila compacta
+PROYECCION_COMPACTA = {
+    "_id": 0, "fecha": 1, "nombre": 1, "tipo": 1, "grupos_musculares": 1,
+    "ejercicios.nombre": 1, "ejercicios.series": 1, "ejercicios.repeticiones": 1,
+    "ejercicios.peso_kg": 1, "ejercicios.peso_max": 1,
+}
+
+COLUMNAS_ENTRENAMIENTO = ["fecha", "nombre", "tipo", "grupos", "ejercicios"]
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estimación rápida de tokens de un payload (~4 caracteres por token)"""
+    return (len(texto) + 3) // 4
+
+
+def tabla(filas: List[dict], columnas: List[str]) -> dict:
+    """Convierte una lista de dicts a formato tabular {columnas, filas}"""
+    return {"columnas": columnas, "filas": [[f.get(c) for c in columnas] for f in filas]}
+
+
+def ejercicio_corto(ej: dict) -> str:
+    """Un ejercicio en una línea: 'Press banca 4x10/10/8 60kg'"""
+    reps = ej.get("repeticiones")
+    reps = "/".join(str(r) for r in reps) if isinstance(reps, list) else reps
+    peso = ej.get("peso_max", ej.get("peso_kg"))
+    texto = f"{ej.get('nombre', '')} {ej.get('series', '?')}x{reps}"
+    return f"{texto} {peso}kg" if isinstance(peso, (int, float)) else texto
+
+
+def fila_entrenamiento(doc: dict) -> dict:
+    """Un entrenamiento como fila plana (ver COLUMNAS_ENTRENAMIENTO)"""
+    return {
+        "fecha": doc.get("fecha"),
+        "nombre": doc.get("nombre"),
+        "tipo": doc.get("tipo"),
+        "grupos": ", ".join(doc.get("grupos_musculares", [])),
+        "ejercicios": "; ".join(ejercicio_corto(ej) for ej in doc.get("ejercicios", [])),
+    }
+
+
 # ==================== HERRAMIENTAS MCP ====================
 
 def listar_entrenamientos(
     limite: int = 10,
     tipo: Optional[str] = None,
     desde_fecha: Optional[str] = None,
-    hasta_fecha: Optional[str] = None
+    hasta_fecha: Optional[str] = None,
+    compacto: bool = False
 ) -> dict:
     """
     Lista entrenamientos con filtros opcionales.
@@ -51,6 +100,7 @@ def listar_entrenamientos(
         tipo: Filtrar por tipo (push, pull, legs, etc.)
         desde_fecha: Fecha inicio (YYYY-MM-DD)
         hasta_fecha: Fecha fin (YYYY-MM-DD)
+        compacto: Filas planas y máximo LIMITE_COMPACTO resultados
     
     Returns:
         Lista de entrenamientos
@@ -67,21 +117,29 @@ def listar_entrenamientos(
         if hasta_fecha:
             filtro["fecha"]["$lte"] = hasta_fecha
     
+    if compacto:
+        docs = list(db.gimnasio.find(filtro, PROYECCION_COMPACTA).sort("fecha", -1).limit(min(limite, LIMITE_COMPACTO)))
+        return {
+            "total": len(docs),
+            "entrenamientos": tabla([fila_entrenamiento(d) for d in docs], COLUMNAS_ENTRENAMIENTO)
+        }
+    
     docs = list(db.gimnasio.find(filtro).sort("fecha", -1).limit(limite))
     
     return {
         "total": len(docs),
-        "entrenamientos": json.loads(dumps(docs))
+        "entrenamientos": a_json(docs)
     }
 
 
-def buscar_ejercicio(nombre: str, limite: int = 20) -> dict:
+def buscar_ejercicio(nombre: str, limite: int = 20, compacto: bool = False) -> dict:
     """
     Busca un ejercicio específico en todo el historial.
     
     Args:
         nombre: Nombre del ejercicio (búsqueda parcial)
         limite: Máximo de resultados
+        compacto: Filas [fecha, ejercicio, series, reps, peso_max]
     
     Returns:
         Historial del ejercicio con pesos y fechas
@@ -90,6 +148,28 @@ def buscar_ejercicio(nombre: str, limite: int = 20) -> dict:
         {"$unwind": "$ejercicios"},
         {"$match": {"ejercicios.nombre": {"$regex": nombre, "$options": "i"}}},
         {"$sort": {"fecha": -1}},
+    ]
+    
+    if compacto:
+        pipeline += [
+            {"$limit": min(limite, LIMITE_COMPACTO)},
+            {"$project": {
+                "_id": 0,
+                "fecha": 1,
+                "ejercicio": "$ejercicios.nombre",
+                "series": "$ejercicios.series",
+                "reps": "$ejercicios.repeticiones",
+                "peso_max": "$ejercicios.peso_max"
+            }}
+        ]
+        resultados = list(db.gimnasio.aggregate(pipeline))
+        return {
+            "ejercicio_buscado": nombre,
+            "total_registros": len(resultados),
+            "historial": tabla(resultados, ["fecha", "ejercicio", "series", "reps", "peso_max"])
+        }
+    
+    pipeline += [
         {"$limit": limite},
         {"$project": {
             "fecha": 1,
@@ -97,40 +177,38 @@ def buscar_ejercicio(nombre: str, limite: int = 20) -> dict:
             "ejercicio": "$ejercicios"
         }}
     ]
-    
     resultados = list(db.gimnasio.aggregate(pipeline))
     
     return {
         "ejercicio_buscado": nombre,
         "total_registros": len(resultados),
-        "historial": json.loads(dumps(resultados))
+        "historial": a_json(resultados)
     }
 
 
-def obtener_estadisticas_generales() -> dict:
+def obtener_estadisticas_generales(compacto: bool = False) -> dict:
     """
     Obtiene estadísticas generales del usuario.
     
+    Args:
+        compacto: El último entrenamiento como fila plana
+    
     Returns:
         Resumen completo de estadísticas
     """
-    total = db.gimnasio.count_documents({})
-    
-    # Por tipo
-    por_tipo = list(db.gimnasio.aggregate([
-        {"$group": {"_id": "$tipo", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}}
-    ]))
-    
-    # Por grupo muscular
-    por_grupo = list(db.gimnasio.aggregate([
-        {"$unwind": "$grupos_musculares"},
-        {"$group": {"_id": "$grupos_musculares", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}}
-    ]))
+    # Totales y conteos del modelo analítico compartido con la API
+    modelo_analitico.asegurar_cargado(db.gimnasio)
+    totales = modelo_analitico.totales()
+    por_tipo = sorted(totales["por_tipo"].items(), key=lambda x: x[1], reverse=True)
+    por_grupo = sorted(
+        ((grupo, datos["entrenamientos"]) for grupo, datos in totales["por_grupo"].items()),
+        key=lambda x: x[1], reverse=True
+    )
     
     # Último entrenamiento
-    ultimo = db.gimnasio.find_one({}, sort=[("fecha", -1)])
+    ultimo = db.gimnasio.find_one({}, PROYECCION_COMPACTA if compacto else None, sort=[("fecha", -1)])
+    if ultimo and compacto:
+        ultimo = fila_entrenamiento(ultimo)
     
     # Esta semana
     hoy = datetime.now()
@@ -138,51 +216,32 @@ def obtener_estadisticas_generales() -> dict:
     esta_semana = db.gimnasio.count_documents({"fecha": {"$gte": inicio_semana}})
     
     return {
-        "total_entrenamientos": total,
+        "total_entrenamientos": totales["entrenamientos"],
         "entrenamientos_esta_semana": esta_semana,
-        "por_tipo": {item["_id"]: item["count"] for item in por_tipo},
-        "por_grupo_muscular": {item["_id"]: item["count"] for item in por_grupo},
-        "ultimo_entrenamiento": json.loads(dumps(ultimo)) if ultimo else None
+        "por_tipo": dict(por_tipo),
+        "por_grupo_muscular": dict(por_grupo),
+        "ultimo_entrenamiento": a_json(ultimo) if ultimo else None
     }
 
 
-def calcular_progreso_ejercicio(nombre: str) -> dict:
+def calcular_progreso_ejercicio(nombre: str, compacto: bool = False) -> dict:
     """
     Calcula el progreso de un ejercicio específico.
     
     Args:
         nombre: Nombre del ejercicio
+        compacto: Solo los últimos LIMITE_COMPACTO pesos, como filas [fecha, peso]
     
     Returns:
         Análisis de progreso con pesos, tendencia, PRs
     """
-    pipeline = [
-        {"$unwind": "$ejercicios"},
-        {"$match": {"ejercicios.nombre": {"$regex": nombre, "$options": "i"}}},
-        {"$sort": {"fecha": 1}},
-        {"$project": {
-            "fecha": 1,
-            "nombre": "$ejercicios.nombre",
-            "peso": "$ejercicios.peso_kg",
-            "series": "$ejercicios.series",
-            "reps": "$ejercicios.repeticiones"
-        }}
-    ]
-    
-    registros = list(db.gimnasio.aggregate(pipeline))
+    modelo_analitico.asegurar_cargado(db.gimnasio)
+    registros = modelo_analitico.apariciones_de(nombre)
     
     if not registros:
         return {"error": f"No se encontró el ejercicio: {nombre}"}
     
-    # Procesar pesos
-    pesos = []
-    for r in registros:
-        peso = r.get("peso")
-        if peso and peso != "ajustar" and peso != "peso corporal":
-            if isinstance(peso, list):
-                peso = max([p for p in peso if isinstance(p, (int, float))], default=0)
-            if isinstance(peso, (int, float)):
-                pesos.append({"fecha": r["fecha"], "peso": peso})
+    pesos = [{"fecha": r["fecha"], "peso": r["peso"]} for r in registros if r.get("peso")]
     
     if not pesos:
         return {"ejercicio": nombre, "registros": len(registros), "sin_peso_registrado": True}
@@ -191,6 +250,10 @@ def calcular_progreso_ejercicio(nombre: str) -> dict:
     ultimo_peso = pesos[-1]["peso"]
     max_peso = max(p["peso"] for p in pesos)
     
+    historial = pesos
+    if compacto:
+        historial = tabla(pesos[-LIMITE_COMPACTO:], ["fecha", "peso"])
+    
     return {
         "ejercicio": nombre,
         "total_registros": len(registros),
@@ -200,62 +263,26 @@ def calcular_progreso_ejercicio(nombre: str) -> dict:
         "progreso_absoluto": round(ultimo_peso - primer_peso, 2),
         "progreso_porcentaje": round((ultimo_peso - primer_peso) / primer_peso * 100, 1) if primer_peso > 0 else 0,
         "tendencia": "subiendo" if ultimo_peso > primer_peso else "bajando" if ultimo_peso < primer_peso else "estable",
-        "historial_pesos": pesos
+        "historial_pesos": historial
     }
 
 
-def obtener_prs() -> dict:
+def obtener_prs(compacto: bool = False) -> dict:
     """
     Obtiene los récords personales (PRs) del usuario.
     
+    Args:
+        compacto: PRs como filas [ejercicio, peso, fecha, series, reps]
+    
     Returns:
         Lista de PRs por ejercicio
     """
-    pipeline = [
-        {"$unwind": "$ejercicios"},
-        {"$match": {
-            "ejercicios.peso_kg": {"$exists": True, "$ne": "ajustar", "$ne": "peso corporal"}
-        }},
-        {"$project": {
-            "fecha": 1,
-            "nombre": "$ejercicios.nombre",
-            "peso": "$ejercicios.peso_kg",
-            "series": "$ejercicios.series",
-            "reps": "$ejercicios.repeticiones"
-        }}
-    ]
-    
-    registros = list(db.gimnasio.aggregate(pipeline))
-    
-    # Agrupar por ejercicio y encontrar máximo
-    ejercicios = {}
-    for r in registros:
-        nombre = r["nombre"]
-        peso = r["peso"]
-        
-        if isinstance(peso, list):
-            peso = max([p for p in peso if isinstance(p, (int, float))], default=0)
-        
-        if not isinstance(peso, (int, float)):
-            continue
-        
-        if nombre not in ejercicios or peso > ejercicios[nombre]["peso"]:
-            ejercicios[nombre] = {
-                "peso": peso,
-                "fecha": r["fecha"],
-                "series": r.get("series"),
-                "reps": r.get("reps")
-            }
-    
-    # Ordenar por peso
-    prs = [
-        {"ejercicio": k, **v}
-        for k, v in sorted(ejercicios.items(), key=lambda x: x[1]["peso"], reverse=True)
-    ]
+    modelo_analitico.asegurar_cargado(db.gimnasio)
+    prs = modelo_analitico.prs()
     
     return {
         "total_ejercicios": len(prs),
-        "prs": prs[:20]  # Top 20
+        "prs": tabla(prs[:20], ["ejercicio", "peso", "fecha", "series", "reps"]) if compacto else prs[:20]  # Top 20
     }
 
 
@@ -265,59 +292,72 @@ def consulta_personalizada(
     proyeccion: Optional[dict] = None,
     limite: int = 10,
     ordenar_por: Optional[str] = None,
-    orden: int = -1
+    orden: int = -1,
+    compacto: bool = False
 ) -> dict:
     """
     Ejecuta una consulta personalizada en MongoDB.
     
     Args:
-        coleccion: Nombre de la colección (gimnasio, entrenamiento_activo, etc.)
+        coleccion: Nombre de la colección (gimnasio, entrenamiento_activo,
+            historial_series para consultas por serie, etc.)
         filtro: Filtro MongoDB como diccionario
         proyeccion: Campos a incluir/excluir
         limite: Máximo de resultados
         ordenar_por: Campo para ordenar
         orden: 1 (ascendente) o -1 (descendente)
+        compacto: Máximo LIMITE_COMPACTO resultados; en gimnasio sin
+            proyección, entrenamientos como filas planas
     
     Returns:
         Resultados de la consulta
     """
-    colecciones_permitidas = ["gimnasio", "entrenamiento_activo", "logros", "usuario_gym", "entrenamiento_chat"]
+    colecciones_permitidas = ["gimnasio", "entrenamiento_activo", "logros", "usuario_gym", "entrenamiento_chat", "historial_series"]
     
     if coleccion not in colecciones_permitidas:
         return {"error": f"Colección no permitida. Usa: {colecciones_permitidas}"}
     
     try:
         coll = db[coleccion]
-        cursor = coll.find(filtro, proyeccion)
+        filas_planas = compacto and coleccion == "gimnasio" and not proyeccion
+        cursor = coll.find(filtro, PROYECCION_COMPACTA if filas_planas else proyeccion)
         
         if ordenar_por:
             cursor = cursor.sort(ordenar_por, orden)
         
-        cursor = cursor.limit(limite)
+        cursor = cursor.limit(min(limite, LIMITE_COMPACTO) if compacto else limite)
         docs = list(cursor)
         
+        if filas_planas:
+            return {
+                "coleccion": coleccion,
+                "total_resultados": len(docs),
+                "resultados": tabla([fila_entrenamiento(d) for d in docs], COLUMNAS_ENTRENAMIENTO)
+            }
+        
         return {
             "coleccion": coleccion,
             "filtro_aplicado": filtro,
             "total_resultados": len(docs),
-            "resultados": json.loads(dumps(docs))
+            "resultados": a_json(docs)
         }
     except Exception as e:
         return {"error": str(e)}
 
 
-def agregacion_personalizada(coleccion: str, pipeline: list) -> dict:
+def agregacion_personalizada(coleccion: str, pipeline: list, compacto: bool = False) -> dict:
     """
     Ejecuta un pipeline de agregación en MongoDB.
     
     Args:
         coleccion: Nombre de la colección
         pipeline: Pipeline de agregación MongoDB
+        compacto: Máximo LIMITE_COMPACTO resultados y sin repetir el pipeline
     
     Returns:
         Resultados de la agregación
     """
-    colecciones_permitidas = ["gimnasio", "entrenamiento_activo", "logros", "usuario_gym"]
+    colecciones_permitidas = ["gimnasio", "entrenamiento_activo", "logros", "usuario_gym", "historial_series"]
     
     if coleccion not in colecciones_permitidas:
         return {"error": f"Colección no permitida. Usa: {colecciones_permitidas}"}
@@ -326,22 +366,31 @@ def agregacion_personalizada(coleccion: str, pipeline: list) -> dict:
         coll = db[coleccion]
         resultados = list(coll.aggregate(pipeline))
         
+        if compacto:
+            return {
+                "coleccion": coleccion,
+                "total_resultados": len(resultados),
+                "resultados": a_json(resultados[:LIMITE_COMPACTO])
+            }
+        
         return {
             "coleccion": coleccion,
             "pipeline": pipeline,
             "total_resultados": len(resultados),
-            "resultados": json.loads(dumps(resultados))
+            "resultados": a_json(resultados)
         }
     except Exception as e:
         return {"error": str(e)}
 
 
-def resumen_semanal(semanas_atras: int = 0) -> dict:
+def resumen_semanal(semanas_atras: int = 0, incluir_detalle: bool = True, compacto: bool = False) -> dict:
     """
     Obtiene resumen de una semana específica.
     
     Args:
         semanas_atras: 0 = esta semana, 1 = semana pasada, etc.
+        incluir_detalle: Incluir los entrenamientos completos de la semana
+        compacto: Detalle como filas planas en lugar de documentos completos
     
     Returns:
         Resumen detallado de la semana
@@ -353,57 +402,67 @@ def resumen_semanal(semanas_atras: int = 0) -> dict:
     inicio_str = inicio.strftime("%Y-%m-%d")
     fin_str = fin.strftime("%Y-%m-%d")
     
-    docs = list(db.gimnasio.find({
-        "fecha": {"$gte": inicio_str, "$lte": fin_str}
-    }).sort("fecha", 1))
+    # Totales desde el rollup semanal (un documento por semana)
+    semana = leer_semana(db[COLECCION_ROLLUP], inicio.date())
     
-    if not docs:
+    if not semana["entrenamientos"]:
         return {
             "semana": f"{inicio_str} a {fin_str}",
             "entrenamientos": 0,
             "mensaje": "No hay entrenamientos esta semana"
         }
     
-    # Contar series y ejercicios
-    total_series = 0
-    total_ejercicios = 0
-    grupos = set()
-    tipos = []
-    
-    for doc in docs:
-        tipos.append(doc.get("tipo", "general"))
-        for g in doc.get("grupos_musculares", []):
-            grupos.add(g)
-        for ej in doc.get("ejercicios", []):
-            total_ejercicios += 1
-            total_series += ej.get("series", 0)
-    
-    return {
+    resumen = {
         "semana": f"{inicio_str} a {fin_str}",
-        "entrenamientos": len(docs),
-        "total_series": total_series,
-        "total_ejercicios": total_ejercicios,
-        "grupos_trabajados": list(grupos),
-        "tipos": tipos,
-        "detalle": json.loads(dumps(docs))
+        "entrenamientos": semana["entrenamientos"],
+        "total_series": semana["series"],
+        "total_ejercicios": semana["ejercicios"],
+        "grupos_trabajados": list(semana["grupos"].keys()),
+        "tipos": [tipo for tipo, veces in semana["tipos"].items() for _ in range(veces)]
     }
+    
+    if incluir_detalle:
+        filtro = {"fecha": {"$gte": inicio_str, "$lte": fin_str}}
+        if compacto:
+            docs = db.gimnasio.find(filtro, PROYECCION_COMPACTA).sort("fecha", 1)
+            resumen["detalle"] = tabla([fila_entrenamiento(d) for d in docs], COLUMNAS_ENTRENAMIENTO)
+        else:
+            docs = list(db.gimnasio.find(filtro).sort("fecha", 1))
+            resumen["detalle"] = a_json(docs)
+    
+    return resumen
 
 
-def comparar_semanas() -> dict:
+def comparar_semanas(compacto: bool = False) -> dict:
     """
     Compara esta semana con la anterior.
     
+    Args:
+        compacto: Filas [metrica, esta_semana, semana_pasada, cambio_pct]
+    
     Returns:
         Comparativa de métricas entre semanas
     """
-    esta = resumen_semanal(0)
-    anterior = resumen_semanal(1)
+    esta = resumen_semanal(0, incluir_detalle=False)
+    anterior = resumen_semanal(1, incluir_detalle=False)
     
     def calcular_cambio(actual, previo):
         if previo == 0:
             return 100 if actual > 0 else 0
         return round((actual - previo) / previo * 100, 1)
     
+    if compacto:
+        campos = {"entrenamientos": "entrenamientos", "series": "total_series", "ejercicios": "total_ejercicios"}
+        return tabla([
+            {
+                "metrica": metrica,
+                "esta_semana": esta.get(campo, 0),
+                "semana_pasada": anterior.get(campo, 0),
+                "cambio_pct": calcular_cambio(esta.get(campo, 0), anterior.get(campo, 0))
+            }
+            for metrica, campo in campos.items()
+        ], ["metrica", "esta_semana", "semana_pasada", "cambio_pct"])
+    
     return {
         "esta_semana": {
             "entrenamientos": esta.get("entrenamientos", 0),
@@ -442,7 +501,8 @@ MCP_TOOLS = {
             "limite": "int - máximo de resultados (default 10)",
             "tipo": "str - filtrar por tipo (push, pull, legs)",
             "desde_fecha": "str - fecha inicio YYYY-MM-DD",
-            "hasta_fecha": "str - fecha fin YYYY-MM-DD"
+            "hasta_fecha": "str - fecha fin YYYY-MM-DD",
+            "compacto": "bool - filas planas y listas acotadas (para el LLM)"
         }
     },
     "buscar_ejercicio": {
@@ -450,25 +510,31 @@ MCP_TOOLS = {
         "description": "Busca un ejercicio específico en todo el historial",
         "parameters": {
             "nombre": "str - nombre del ejercicio (búsqueda parcial)",
-            "limite": "int - máximo de resultados"
+            "limite": "int - máximo de resultados",
+            "compacto": "bool - filas planas y listas acotadas (para el LLM)"
         }
     },
     "obtener_estadisticas": {
         "function": obtener_estadisticas_generales,
         "description": "Obtiene estadísticas generales del usuario",
-        "parameters": {}
+        "parameters": {
+            "compacto": "bool - filas planas y listas acotadas (para el LLM)"
+        }
     },
     "calcular_progreso": {
         "function": calcular_progreso_ejercicio,
         "description": "Calcula el progreso de un ejercicio (pesos, tendencia, PRs)",
         "parameters": {
-            "nombre": "str - nombre del ejercicio"
+            "nombre": "str - nombre del ejercicio",
+            "compacto": "bool - filas planas y listas acotadas (para el LLM)"
         }
     },
     "obtener_prs": {
         "function": obtener_prs,
         "description": "Obtiene los récords personales del usuario",
-        "parameters": {}
+        "parameters": {
+            "compacto": "bool - filas planas y listas acotadas (para el LLM)"
+        }
     },
     "consulta_personalizada": {
         "function": consulta_personalizada,
@@ -479,7 +545,8 @@ MCP_TOOLS = {
             "proyeccion": "dict - campos a incluir/excluir",
             "limite": "int - máximo de resultados",
             "ordenar_por": "str - campo para ordenar",
-            "orden": "int - 1 (asc) o -1 (desc)"
+            "orden": "int - 1 (asc) o -1 (desc)",
+            "compacto": "bool - filas planas y listas acotadas (para el LLM)"
         }
     },
     "agregacion": {
@@ -487,20 +554,25 @@ MCP_TOOLS = {
         "description": "Ejecuta un pipeline de agregación MongoDB",
         "parameters": {
             "coleccion": "str - nombre de la colección",
-            "pipeline": "list - pipeline de agregación"
+            "pipeline": "list - pipeline de agregación",
+            "compacto": "bool - filas planas y listas acotadas (para el LLM)"
         }
     },
     "resumen_semanal": {
         "function": resumen_semanal,
         "description": "Obtiene resumen de una semana (0=esta, 1=pasada, etc.)",
         "parameters": {
-            "semanas_atras": "int - 0 para esta semana"
+            "semanas_atras": "int - 0 para esta semana",
+            "incluir_detalle": "bool - incluir los entrenamientos completos (default true)",
+            "compacto": "bool - filas planas y listas acotadas (para el LLM)"
         }
     },
     "comparar_semanas": {
         "function": comparar_semanas,
         "description": "Compara métricas de esta semana vs la anterior",
-        "parameters": {}
+        "parameters": {
+            "compacto": "bool - filas planas y listas acotadas (para el LLM)"
+        }
     }
 }
 
@@ -542,3 +614,15 @@ if __name__ == "__main__":
     
     print("\n3. Comparar semanas:")
     print(serialize(comparar_semanas()))
+    
+    print("\n4. Tokens estimados por herramienta (completo -> compacto):")
+    pruebas = {
+        "listar_entrenamientos": {},
+        "obtener_estadisticas": {},
+        "obtener_prs": {},
+        "resumen_semanal": {"semanas_atras": 1},
+    }
+    for nombre, kwargs in pruebas.items():
+        completo = estimar_tokens(serialize(ejecutar_herramienta(nombre, **kwargs)))
+        compacto = estimar_tokens(json.dumps(ejecutar_herramienta(nombre, compacto=True, **kwargs), cls=JSONEncoder, ensure_ascii=False, separators=(",", ":")))
+        print(f"   {nombre}: {completo} -> {compacto}")
@@ -0,0 +1,49 @@
+"""
+Migraciones - Trener
+Comandos para rellenar y reconstruir las colecciones derivadas de `gimnasio`.
+
+Uso:
+    python migraciones.py historial-series
+    python migraciones.py indices
+    python migraciones.py metricas-ejercicios
+    python migraciones.py rollup-semanal
+"""
+
+import argparse
+import json
+import os
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+from historial import reconstruir_historial
+from indices import provisionar_indices
+from normalizacion import migrar_metricas
+from rollup import reconstruir_rollup
+
+load_dotenv()
+
+COMANDOS = {
+    "historial-series": reconstruir_historial,
+    "indices": provisionar_indices,
+    "metricas-ejercicios": migrar_metricas,
+    "rollup-semanal": reconstruir_rollup,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migraciones de datos de Trener")
+    parser.add_argument("comando", choices=sorted(COMANDOS.keys()))
+    args = parser.parse_args()
+
+    mongo_uri = os.getenv("MONGO_URI")
+    if not mongo_uri:
+        raise SystemExit("MONGO_URI environment variable is required")
+
+    db = MongoClient(mongo_uri)["n8n_memoria"]
+    resultado = COMANDOS[args.comando](db)
+    print(json.dumps(resultado, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Normalización de ejercicios - Trener
+Convierte los valores mixtos de peso_kg / repeticiones a números por serie
+"""
+
+import unicodedata
+from typing import List, Optional, Tuple, Union
+
+from pymongo import UpdateOne
+
+Numero = Union[int, float]
+
+PESOS_NO_NUMERICOS = {"ajustar", "peso corporal"}
+
+PALABRAS_IGNORAR = {'de', 'con', 'en', 'la', 'el', 'las', 'los', 'a', 'y', 'o', 'para', 'al'}
+
+
+def plegar_acentos(texto: str) -> str:
+    """Quita tildes y diéresis: 'Jalón' -> 'Jalon'"""
+    return "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+
+
+def extraer_palabras_clave(texto: str) -> List[str]:
+    """Extrae palabras clave de un texto (sin tildes), ignorando palabras comunes"""
+    texto = plegar_acentos(texto.lower().strip())
+    return [p for p in texto.split() if p not in PALABRAS_IGNORAR and len(p) > 2]
+
+
+# ---- Claves de agrupación ----
+# Las comparten el modelo analítico y el rollup semanal, así las estadísticas,
+# el volumen y los grupos cuentan lo mismo para los mismos datos.
+
+def clave_ejercicio(nombre: str) -> str:
+    """'  Press Banca ' -> 'press banca'"""
+    return (nombre or "").strip().lower()
+
+
+def grupos_entrenamiento(doc: dict) -> List[str]:
+    """Grupos musculares en minúsculas, sin repetir y en el orden registrado"""
+    return list(dict.fromkeys(g.strip().lower() for g in doc.get("grupos_musculares", []) if isinstance(g, str)))
+
+
+def tipo_entrenamiento(doc: dict) -> str:
+    """Tipo del entrenamiento, "otro" si no tiene"""
+    return doc.get("tipo") or "otro"
+
+
+def series_ejercicio(ejercicio: dict) -> int:
+    """Número de series si es numérico (los bool no cuentan), 0 si no"""
+    series = ejercicio.get("series")
+    return int(series) if isinstance(series, (int, float)) and not isinstance(series, bool) else 0
+
+
+def numero(valor) -> Optional[Numero]:
+    """Convierte un valor suelto a número, retorna None si no es numérico"""
+    if valor is None or isinstance(valor, bool):
+        return None
+    if isinstance(valor, (int, float)):
+        return valor
+    if isinstance(valor, str):
+        if valor.strip().lower() in PESOS_NO_NUMERICOS:
+            return None
+        try:
+            return float(valor)
+        except ValueError:
+            return None
+    return None
+
+
+def normalizar_peso(peso) -> Optional[float]:
+    """Normaliza un valor de peso a float, retorna None si no es válido"""
+    if peso is None or peso == "ajustar" or peso == "peso corporal":
+        return None
+    if isinstance(peso, list):
+        validos = [p for p in peso if isinstance(p, (int, float))]
+        return max(validos) if validos else None
+    if isinstance(peso, (int, float)):
+        return float(peso)
+    if isinstance(peso, str):
+        try:
+            return float(peso)
+        except ValueError:
+            return None
+    return None
+
+
+def _valor_serie(valor, indice: int):
+    """Toma el valor de la serie `indice` (si es lista repite el último)"""
+    if isinstance(valor, list):
+        if not valor:
+            return None
+        return valor[indice] if indice < len(valor) else valor[-1]
+    return valor
+
+
+def expandir_series(ejercicio: dict) -> List[Tuple[Optional[Numero], Optional[int]]]:
+    """
+    Expande un ejercicio a una lista de (peso, repeticiones) por serie.
+
+    El número de series es el mayor entre `series` y el largo de las listas
+    de peso/repeticiones, con mínimo una serie para no perder el ejercicio.
+    """
+    peso = ejercicio.get("peso_kg")
+    reps = ejercicio.get("repeticiones")
+    series = ejercicio.get("series")
+
+    total = series if isinstance(series, int) and not isinstance(series, bool) and series > 0 else 0
+    for valor in (peso, reps):
+        if isinstance(valor, list):
+            total = max(total, len(valor))
+    total = max(total, 1)
+
+    resultado = []
+    for i in range(total):
+        peso_serie = numero(_valor_serie(peso, i))
+        reps_serie = numero(_valor_serie(reps, i))
+        resultado.append((peso_serie, int(reps_serie) if reps_serie is not None else None))
+    return resultado
+
+
+def metricas_ejercicio(ejercicio: dict) -> dict:
+    """
+    Calcula los campos numéricos canónicos de un ejercicio.
+
+    Returns:
+        peso_max, peso_medio, reps_min, reps_total y tonelaje (peso x reps)
+    """
+    series = expandir_series(ejercicio)
+    pesos = [p for p, _ in series if p is not None]
+    reps = [r for _, r in series if r is not None]
+    tonelaje = sum(p * r for p, r in series if p is not None and r is not None)
+
+    return {
+        "peso_max": max(pesos) if pesos else None,
+        "peso_medio": round(sum(pesos) / len(pesos), 2) if pesos else None,
+        "reps_min": min(reps) if reps else None,
+        "reps_total": sum(reps),
+        "tonelaje": round(tonelaje, 2),
+    }
+
+
+def agregar_metricas(doc: dict) -> dict:
+    """
+    Agrega las métricas canónicas a cada ejercicio de un entrenamiento y las
+    claves de agrupación ya normalizadas (in-place): `clave` por ejercicio y
+    `grupos_clave` por entrenamiento. Los pipelines de analitica_pipeline.py
+    agrupan por ellas porque $toLower de MongoDB solo pliega ASCII.
+    """
+    for ej in doc.get("ejercicios", []):
+        ej.update(metricas_ejercicio(ej))
+        ej["clave"] = clave_ejercicio(ej.get("nombre"))
+    doc["grupos_clave"] = grupos_entrenamiento(doc)
+    return doc
+
+
+def migrar_metricas(db, tamano_lote: int = 500) -> dict:
+    """
+    Rellena las métricas canónicas y las claves de agrupación en los
+    entrenamientos existentes de `gimnasio`.
+
+    Returns:
+        Conteo de entrenamientos actualizados
+    """
+    actualizados = 0
+    operaciones = []
+
+    for doc in db.gimnasio.find({}, {"ejercicios": 1, "grupos_musculares": 1}).batch_size(tamano_lote):
+        agregar_metricas(doc)
+        operaciones.append(UpdateOne({"_id": doc["_id"]}, {"$set": {
+            "ejercicios": doc.get("ejercicios", []),
+            "grupos_clave": doc["grupos_clave"],
+        }}))
+        if len(operaciones) >= tamano_lote:
+            actualizados += db.gimnasio.bulk_write(operaciones, ordered=False).modified_count
+            operaciones = []
+
+    if operaciones:
+        actualizados += db.gimnasio.bulk_write(operaciones, ordered=False).modified_count
+
+    return {"entrenamientos_actualizados": actualizados}
@@ -0,0 +1,76 @@
+"""
+Paginación por cursor - Trener
+Keyset pagination sobre (fecha, _id) descendente: cada página continúa
+después del último documento de la anterior usando el índice `fecha_id`,
+sin skip() ni cargar el historial completo.
+"""
+
+import base64
+import json
+import re
+from typing import Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+ORDEN_PAGINACION = [("fecha", -1), ("_id", -1)]
+
+LIMITE_MAXIMO = 200
+
+_CAMPO_VALIDO = re.compile(r"^[A-Za-z0-9_]+(\.[A-Za-z0-9_]+)*$")
+
+
+def codificar_cursor(doc: dict) -> str:
+    """Cursor opaco con la posición (fecha, _id) de un documento"""
+    crudo = json.dumps([doc.get("fecha"), str(doc["_id"])])
+    return base64.urlsafe_b64encode(crudo.encode()).decode()
+
+
+def decodificar_cursor(cursor: str) -> Tuple[Optional[str], ObjectId]:
+    """
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    try:
+        fecha, oid = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return fecha, ObjectId(oid)
+    except (ValueError, TypeError, InvalidId) as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+
+
+def filtro_despues(cursor: str) -> dict:
+    """Filtro de los documentos que van después del cursor en ORDEN_PAGINACION"""
+    fecha, oid = decodificar_cursor(cursor)
+    return {"$or": [
+        {"fecha": {"$lt": fecha}},
+        {"fecha": fecha, "_id": {"$lt": oid}},
+    ]}
+
+
+def filtro_rango(desde: Optional[str] = None, hasta: Optional[str] = None) -> dict:
+    """Filtro por rango de fechas YYYY-MM-DD (ambos extremos incluidos)"""
+    if not desde and not hasta:
+        return {}
+    rango = {}
+    if desde:
+        rango["$gte"] = desde
+    if hasta:
+        rango["$lte"] = hasta
+    return {"fecha": rango}
+
+
+def proyeccion(campos: Optional[str]) -> Optional[dict]:
+    """
+    Convierte "fecha,nombre,tipo" en una proyección de Mongo. Siempre incluye
+    fecha (la usa el cursor); _id lo incluye Mongo por defecto.
+
+    Raises:
+        ValueError: Si algún campo no es un nombre válido
+    """
+    if not campos:
+        return None
+    nombres = [c.strip() for c in campos.split(",") if c.strip()]
+    invalidos = [c for c in nombres if not _CAMPO_VALIDO.match(c)]
+    if invalidos:
+        raise ValueError(f"Campos inválidos: {', '.join(invalidos)}")
+    return {"fecha": 1, **{c: 1 for c in nombres}}
@@ -0,0 +1,259 @@
+"""
+Parser local de ejercicios - Trener
+Interpreta los formatos habituales de registro por chat sin llamar al LLM:
+
+    Press banca 60kg 4x10            -> 4 series de 10 reps a 60kg
+    Remo con mancuerna 17.5 4*10     -> 4 series de 10 reps a 17.5kg
+    Remo T 15 20 25 30 30            -> una serie por peso
+    Press banca 60kg 10 10 8 6       -> 60kg con reps 10, 10, 8, 6
+    Press banca 80 8 8 6             -> 80kg con reps 8, 8, 6
+    Curl predicador 7.5kg por mano 3x10
+
+Devuelve el mismo formato que el parseo por LLM, con una confianza; si es
+baja el endpoint recurre al LLM. El corpus de ejemplos se verifica en
+tests/test_parser_ejercicios.py; `python parser_ejercicios.py` mide el
+tiempo de parseo.
+"""
+
+import re
+import time
+from typing import List, Optional
+
+from normalizacion import plegar_acentos
+
+UMBRAL_CONFIANZA = 0.8
+REPS_POR_DEFECTO = 10
+PESO_MAXIMO = 500
+REPS_MAXIMAS = 100
+# Reps creíbles tras un peso sin "kg" ("80 8 8 6"); más parece una serie
+# descendente de pesos ("100 50 30") y se deja al LLM
+REPS_SIN_KG = 20
+
+# Diccionario de normalización de nombres de ejercicios
+EJERCICIOS_NORMALIZADOS = {
+    # Espalda
+    "remo t": "Remo T-Bar",
+    "remo acostado": "Remo T-Bar",
+    "remo con barra": "Remo con barra",
+    "remo mancuerna": "Remo con mancuerna",
+    "remo con mancuerna": "Remo con mancuerna",
+    "polea al pecho": "Jalón al pecho",
+    "jalon al pecho": "Jalón al pecho",
+    "jalón": "Jalón al pecho",
+    "polea": "Jalón al pecho",
+    "dominadas": "Dominadas",
+    "pull up": "Dominadas",
+    "pullup": "Dominadas",
+    # Bíceps
+    "predicador": "Curl predicador",
+    "curl predicador": "Curl predicador",
+    "biceps predicador": "Curl predicador",
+    "curl martillo": "Curl martillo",
+    "martillo": "Curl martillo",
+    "curl barra": "Curl con barra",
+    "curl mancuerna": "Curl con mancuerna",
+    "curl polea": "Curl en polea",
+    # Pecho
+    "press banca": "Press banca",
+    "press plano": "Press banca",
+    "press inclinado": "Press inclinado",
+    "press declinado": "Press declinado",
+    "aperturas": "Aperturas con mancuerna",
+    "flies": "Aperturas con mancuerna",
+    "cruces polea": "Cruces en polea",
+    "crossover": "Cruces en polea",
+    # Hombros
+    "press militar": "Press militar",
+    "press hombro": "Press militar",
+    "elevaciones laterales": "Elevaciones laterales",
+    "laterales": "Elevaciones laterales",
+    "elevaciones frontales": "Elevaciones frontales",
+    "frontales": "Elevaciones frontales",
+    "pajaros": "Pájaros",
+    "face pull": "Face pull",
+    # Tríceps
+    "fondos": "Fondos",
+    "dips": "Fondos",
+    "extension triceps": "Extensión de tríceps",
+    "triceps polea": "Extensión de tríceps en polea",
+    "copa": "Copa con mancuerna",
+    "patada triceps": "Patada de tríceps",
+    # Piernas
+    "sentadilla": "Sentadilla",
+    "squat": "Sentadilla",
+    "prensa": "Prensa",
+    "leg press": "Prensa",
+    "extension cuadriceps": "Extensión de cuádriceps",
+    "curl femoral": "Curl femoral",
+    "peso muerto": "Peso muerto",
+    "deadlift": "Peso muerto",
+    "zancadas": "Zancadas",
+    "lunges": "Zancadas",
+    "hip thrust": "Hip thrust",
+    "elevacion talones": "Elevación de talones",
+    "pantorrillas": "Elevación de talones",
+}
+
+
+_PATRON = re.compile(
+    r"(?P<nxm>(?P<series>\d+)\s*[x\*×]\s*(?P<reps>\d+))"
+    r"|(?P<num>\d+(?:\.\d+)?)(?P<kg>\s*(?:kgs?|kilos?)\b)?"
+)
+_POR_MANO = re.compile(r"\b(por mano|cada mano|cada lado|por lado|c/u)\b")
+_MULTI_SEGMENTO = re.compile(r"\b(luego|despues|después)\b|;")
+
+
+# Las claves más largas primero: "curl polea" antes que "polea"
+_CLAVES_PLEGADAS = sorted(
+    ((plegar_acentos(key), value) for key, value in EJERCICIOS_NORMALIZADOS.items()),
+    key=lambda kv: len(kv[0]), reverse=True
+)
+
+
+def _buscar_normalizado(nombre: str) -> Optional[str]:
+    nombre_plegado = plegar_acentos(nombre.lower())
+    for key, value in _CLAVES_PLEGADAS:
+        if key in nombre_plegado:
+            return value
+    return None
+
+
+def normalizar_nombre_ejercicio(nombre: str) -> str:
+    """Nombre estándar según EJERCICIOS_NORMALIZADOS (o el original si no hay match)"""
+    return _buscar_normalizado(nombre) or nombre
+
+
+def _numero(texto: str):
+    valor = float(texto)
+    return int(valor) if valor.is_integer() else valor
+
+
+def _resultado(nombre: str, series: List[dict], notas: str, confianza: float) -> dict:
+    return {"nombre": nombre, "series": series, "notas": notas, "confianza": round(confianza, 2)}
+
+
+def parsear_ejercicio(texto: str) -> dict:
+    """
+    Parsea un registro de ejercicio en texto libre.
+
+    Returns:
+        {"nombre", "series": [{"peso", "repeticiones"}], "notas", "confianza"}
+        con confianza 0 si el formato no se reconoce
+    """
+    limpio = texto.strip()
+    # "7,5" es decimal; "35 ,40" es separador de lista
+    limpio = re.sub(r"(\d),(\d)", r"\1.\2", limpio).replace(",", " ")
+    minusculas = limpio.lower()
+
+    primer_numero = re.search(r"\d", limpio)
+    nombre_crudo = (limpio[:primer_numero.start()] if primer_numero else limpio).strip(" .:-")
+    if not nombre_crudo or not primer_numero:
+        return _resultado(nombre_crudo or texto, [], "", 0.0)
+
+    normalizado = _buscar_normalizado(nombre_crudo)
+    nombre = normalizado or nombre_crudo
+    notas = []
+    por_mano = _POR_MANO.search(minusculas)
+    if por_mano:
+        notas.append(por_mano.group(1))
+
+    # Varios bloques ("3x10 a 7.5, luego 5 y 10kg") quedan para el LLM
+    if _MULTI_SEGMENTO.search(minusculas):
+        return _resultado(nombre, [], " ".join(notas), 0.3)
+
+    nxm = []
+    con_kg = []
+    numeros = []  # (valor, marcado_con_kg) en orden, sin los NxM
+    for m in _PATRON.finditer(minusculas, primer_numero.start()):
+        if m.group("nxm"):
+            nxm.append((int(m.group("series")), int(m.group("reps"))))
+        else:
+            valor = _numero(m.group("num"))
+            numeros.append(valor)
+            if m.group("kg"):
+                con_kg.append(valor)
+
+    series = []
+    confianza = 0.0
+
+    if len(nxm) == 1:
+        total_series, reps = nxm[0]
+        if len(numeros) <= 1:
+            # "Press banca 60kg 4x10" / "Dominadas 4x10"
+            peso = numeros[0] if numeros else 0
+            series = [{"peso": peso, "repeticiones": reps} for _ in range(total_series)]
+            confianza = 0.95 if numeros else 0.85
+        elif len(numeros) == total_series:
+            # "Remo 4x10 20 25 30 35": un peso por serie
+            series = [{"peso": p, "repeticiones": reps} for p in numeros]
+            confianza = 0.85
+    elif not nxm:
+        if len(con_kg) == 1 and len(numeros) >= 2 and numeros[0] == con_kg[0]:
+            # "Press banca 60kg 10 10 8 6": peso fijo y reps por serie
+            series = [{"peso": con_kg[0], "repeticiones": r} for r in numeros[1:]]
+            confianza = 0.9 if all(float(r).is_integer() for r in numeros[1:]) else 0.0
+        elif len(numeros) >= 2 and not con_kg and numeros[0] > max(numeros[1:]):
+            resto = numeros[1:]
+            if (numeros[0] >= 2 * max(resto) and max(resto) <= REPS_SIN_KG
+                    and all(float(r).is_integer() for r in resto)):
+                # "Press banca 80 8 8 6": peso y reps por serie, como "60kg 10 10 8 6"
+                series = [{"peso": numeros[0], "repeticiones": int(r)} for r in resto]
+                confianza = 0.85
+            else:
+                # "Curl 12 10 10 8" / "Press banca 100 50 30": ¿peso y reps o pesos
+                # descendentes? Al LLM
+                series = [{"peso": p, "repeticiones": REPS_POR_DEFECTO} for p in numeros]
+                confianza = 0.6
+        elif len(numeros) >= 2 and (len(con_kg) != 1):
+            # "Remo T 15 20 25 30 30": un peso por serie
+            series = [{"peso": p, "repeticiones": REPS_POR_DEFECTO} for p in numeros]
+            confianza = 0.85
+        elif len(numeros) == 1:
+            # Un solo número sin series: ambiguo
+            series = [{"peso": numeros[0], "repeticiones": REPS_POR_DEFECTO}]
+            confianza = 0.5
+
+    if not series or len(series) > 20:
+        return _resultado(nombre, [], " ".join(notas), 0.0)
+
+    if any(s["peso"] > PESO_MAXIMO or not 0 < s["repeticiones"] <= REPS_MAXIMAS for s in series):
+        confianza = min(confianza, 0.4)
+
+    # Un nombre que no está en el diccionario puede ser un error de parseo
+    if not normalizado:
+        confianza *= 0.9
+
+    return _resultado(nombre, series, " ".join(notas), confianza)
+
+
+# ---- Corpus de ejemplos: (texto, nombre, pesos, reps) o None si debe ir al LLM ----
+
+CORPUS = [
+    ("Press banca 60kg 4x10", "Press banca", [60] * 4, [10] * 4),
+    ("Remo T 15 20 25 30 30", "Remo T-Bar", [15, 20, 25, 30, 30], [10] * 5),
+    ("Curl predicador 7.5kg por mano 3x10", "Curl predicador", [7.5] * 3, [10] * 3),
+    ("Remo T o acostado 15 kg 20 kg 25 kg 30 30", "Remo T-Bar", [15, 20, 25, 30, 30], [10] * 5),
+    ("Polea al pecho bajando. 35 ,40 45 50 55", "Jalón al pecho", [35, 40, 45, 50, 55], [10] * 5),
+    ("Remo con mancuerna 17.5 4*10", "Remo con mancuerna", [17.5] * 4, [10] * 4),
+    ("Press banca 60kg 10 10 8 6", "Press banca", [60] * 4, [10, 10, 8, 6]),
+    ("Sentadilla 100 kg 5x5", "Sentadilla", [100] * 5, [5] * 5),
+    ("Press militar 22,5kg 3x12", "Press militar", [22.5] * 3, [12] * 3),
+    ("Dominadas 4x8", "Dominadas", [0] * 4, [8] * 4),
+    ("Press banca 80 8 8 6", "Press banca", [80] * 3, [8, 8, 6]),
+    ("Curl polea 20kg 3x12", "Curl en polea", [20] * 3, [12] * 3),
+    ("Elevaciones laterales 10kg cada lado 4x15", "Elevaciones laterales", [10] * 4, [15] * 4),
+    ("Predicador 310 7.5 por mano, luego 3 5 10 kg por mano", None, None, None),
+    ("Curl 15", None, None, None),
+    ("Curl barra 12 10 10 8", None, None, None),
+    ("4x10", None, None, None),
+]
+
+
+if __name__ == "__main__":
+    repeticiones = 10000
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for texto, *_ in CORPUS:
+            parsear_ejercicio(texto)
+    total = time.perf_counter() - inicio
+    print(f"Parseo local: {total / (repeticiones * len(CORPUS)) * 1e6:.1f} µs por texto")
@@ -0,0 +1,186 @@
+"""
+Rollup semanal - Trener
+Colección `rollup_semanal` con un documento por semana ISO, mantenida con $inc
+en cada alta o baja de entrenamiento. Las gráficas y comparativas semanales
+leen O(semanas) documentos en lugar de recorrer todo el historial.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.collection import Collection
+
+from normalizacion import grupos_entrenamiento, metricas_ejercicio, series_ejercicio, tipo_entrenamiento
+
+COLECCION_ROLLUP = "rollup_semanal"
+
+# Sube cuando cambian las claves de contribucion(): al arrancar se reconstruye
+# el rollup si alguna semana tiene otra versión (2: grupos en minúsculas;
+# 3: lunes sin hora para fechas datetime)
+VERSION_ROLLUP = 3
+
+INDICES_ROLLUP = [
+    ([("semana", ASCENDING)], {"name": "semana"}),
+]
+
+
+def clave_semana(fecha) -> Optional[Tuple[str, str]]:
+    """
+    Devuelve (clave ISO "2025-W07", lunes "2025-02-10") para una fecha.
+    Acepta date, datetime o string YYYY-MM-DD; None si la fecha no es válida.
+    """
+    if isinstance(fecha, datetime):
+        fecha = fecha.date()
+    elif isinstance(fecha, str):
+        try:
+            fecha = datetime.strptime(fecha, "%Y-%m-%d").date()
+        except ValueError:
+            return None
+    if not isinstance(fecha, date):
+        return None
+    anio, semana, _ = fecha.isocalendar()
+    lunes = fecha - timedelta(days=fecha.weekday())
+    return f"{anio}-W{semana:02d}", lunes.isoformat()
+
+
+def _campo(nombre: str) -> str:
+    """Limpia un nombre para usarlo como clave de subdocumento en Mongo"""
+    return str(nombre).replace(".", "_").replace("$", "_")
+
+
+def contribucion(doc: dict) -> Optional[Tuple[str, str, dict]]:
+    """Calcula lo que aporta un entrenamiento a su semana como dict de incrementos"""
+    semana = clave_semana(doc.get("fecha"))
+    if not semana:
+        return None
+
+    ejercicios = doc.get("ejercicios", [])
+    series = 0
+    tonelaje = 0.0
+    for ej in ejercicios:
+        series += series_ejercicio(ej)
+        t = ej.get("tonelaje")
+        tonelaje += t if isinstance(t, (int, float)) else metricas_ejercicio(ej)["tonelaje"]
+
+    inc = {
+        "entrenamientos": 1,
+        "series": series,
+        "ejercicios": len(ejercicios),
+        "tonelaje": tonelaje,
+        f"tipos.{_campo(tipo_entrenamiento(doc))}": 1,
+    }
+    # Mismas claves que el modelo analítico: grupos en minúsculas y sin repetir
+    for grupo in grupos_entrenamiento(doc):
+        inc[f"grupos.{_campo(grupo)}.entrenamientos"] = 1
+        inc[f"grupos.{_campo(grupo)}.series"] = series
+
+    return semana[0], semana[1], inc
+
+
+def aplicar_entrenamiento(coleccion: Collection, doc: dict, signo: int = 1):
+    """Suma (signo=1) o resta (signo=-1) un entrenamiento de su semana"""
+    datos = contribucion(doc)
+    if not datos:
+        return
+    clave, lunes, inc = datos
+    coleccion.update_one(
+        {"_id": clave},
+        {"$inc": {k: v * signo for k, v in inc.items()}, "$setOnInsert": {"semana": lunes, "version": VERSION_ROLLUP}},
+        upsert=True
+    )
+
+
+def _acumular(semanas: Dict[str, dict], docs: Iterable[dict]) -> int:
+    """Suma la contribución de cada entrenamiento a su semana; devuelve cuántos contaron"""
+    entrenamientos = 0
+    for doc in docs:
+        datos = contribucion(doc)
+        if not datos:
+            continue
+        entrenamientos += 1
+        clave, lunes, inc = datos
+        semana = semanas.setdefault(clave, {"_id": clave, "semana": lunes, "version": VERSION_ROLLUP})
+        for campo, valor in inc.items():
+            destino = semana
+            partes = campo.split(".")
+            for parte in partes[:-1]:
+                destino = destino.setdefault(parte, {})
+            destino[partes[-1]] = destino.get(partes[-1], 0) + valor
+    return entrenamientos
+
+
+def _aplanar(valores: dict, prefijo: str = "") -> dict:
+    """{"tipos": {"push": 2}} -> {"tipos.push": 2}"""
+    plano = {}
+    for clave, valor in valores.items():
+        if isinstance(valor, dict):
+            plano.update(_aplanar(valor, f"{prefijo}{clave}."))
+        else:
+            plano[f"{prefijo}{clave}"] = valor
+    return plano
+
+
+def aplicar_entrenamientos(coleccion: Collection, docs: Iterable[dict]) -> int:
+    """
+    Suma varios entrenamientos de una vez: agrupa por semana y hace un
+    solo $inc por semana en un bulk_write (importaciones masivas).
+    """
+    semanas = {}
+    _acumular(semanas, docs)
+    operaciones = []
+    for clave, semana in semanas.items():
+        inc = _aplanar({k: v for k, v in semana.items() if k not in ("_id", "semana", "version")})
+        operaciones.append(UpdateOne(
+            {"_id": clave},
+            {"$inc": inc, "$setOnInsert": {"semana": semana["semana"], "version": VERSION_ROLLUP}},
+            upsert=True
+        ))
+    if operaciones:
+        coleccion.bulk_write(operaciones, ordered=False)
+    return len(operaciones)
+
+
+def leer_semana(coleccion: Collection, fecha) -> dict:
+    """Lee el rollup de la semana que contiene `fecha` (ceros si no hay datos)"""
+    clave, lunes = clave_semana(fecha)
+    doc = coleccion.find_one({"_id": clave}) or {}
+    return {
+        "semana": lunes,
+        "entrenamientos": doc.get("entrenamientos", 0),
+        "series": doc.get("series", 0),
+        "ejercicios": doc.get("ejercicios", 0),
+        "tonelaje": round(doc.get("tonelaje", 0.0), 2),
+        "tipos": {k: v for k, v in doc.get("tipos", {}).items() if v > 0},
+        "grupos": {k: v for k, v in doc.get("grupos", {}).items() if v.get("entrenamientos", 0) > 0},
+    }
+
+
+def rollup_desactualizado(coleccion: Collection) -> bool:
+    """True si alguna semana se calculó con otra versión de las claves"""
+    return coleccion.find_one({"version": {"$ne": VERSION_ROLLUP}}, {"_id": 1}) is not None
+
+
+def reconstruir_rollup(db) -> dict:
+    """
+    Reconstruye `rollup_semanal` desde cero a partir de `gimnasio`. Se arma en
+    una colección temporal y se renombra al final: los lectores ven el rollup
+    viejo o el nuevo, nunca uno vacío o a medias.
+
+    Returns:
+        Conteo de entrenamientos procesados y semanas generadas
+    """
+    semanas = {}
+    entrenamientos = _acumular(
+        semanas, db.gimnasio.find({}, {"fecha": 1, "tipo": 1, "grupos_musculares": 1, "ejercicios": 1})
+    )
+
+    temporal = db[f"{COLECCION_ROLLUP}_reconstruccion"]
+    temporal.drop()
+    if semanas:
+        temporal.insert_many(list(semanas.values()))
+    for claves, opciones in INDICES_ROLLUP:
+        temporal.create_index(claves, **opciones)
+    temporal.rename(COLECCION_ROLLUP, dropTarget=True)
+
+    return {"entrenamientos": entrenamientos, "semanas": len(semanas)}
@@ -0,0 +1,158 @@
+"""
+Serialización de documentos de MongoDB - Trener
+
+- a_json: convierte documentos BSON a estructuras JSON nativas en una sola
+  pasada. El resultado es idéntico a json.loads(bson.json_util.dumps(doc))
+  (Extended JSON relajado, lo que devolvían las herramientas MCP) sin generar
+  y volver a parsear el string intermedio.
+- RespuestaMongo: respuesta de FastAPI que codifica documentos directo a
+  bytes con orjson (ObjectId -> str), sin jsonable_encoder ni copias.
+"""
+
+import json
+import math
+from datetime import datetime
+from typing import Any
+
+import orjson
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from bson.json_util import dumps
+from fastapi.responses import JSONResponse
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _via_json_util(valor: Any) -> Any:
+    """Camino lento para tipos poco comunes (Binary, Regex, Timestamp, SON...)"""
+    return json.loads(dumps(valor))
+
+
+def a_json(valor: Any) -> Any:
+    """
+    Recorre `valor` una vez y convierte los tipos BSON a Extended JSON relajado:
+    ObjectId -> {"$oid"}, datetime -> {"$date": ISO-8601}, Decimal128 ->
+    {"$numberDecimal"}. Listas y dicts se copian; el resto pasa tal cual.
+    """
+    tipo = type(valor)
+    if tipo is str or tipo is int or tipo is bool or valor is None:
+        return valor
+    if tipo is dict:
+        resultado = {}
+        for clave, v in valor.items():
+            if type(clave) is not str:
+                # json.dumps convierte claves no string; se delega
+                return _via_json_util(valor)
+            resultado[clave] = a_json(v)
+        return resultado
+    if tipo is list:
+        return [a_json(v) for v in valor]
+    if tipo is float:
+        return valor if math.isfinite(valor) else _via_json_util(valor)
+    if tipo is ObjectId:
+        return {"$oid": str(valor)}
+    if tipo is datetime and valor.tzinfo is None and valor >= _EPOCH:
+        # pymongo devuelve datetimes naive en UTC
+        milis = valor.microsecond // 1000
+        fraccion = ".%03d" % milis if milis else ""
+        return {"$date": f"{valor.strftime('%Y-%m-%dT%H:%M:%S')}{fraccion}Z"}
+    if tipo is Decimal128:
+        return {"$numberDecimal": str(valor)}
+    return _via_json_util(valor)
+
+
+def _orjson_default(valor: Any) -> Any:
+    """Tipos que orjson no conoce: se codifican como los veía la API (string)"""
+    if isinstance(valor, (ObjectId, Decimal128)):
+        return str(valor)
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+
+def codificar(valor: Any) -> bytes:
+    """Documento(s) de Mongo a bytes JSON con orjson"""
+    return orjson.dumps(valor, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class RespuestaMongo(JSONResponse):
+    """
+    JSONResponse para endpoints de lectura pesados. Se devuelve directamente
+    desde el endpoint (FastAPI no pasa el contenido por jsonable_encoder) y
+    acepta documentos tal como vienen de pymongo: `_id` sale como string,
+    igual que con serialize_doc.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return codificar(content)
+
+
+# Benchmark y verificación: python serializacion.py
+if __name__ == "__main__":
+    import random
+    import time
+    from datetime import timedelta
+
+    def entrenamiento_sintetico(i: int) -> dict:
+        fecha = datetime(2024, 1, 1) + timedelta(days=i % 700, microseconds=random.randint(0, 999999))
+        return {
+            "_id": ObjectId(),
+            "id": f"entreno-{i}",
+            "fecha": fecha.strftime("%Y-%m-%d"),
+            "nombre": "Push day",
+            "tipo": "push",
+            "grupos_musculares": ["pecho", "hombro", "tríceps"],
+            "creado": fecha,
+            "ejercicios": [
+                {
+                    "nombre": f"Ejercicio {j}",
+                    "series": 4,
+                    "repeticiones": [10, 10, 8, 6],
+                    "peso_kg": random.choice([60, 62.5, "ajustar", [40, 45, 50]]),
+                    "peso_max": 62.5,
+                    "tonelaje": Decimal128("2150.5") if j == 0 else 2150.5,
+                }
+                for j in range(6)
+            ],
+        }
+
+    for tamano in (1_000, 10_000):
+        docs = [entrenamiento_sintetico(i) for i in range(tamano)]
+
+        inicio = time.perf_counter()
+        antes = json.loads(dumps(docs))
+        t_antes = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        despues = a_json(docs)
+        t_despues = time.perf_counter() - inicio
+
+        assert antes == despues, "a_json difiere de json.loads(dumps())"
+        print(f"{tamano} entrenamientos: loads(dumps()) {t_antes * 1000:.0f} ms, "
+              f"a_json {t_despues * 1000:.0f} ms ({t_antes / t_despues:.1f}x), resultados idénticos")
+
+    # Respuestas HTTP: serialize_doc + jsonable_encoder + json (camino anterior)
+    # contra RespuestaMongo sobre los documentos crudos
+    from fastapi.encoders import jsonable_encoder
+
+    def serialize_doc(doc: dict) -> dict:
+        return {k: str(v) if k == "_id" else v for k, v in doc.items()}
+
+    def respuesta_anterior(docs: list) -> bytes:
+        return JSONResponse(jsonable_encoder([serialize_doc(d) for d in docs])).body
+
+    for tamano in (1_000, 10_000, 100_000):
+        docs = [entrenamiento_sintetico(i) for i in range(tamano)]
+        for doc in docs:
+            for ej in doc["ejercicios"]:
+                ej["tonelaje"] = 2150.5
+
+        inicio = time.perf_counter()
+        antes = respuesta_anterior(docs)
+        t_antes = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        despues = RespuestaMongo(docs).body
+        t_despues = time.perf_counter() - inicio
+
+        assert json.loads(antes) == json.loads(despues), "RespuestaMongo difiere del camino anterior"
+        print(f"Respuesta {tamano} entrenamientos: jsonable_encoder+json {t_antes * 1000:.0f} ms, "
+              f"RespuestaMongo {t_despues * 1000:.0f} ms ({t_antes / t_despues:.1f}x), {len(despues) / 1e6:.1f} MB")
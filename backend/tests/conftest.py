@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+# Los módulos del backend son planos (se despliegan como backend/*.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BASE_PRUEBAS = "trener_pruebas"
+
+
+@pytest.fixture
+def main_mongo(monkeypatch):
+    """
+    Módulo main con sus colecciones apuntando a la base temporal
+    `trener_pruebas`. Se salta sin MONGO_URI (en CI corre contra el servicio
+    mongo del workflow).
+    """
+    if not os.getenv("MONGO_URI"):
+        pytest.skip("requiere MONGO_URI")
+    os.environ.setdefault("OPENAI_API_KEY", "pruebas")
+    import main
+    from analitica import ModeloAnalitico
+    from cache import CacheVersionada
+
+    db = main.client[BASE_PRUEBAS]
+    main.client.drop_database(BASE_PRUEBAS)
+    for atributo in ("collection", "entrenamiento_activo_collection", "rollup_collection",
+                     "historial_collection", "usuario_collection", "logros_collection"):
+        monkeypatch.setattr(main, atributo, db[getattr(main, atributo).name])
+    monkeypatch.setattr(main, "modelo_analitico", ModeloAnalitico())
+    monkeypatch.setattr(main, "cache_estadisticas", CacheVersionada("estadisticas"))
+    yield main
+    main.client.drop_database(BASE_PRUEBAS)
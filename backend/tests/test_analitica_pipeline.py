@@ -0,0 +1,108 @@
+"""
+Equivalencia de ANALITICA_MOTOR=memoria y =pipeline contra un MongoDB real.
+Se salta sin MONGO_URI (en CI corre contra el servicio mongo del workflow).
+"""
+
+import copy
+import os
+import random
+from datetime import date, timedelta
+
+import pytest
+
+pytestmark = pytest.mark.skipif(not os.getenv("MONGO_URI"), reason="requiere MONGO_URI (MongoDB 5.0+)")
+
+BASE_PRUEBAS = "trener_pruebas_analitica"
+
+NOMBRES = ["Press banca", "press banca ", "Sentadilla", "Remo con barra", "Curl bíceps", "CURL BÍCEPS", "Jalón al pecho"]
+GRUPOS = ["Pecho", "pecho", "espalda", "Piernas", "bíceps", "BÍCEPS", "hombro"]
+
+
+def entrenamiento_sintetico(azar: random.Random, i: int) -> dict:
+    return {
+        "fecha": (date(2020, 1, 1) + timedelta(days=i % 700)).isoformat(),
+        "nombre": "Sintético",
+        "tipo": azar.choice(["push", "pull", "legs", None, ""]),
+        "grupos_musculares": azar.sample(GRUPOS, 2),
+        "ejercicios": [
+            {
+                "nombre": azar.choice(NOMBRES),
+                "series": azar.choice([3, 4, 4.0, 3.5, None, True]),
+                "repeticiones": azar.choice([10, [12, 10, 8], 5]),
+                "peso_kg": azar.choice([60, 62.5, "ajustar", [40, 45, 50], 0]),
+            }
+            for _ in range(azar.randint(0, 5))
+        ],
+    }
+
+
+# Documentos que el camino normal de escritura no genera
+BORDES = [
+    {"nombre": "Sin fecha", "ejercicios": [{"nombre": "Press banca", "series": 3, "peso_kg": 70}]},
+    {"fecha": "ayer", "tipo": "push", "ejercicios": [{"nombre": "Press banca", "series": 2, "peso_kg": 71}]},
+    {"fecha": "2021-03-01", "grupos_musculares": ["Pecho", 3, None], "ejercicios": [{"nombre": "", "series": 3}]},
+]
+
+
+@pytest.fixture
+def main(monkeypatch):
+    os.environ.setdefault("OPENAI_API_KEY", "pruebas")
+    import main
+    from analitica import ModeloAnalitico
+    from analitica_pipeline import servidor_compatible
+
+    if not servidor_compatible(main.db):
+        pytest.skip("el servidor de MONGO_URI es anterior a MongoDB 5.0")
+
+    db = main.client[BASE_PRUEBAS]
+    main.client.drop_database(BASE_PRUEBAS)
+    monkeypatch.setattr(main, "collection", db.gimnasio)
+    monkeypatch.setattr(main, "rollup_collection", db.rollup_semanal)
+    monkeypatch.setattr(main, "historial_collection", db.historial_series)
+    monkeypatch.setattr(main, "modelo_analitico", ModeloAnalitico())
+    yield main
+    main.client.drop_database(BASE_PRUEBAS)
+
+
+def respuestas(main, motor: str) -> dict:
+    from serializacion import codificar
+
+    main.ANALITICA_MOTOR = motor
+    try:
+        return {
+            "estadisticas": codificar(main.calcular_estadisticas()),
+            "grupos": codificar(main.progreso_grupos()),
+            "ejercicios": codificar(main.ejercicios_frecuentes()),
+            "volumen": codificar(main.volumen_semanal()),
+        }
+    finally:
+        main.ANALITICA_MOTOR = "memoria"
+
+
+def test_pipeline_responde_igual_que_memoria(main):
+    azar = random.Random(25)
+    main.guardar_entrenamientos([entrenamiento_sintetico(azar, i) for i in range(1500)] + copy.deepcopy(BORDES))
+    main.modelo_analitico.cargar(main.collection)
+
+    assert respuestas(main, "pipeline") == respuestas(main, "memoria")
+
+
+def test_documentos_sin_claves_guardadas(main):
+    # Anteriores a `ejercicios.clave` / `grupos_clave`: el pipeline usa $toLower (nombres ASCII)
+    from normalizacion import metricas_ejercicio
+    from rollup import aplicar_entrenamientos
+
+    azar = random.Random(7)
+    docs = []
+    for i in range(300):
+        doc = entrenamiento_sintetico(azar, i)
+        doc["grupos_musculares"] = azar.sample(["Pecho", "pecho", "Espalda", "piernas "], 2)
+        for ej in doc["ejercicios"]:
+            ej["nombre"] = azar.choice(["Press banca", "PRESS BANCA", " press banca", "Remo"])
+            ej.update(metricas_ejercicio(ej))
+        docs.append(doc)
+    main.collection.insert_many(docs)
+    aplicar_entrenamientos(main.rollup_collection, docs)
+    main.modelo_analitico.cargar(main.collection)
+
+    assert respuestas(main, "pipeline") == respuestas(main, "memoria")
@@ -0,0 +1,94 @@
+import pytest
+
+
+def activo(main, series_planificadas: int = 2) -> dict:
+    doc = {
+        "nombre": "Push",
+        "completado": False,
+        "ejercicios": [
+            {"nombre": nombre, "series_planificadas": series_planificadas, "series_realizadas": [], "completado": False}
+            for nombre in ("Press banca", "Fondos")
+        ],
+    }
+    main.entrenamiento_activo_collection.insert_one(doc)
+    return doc
+
+
+def lote(main, *items):
+    serie = {"numero": 1, "repeticiones": 10, "peso_kg": 60, "completada": True}
+    return main.RegistrarSeriesRequest(series=[{"ejercicio_index": i, "seq": seq, "serie": serie} for i, seq in items])
+
+
+def test_reenviar_un_lote_no_duplica_series(main_mongo):
+    doc = activo(main_mongo)
+
+    primero = main_mongo.registrar_series_lote(lote(main_mongo, (0, 1), (0, 2), (1, 3)))
+    assert primero["aplicadas"] == [1, 2, 3]
+    assert primero["entrenamiento"]["ejercicios"][0]["completado"] is True
+    assert primero["entrenamiento"]["ejercicios"][1]["completado"] is False
+
+    # Reintento tras perder la respuesta, con una serie nueva al final
+    segundo = main_mongo.registrar_series_lote(lote(main_mongo, (0, 1), (0, 2), (1, 3), (1, 4)))
+    assert segundo["aplicadas"] == [4]
+    assert segundo["duplicadas"] == [1, 2, 3]
+
+    guardado = main_mongo.entrenamiento_activo_collection.find_one({"_id": doc["_id"]})
+    assert [len(ej["series_realizadas"]) for ej in guardado["ejercicios"]] == [2, 2]
+    assert [ej["completado"] for ej in guardado["ejercicios"]] == [True, True]
+    assert sorted(guardado["seqs_aplicados"]) == [1, 2, 3, 4]
+
+
+def test_indice_invalido_es_400(main_mongo):
+    from fastapi import HTTPException
+
+    activo(main_mongo)
+    with pytest.raises(HTTPException) as error:
+        main_mongo.registrar_series_lote(lote(main_mongo, (0, 1), (5, 2)))
+    assert error.value.status_code == 400
+
+
+class ColeccionConCarrera:
+    """Aplica los mismos seq "desde otra petición" justo antes de cada push"""
+
+    def __init__(self, coleccion, siempre: bool):
+        self._coleccion = coleccion
+        self._siempre = siempre
+
+    def __getattr__(self, nombre):
+        return getattr(self._coleccion, nombre)
+
+    def find_one_and_update(self, filtro, cambios, **kwargs):
+        if "seqs_aplicados" in filtro:
+            if self._siempre:
+                return None
+            seqs = filtro["seqs_aplicados"]["$nin"]
+            self._coleccion.update_one({"_id": filtro["_id"]}, {"$push": {
+                "ejercicios.0.series_realizadas": {"$each": [{"numero": 1}] * len(seqs)},
+                "seqs_aplicados": {"$each": seqs},
+            }})
+        return self._coleccion.find_one_and_update(filtro, cambios, **kwargs)
+
+
+def test_carrera_con_el_mismo_lote(main_mongo, monkeypatch):
+    doc = activo(main_mongo)
+    coleccion = main_mongo.entrenamiento_activo_collection
+    monkeypatch.setattr(main_mongo, "entrenamiento_activo_collection", ColeccionConCarrera(coleccion, siempre=False))
+
+    # La otra petición ganó: este reintento ve los seq aplicados y no los repite
+    resultado = main_mongo.registrar_series_lote(lote(main_mongo, (0, 1)))
+    assert resultado["aplicadas"] == []
+    assert resultado["duplicadas"] == [1]
+    assert len(coleccion.find_one({"_id": doc["_id"]})["ejercicios"][0]["series_realizadas"]) == 1
+
+
+def test_conflicto_persistente_es_409(main_mongo, monkeypatch):
+    from fastapi import HTTPException
+
+    activo(main_mongo)
+    coleccion = main_mongo.entrenamiento_activo_collection
+    monkeypatch.setattr(main_mongo, "entrenamiento_activo_collection", ColeccionConCarrera(coleccion, siempre=True))
+
+    with pytest.raises(HTTPException) as error:
+        main_mongo.registrar_series_lote(lote(main_mongo, (0, 1)))
+    assert error.value.status_code == 409
+    assert "seqs_aplicados" not in coleccion.find_one({})
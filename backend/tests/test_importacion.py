@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from importacion import CuerpoDemasiadoGrande, en_lotes, leer_csv, leer_filas, leer_ndjson, volcar_cuerpo
+
+CABECERA = "id,fecha,nombre,tipo,grupos_musculares,ejercicio,series,repeticiones,peso_kg\n"
+
+
+def test_csv_agrupa_filas_consecutivas():
+    texto = CABECERA + (
+        "a1,2025-01-01,Push,push,pecho;tríceps,Press banca,4,10;10;8,60;62.5\n"
+        "a1,2025-01-01,Push,push,pecho;tríceps,Fondos,3,12,ajustar\n"
+        ",2025-01-02,Pull,pull,espalda,Remo,3,10,50\n"
+        ",2025-01-02,Pull,pull,espalda,Jalón,3,10,45\n"
+        ",2025-01-02,Pierna,legs,piernas,Sentadilla,5,5,100\n"
+    )
+    filas = list(leer_csv(texto.splitlines()))
+
+    assert [linea for linea, _ in filas] == [2, 4, 6]
+    push, pull, pierna = [doc for _, doc in filas]
+    assert push["id"] == "a1"
+    assert push["grupos_musculares"] == ["pecho", "tríceps"]
+    assert push["ejercicios"][0] == {"nombre": "Press banca", "series": 4, "repeticiones": [10, 10, 8], "peso_kg": [60, 62.5]}
+    assert push["ejercicios"][1]["peso_kg"] == "ajustar"
+    # Sin id agrupa por fecha + nombre
+    assert "id" not in pull
+    assert [ej["nombre"] for ej in pull["ejercicios"]] == ["Remo", "Jalón"]
+    assert [ej["nombre"] for ej in pierna["ejercicios"]] == ["Sentadilla"]
+
+
+def test_csv_sin_columnas():
+    assert list(leer_csv(["fecha,nombre\n", "2025-01-01,Push\n"])) == [(1, "Faltan columnas: tipo, grupos_musculares, ejercicio, series, repeticiones, peso_kg")]
+
+
+def test_ndjson_reporta_errores_por_linea():
+    filas = list(leer_ndjson(['{"nombre": "A"}\n', "\n", "{roto\n", "[1, 2]\n"]))
+    assert filas[0] == (1, {"nombre": "A"})
+    assert filas[1][0] == 3 and filas[1][1].startswith("JSON inválido")
+    assert filas[2] == (4, "Se esperaba un objeto JSON")
+
+
+def test_formato_no_soportado_y_lotes():
+    with pytest.raises(ValueError, match="Formato no soportado"):
+        leer_filas([], "xml")
+    assert [len(lote) for lote in en_lotes(range(7), 3)] == [3, 3, 1]
+
+
+async def trozos(*partes: bytes):
+    for parte in partes:
+        yield parte
+
+
+def test_volcar_cuerpo_lee_lineas():
+    # BOM y una "ó" partida entre dos trozos
+    cuerpo = "﻿".encode() + '{"nombre": "Jalón"}\n{"nombre": "B"}\n'.encode()
+    corte = cuerpo.index("ó".encode()) + 1
+    with asyncio.run(volcar_cuerpo(trozos(cuerpo[:corte], cuerpo[corte:]), 1024)) as lineas:
+        assert [doc["nombre"] for _, doc in leer_filas(lineas, "ndjson")] == ["Jalón", "B"]
+
+
+def test_volcar_cuerpo_rechaza_tamano_y_codificacion():
+    with pytest.raises(CuerpoDemasiadoGrande):
+        asyncio.run(volcar_cuerpo(trozos(b"x" * 600, b"x" * 600), 1000))
+    with pytest.raises(UnicodeDecodeError):
+        asyncio.run(volcar_cuerpo(trozos(b'{"nombre": "\xff"}\n'), 1000))
+
+
+def entrenamiento(fecha: str, nombre: str, **extra) -> dict:
+    return {"fecha": fecha, "nombre": nombre, "tipo": "push", "grupos_musculares": ["pecho"],
+            "ejercicios": [{"nombre": "Press banca", "series": 3, "repeticiones": 10, "peso_kg": 60}], **extra}
+
+
+def test_importar_omite_existentes(main_mongo):
+    import json
+
+    main_mongo.guardar_entrenamiento(entrenamiento("2025-01-01", "Push", id="ya-estaba"))
+    main_mongo.guardar_entrenamiento(entrenamiento("2025-01-02", "Push"))
+    lineas = [json.dumps(doc) for doc in (
+        entrenamiento("2025-01-05", "Otro", id="ya-estaba"),  # mismo id
+        entrenamiento("2025-01-02", "Push"),                  # misma fecha y nombre
+        entrenamiento("2025-01-03", "Push", id="nuevo"),
+        entrenamiento("2025-01-03", "Push", id="nuevo"),      # repetido en el archivo
+        entrenamiento("2025-01-04", "Pierna"),
+        entrenamiento("2025-01-04", "Pierna"),
+    )]
+
+    resultado = main_mongo.importar_entrenamientos(lineas, "ndjson")
+
+    assert resultado["recibidos"] == 6
+    assert resultado["insertados"] == 2
+    assert resultado["omitidos_total"] == 4
+    assert [o["linea"] for o in resultado["omitidos"]] == [1, 2, 4, 6]
+    assert resultado["omitidos"][1]["clave"] == "2025-01-02 / Push"
+    assert main_mongo.collection.count_documents({}) == 4
+
+    # Reimportar el mismo archivo no inserta nada
+    assert main_mongo.importar_entrenamientos(lineas, "ndjson")["insertados"] == 0
@@ -0,0 +1,80 @@
+import base64
+import json
+
+import pytest
+from bson import ObjectId
+
+from paginacion import codificar_cursor, decodificar_cursor, filtro_despues, filtro_rango, proyeccion
+
+
+def test_cursor_ida_y_vuelta():
+    oid = ObjectId()
+    assert decodificar_cursor(codificar_cursor({"fecha": "2025-02-10", "_id": oid})) == ("2025-02-10", oid)
+    # Documentos viejos sin fecha
+    assert decodificar_cursor(codificar_cursor({"_id": oid})) == (None, oid)
+
+
+@pytest.mark.parametrize("cursor", [
+    "no-es-base64!",
+    base64.urlsafe_b64encode(b"{}").decode(),
+    base64.urlsafe_b64encode(b'["2025-02-10", "no-es-oid"]').decode(),
+])
+def test_cursor_invalido(cursor):
+    with pytest.raises(ValueError, match="Cursor inválido"):
+        decodificar_cursor(cursor)
+
+
+def test_filtro_despues_desempata_por_id():
+    oid = ObjectId()
+    assert filtro_despues(codificar_cursor({"fecha": "2025-02-10", "_id": oid})) == {"$or": [
+        {"fecha": {"$lt": "2025-02-10"}},
+        {"fecha": "2025-02-10", "_id": {"$lt": oid}},
+    ]}
+
+
+def test_filtro_rango_y_proyeccion():
+    assert filtro_rango() == {}
+    assert filtro_rango("2025-01-01", "2025-01-31") == {"fecha": {"$gte": "2025-01-01", "$lte": "2025-01-31"}}
+    assert proyeccion("nombre, tipo") == {"fecha": 1, "nombre": 1, "tipo": 1}
+    with pytest.raises(ValueError, match="Campos inválidos"):
+        proyeccion("nombre,$where")
+
+
+def pagina(main, **params) -> dict:
+    return json.loads(main.get_entrenamientos(**params).body)
+
+
+def test_paginas_sin_huecos_ni_repetidos(main_mongo):
+    # Varias fechas repetidas: el orden dentro de una fecha lo da _id
+    fechas = ["2025-01-01", "2025-01-02", "2025-01-02", "2025-01-02", "2025-01-03", "2025-01-03", "2025-01-04"]
+    main_mongo.collection.insert_many([{"fecha": f, "nombre": f"E{i}"} for i, f in enumerate(fechas)])
+    esperado = [str(d["_id"]) for d in main_mongo.collection.find().sort([("fecha", -1), ("_id", -1)])]
+
+    vistos, after = [], None
+    while True:
+        actual = pagina(main_mongo, limit=3, after=after, fields="nombre", incluir_total=True)
+        assert actual["total"] == len(fechas)
+        assert len(actual["entrenamientos"]) <= 3
+        vistos += [d["_id"] for d in actual["entrenamientos"]]
+        after = actual["siguiente"]
+        if not after:
+            break
+
+    assert vistos == esperado
+    assert set(actual["entrenamientos"][0]) == {"_id", "fecha", "nombre"}
+
+
+def test_limite_y_cursor_invalido(main_mongo):
+    from fastapi import HTTPException
+
+    from paginacion import LIMITE_MAXIMO
+
+    main_mongo.collection.insert_many([{"fecha": "2025-01-01"} for _ in range(LIMITE_MAXIMO + 1)])
+
+    actual = pagina(main_mongo, limit=10_000)
+    assert len(actual["entrenamientos"]) == LIMITE_MAXIMO
+    assert actual["siguiente"]
+    assert len(pagina(main_mongo, limit=0)["entrenamientos"]) == 1
+    with pytest.raises(HTTPException) as error:
+        main_mongo.get_entrenamientos(limit=5, after="basura")
+    assert error.value.status_code == 400
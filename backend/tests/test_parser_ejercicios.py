@@ -0,0 +1,38 @@
+import pytest
+
+from parser_ejercicios import CORPUS, UMBRAL_CONFIANZA, normalizar_nombre_ejercicio, parsear_ejercicio
+
+LOCALES = [c for c in CORPUS if c[1] is not None]
+AL_LLM = [c[0] for c in CORPUS if c[1] is None]
+
+
+@pytest.mark.parametrize("texto,nombre,pesos,reps", LOCALES, ids=[c[0] for c in LOCALES])
+def test_corpus_se_parsea_localmente(texto, nombre, pesos, reps):
+    r = parsear_ejercicio(texto)
+    assert r["confianza"] >= UMBRAL_CONFIANZA
+    assert r["nombre"] == nombre
+    assert [s["peso"] for s in r["series"]] == pesos
+    assert [s["repeticiones"] for s in r["series"]] == reps
+
+
+@pytest.mark.parametrize("texto", AL_LLM)
+def test_corpus_ambiguo_va_al_llm(texto):
+    assert parsear_ejercicio(texto)["confianza"] < UMBRAL_CONFIANZA
+
+
+def test_peso_sin_kg_seguido_de_reps():
+    # No son cuatro series de 80, 8, 8 y 6 kg
+    r = parsear_ejercicio("Press banca 80 8 8 6")
+    assert [(s["peso"], s["repeticiones"]) for s in r["series"]] == [(80, 8), (80, 8), (80, 6)]
+
+
+def test_pesos_descendentes_sin_kg_van_al_llm():
+    # Drop set: no son 50 y 30 reps con 100 kg
+    for texto in ("Press banca 100 50 30", "Sentadilla 120 60 40 30"):
+        assert parsear_ejercicio(texto)["confianza"] < UMBRAL_CONFIANZA, texto
+
+
+def test_nombre_usa_la_clave_mas_larga():
+    assert normalizar_nombre_ejercicio("Curl polea") == "Curl en polea"
+    assert normalizar_nombre_ejercicio("Polea al pecho") == "Jalón al pecho"
+    assert normalizar_nombre_ejercicio("Curl predicador") == "Curl predicador"
@@ -0,0 +1,71 @@
+import copy
+from datetime import datetime
+
+from rollup import aplicar_entrenamiento, clave_semana, contribucion, leer_semana, reconstruir_rollup
+
+PUSH = {
+    "fecha": "2025-02-12",
+    "tipo": "push",
+    "grupos_musculares": ["Pecho", "pecho", "Tríceps"],
+    "ejercicios": [
+        {"nombre": "Press banca", "series": 3, "repeticiones": [10, 8, 6], "peso_kg": [60, 65, 70]},
+        {"nombre": "Fondos", "series": 2, "repeticiones": 12, "peso_kg": "ajustar"},
+    ],
+}
+
+
+def test_clave_semana():
+    assert clave_semana("2025-02-12") == ("2025-W07", "2025-02-10")
+    assert clave_semana(datetime(2025, 2, 16, 23, 59)) == ("2025-W07", "2025-02-10")
+    # Semana ISO 1 de 2025 empieza en 2024
+    assert clave_semana("2024-12-30") == ("2025-W01", "2024-12-30")
+    assert clave_semana("ayer") is None
+    assert clave_semana(None) is None
+
+
+def test_contribucion():
+    clave, lunes, inc = contribucion(PUSH)
+    assert (clave, lunes) == ("2025-W07", "2025-02-10")
+    assert inc == {
+        "entrenamientos": 1,
+        "series": 5,
+        "ejercicios": 2,
+        # Tonelaje por serie: 60x10 + 65x8 + 70x6; "ajustar" no suma
+        "tonelaje": 1540.0,
+        "tipos.push": 1,
+        "grupos.pecho.entrenamientos": 1,
+        "grupos.pecho.series": 5,
+        "grupos.tríceps.entrenamientos": 1,
+        "grupos.tríceps.series": 5,
+    }
+    assert contribucion({"fecha": "sin fecha", "ejercicios": []}) is None
+
+
+def test_alta_y_baja_se_compensan(main_mongo):
+    coleccion = main_mongo.rollup_collection
+    otro = {"fecha": "2025-02-10", "tipo": "pull", "grupos_musculares": ["espalda"],
+            "ejercicios": [{"nombre": "Remo", "series": 4, "repeticiones": 10, "peso_kg": 50}]}
+
+    aplicar_entrenamiento(coleccion, PUSH, 1)
+    aplicar_entrenamiento(coleccion, otro, 1)
+    semana = leer_semana(coleccion, "2025-02-12")
+    assert (semana["entrenamientos"], semana["series"], semana["tonelaje"]) == (2, 9, 3540.0)
+    assert semana["tipos"] == {"push": 1, "pull": 1}
+
+    aplicar_entrenamiento(coleccion, PUSH, -1)
+    semana = leer_semana(coleccion, "2025-02-12")
+    assert (semana["entrenamientos"], semana["series"], semana["ejercicios"], semana["tonelaje"]) == (1, 4, 1, 2000.0)
+    # Tipos y grupos en cero no se devuelven
+    assert semana["tipos"] == {"pull": 1}
+    assert set(semana["grupos"]) == {"espalda"}
+
+
+def test_borrar_descuenta_y_reconstruir_coincide(main_mongo):
+    resultado = main_mongo.guardar_entrenamiento(copy.deepcopy(PUSH))
+    main_mongo.guardar_entrenamiento({**copy.deepcopy(PUSH), "fecha": "2025-02-13"})
+    main_mongo.borrar_entrenamiento({"_id": resultado.inserted_id})
+    incremental = leer_semana(main_mongo.rollup_collection, "2025-02-12")
+
+    assert reconstruir_rollup(main_mongo.rollup_collection.database) == {"entrenamientos": 1, "semanas": 1}
+    assert leer_semana(main_mongo.rollup_collection, "2025-02-12") == incremental
+    assert incremental["entrenamientos"] == 1
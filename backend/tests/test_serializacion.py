@@ -0,0 +1,42 @@
+import json
+from datetime import datetime, timezone
+
+import orjson
+import pytest
+from bson import ObjectId, Regex, Timestamp
+from bson.decimal128 import Decimal128
+from bson.json_util import dumps
+
+from serializacion import RespuestaMongo, a_json, codificar
+
+OID = ObjectId("65a1b2c3d4e5f60718293a4b")
+
+
+@pytest.mark.parametrize("valor", [
+    {"_id": OID, "fecha": "2025-01-01", "series": 4, "peso": 62.5, "activo": True, "notas": None},
+    {"creado": datetime(2025, 1, 2, 3, 4, 5), "con_milis": datetime(2025, 1, 2, 3, 4, 5, 678000)},
+    # Microsegundos sin milisegundos, antes de 1970 y con zona horaria
+    {"a": datetime(2025, 1, 2, 3, 4, 5, 999), "b": datetime(1969, 12, 31), "c": datetime(2025, 1, 2, tzinfo=timezone.utc)},
+    {"tonelaje": Decimal128("2150.5"), "nan": float("nan"), "inf": float("-inf")},
+    {"ejercicios": [{"nombre": "Press", "peso_kg": [60, 62.5, "ajustar"], "ids": [OID, None]}]},
+    {"raro": Regex("^press", "i"), "ts": Timestamp(1700000000, 1), "tupla": (1, 2)},
+    {1: "clave no string", "x": OID},
+    [OID, {"anidado": [[datetime(2025, 1, 1)]]}],
+    "texto",
+    7,
+])
+def test_a_json_igual_que_json_util(valor):
+    assert a_json(valor) == json.loads(dumps(valor))
+
+
+def test_a_json_copia_en_lugar_de_mutar():
+    doc = {"_id": OID, "ejercicios": [{"nombre": "Press"}]}
+    resultado = a_json(doc)
+    resultado["ejercicios"][0]["nombre"] = "otro"
+    assert doc == {"_id": OID, "ejercicios": [{"nombre": "Press"}]}
+
+
+def test_respuesta_mongo_como_serialize_doc():
+    doc = {"_id": OID, "tonelaje": Decimal128("10.5"), "grupos": {2: "x"}}
+    assert orjson.loads(codificar(doc)) == {"_id": str(OID), "tonelaje": "10.5", "grupos": {"2": "x"}}
+    assert json.loads(RespuestaMongo([doc]).body)[0]["_id"] == str(OID)
@@ -35,6 +35,15 @@ async function proxyRequest(request: NextRequest) {
 
     // Intentar devolver como JSON, si no como texto
     const contentType = res.headers.get('content-type') || '';
+
+    // Streams SSE: se reenvían sin bufferizar
+    if (contentType.includes('text/event-stream')) {
+      return new NextResponse(res.body, {
+        status: res.status,
+        headers: { 'Content-Type': contentType, 'Cache-Control': 'no-cache' },
+      });
+    }
+
     if (contentType.includes('application/json')) {
       const data = await res.json();
       return NextResponse.json(data, { status: res.status });
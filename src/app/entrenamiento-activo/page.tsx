@@ -1,15 +1,18 @@
 'use client';
 
 import Navbar from '@/components/Navbar';
-import { useEffect, useState } from 'react';
+import { useCallback, useEffect, useRef, useState } from 'react';
 import { useRouter } from 'next/navigation';
 import {
   fetchEntrenamientoActivo as apiFetchEntrenamientoActivo,
-  actualizarSerie as apiActualizarSerie,
+  registrarSeries as apiRegistrarSeries,
   completarEjercicioActivo as apiCompletarEjercicio,
   finalizarEntrenamientoActivo as apiFinalizarEntrenamiento,
   cancelarEntrenamientoActivo as apiCancelarEntrenamiento,
+  suscribirEntrenamientoActivo,
+  ApiError,
 } from '@/lib/api';
+import type { SerieLote } from '@/lib/api';
 import {
   Play,
   Pause,
@@ -67,6 +70,13 @@ export default function EntrenamientoActivoPage() {
   const [repsActuales, setRepsActuales] = useState(10);
   const [guardandoSerie, setGuardandoSerie] = useState(false);
   
+  // Series pendientes de sincronizar (sin señal); persisten en localStorage
+  const [pendientes, setPendientes] = useState<SerieLote[]>([]);
+  // Lote rechazado por el backend (4xx): no se reintenta, se avisa
+  const [errorSincronizacion, setErrorSincronizacion] = useState<string | null>(null);
+  // seq de las series registradas desde esta pestaña (ya están en el estado local)
+  const seqsPropios = useRef<Set<number>>(new Set());
+  
   // Timer
   const [tiempoInicio, setTiempoInicio] = useState<Date | null>(null);
   const [tiempoTranscurrido, setTiempoTranscurrido] = useState('00:00:00');
@@ -80,6 +90,96 @@ export default function EntrenamientoActivoPage() {
     cargarEntrenamiento();
   }, []);
 
+  const clavePendientes = (id: string) => `series-pendientes-${id}`;
+
+  const guardarPendientes = (id: string, series: SerieLote[]) => {
+    setPendientes(series);
+    if (series.length) {
+      localStorage.setItem(clavePendientes(id), JSON.stringify(series));
+    } else {
+      localStorage.removeItem(clavePendientes(id));
+    }
+  };
+
+  // Envía todas las series pendientes en una sola petición. Sin red (o con
+  // un 5xx) quedan en cola; reenviarlas es seguro porque el backend ignora los
+  // seq repetidos. Un 4xx no se arregla reintentando: se descarta el lote, se
+  // avisa y se recarga el estado del servidor
+  const sincronizar = useCallback(async (id: string, series: SerieLote[]) => {
+    if (!series.length) return;
+    try {
+      const result = await apiRegistrarSeries(series);
+      if (result.success) {
+        guardarPendientes(id, []);
+        setErrorSincronizacion(null);
+        setEntrenamiento(result.entrenamiento as unknown as EntrenamientoActivo);
+      }
+    } catch (error) {
+      if (error instanceof ApiError && error.status >= 400 && error.status < 500) {
+        console.error('Lote de series rechazado:', error);
+        guardarPendientes(id, []);
+        setErrorSincronizacion(
+          `No se guardaron ${series.length} serie${series.length > 1 ? 's' : ''}: ${error.message}`
+        );
+        try {
+          const data = await apiFetchEntrenamientoActivo();
+          setEntrenamiento(
+            data.activo && data.entrenamiento ? (data.entrenamiento as unknown as EntrenamientoActivo) : null
+          );
+        } catch {
+          // sin red: el próximo evento SSE trae el estado
+        }
+        return;
+      }
+      console.error('Sin conexión, series en cola:', error);
+      guardarPendientes(id, series);
+    }
+  }, []);
+
+  // Cambios hechos desde otros dispositivos llegan como deltas: sin polling
+  useEffect(() => {
+    return suscribirEntrenamientoActivo((evento, datos) => {
+      if (evento === 'cancelado' || evento === 'finalizado') {
+        setEntrenamiento(null);
+        return;
+      }
+      if (evento === 'estado' || evento === 'iniciado') {
+        const ent = (datos.entrenamiento ?? null) as EntrenamientoActivo | null;
+        if (ent) setEntrenamiento(ent);
+        return;
+      }
+      setEntrenamiento((actual) => {
+        if (!actual) return actual;
+        const ejercicios = actual.ejercicios.map((ej) => ({ ...ej, series_realizadas: [...ej.series_realizadas] }));
+        if (evento === 'serie_agregada') {
+          const i = datos.ejercicio_index as number;
+          ejercicios[i].series_realizadas.push(datos.serie as SerieRealizada);
+          ejercicios[i].completado = datos.completado as boolean;
+        } else if (evento === 'series_agregadas') {
+          for (const item of datos.series as SerieLote[]) {
+            if (seqsPropios.current.has(item.seq)) continue;
+            ejercicios[item.ejercicio_index].series_realizadas.push(item.serie);
+          }
+          for (const i of datos.completados as number[]) ejercicios[i].completado = true;
+        } else if (evento === 'ejercicio_completado') {
+          ejercicios[datos.ejercicio_index as number].completado = true;
+        } else if (evento === 'pesos_recalculados') {
+          (datos.pesos as (number | string)[]).forEach((peso, i) => {
+            if (ejercicios[i]) ejercicios[i].peso_sugerido = peso;
+          });
+        }
+        return { ...actual, ejercicios };
+      });
+    });
+  }, []);
+
+  useEffect(() => {
+    if (!entrenamiento || !pendientes.length) return;
+    const alVolverSenal = () => sincronizar(entrenamiento._id, pendientes);
+    window.addEventListener('online', alVolverSenal);
+    return () => window.removeEventListener('online', alVolverSenal);
+  }, [entrenamiento, pendientes, sincronizar]);
+
   useEffect(() => {
     if (tiempoInicio) {
       const interval = setInterval(() => {
@@ -106,6 +206,12 @@ export default function EntrenamientoActivoPage() {
         setEntrenamiento(ent);
         setTiempoInicio(new Date(ent.inicio));
         
+        // Series que quedaron sin sincronizar en una sesión anterior
+        const guardadas = localStorage.getItem(clavePendientes(ent._id));
+        if (guardadas) {
+          sincronizar(ent._id, JSON.parse(guardadas) as SerieLote[]);
+        }
+        
         // Establecer peso inicial sugerido
         const ejercicio = ent.ejercicios[0];
         if (ejercicio) {
@@ -171,42 +277,34 @@ export default function EntrenamientoActivoPage() {
     try {
       const ejercicio = entrenamiento.ejercicios[ejercicioActual];
       const numeroSerie = ejercicio.series_realizadas.length + 1;
+      const serie = {
+        numero: numeroSerie,
+        repeticiones: repsActuales,
+        peso_kg: pesoActual,
+        completada: true
+      };
       
-      const result = await apiActualizarSerie({
-        ejercicio_index: ejercicioActual,
-        serie: {
-          numero: numeroSerie,
-          repeticiones: repsActuales,
-          peso_kg: pesoActual,
-          completada: true
-        }
-      });
+      // seq único y creciente por serie registrada en este dispositivo
+      const seq = Math.max(Date.now(), ...pendientes.map((p) => p.seq + 1));
+      seqsPropios.current.add(seq);
       
-      if (result.success) {
-        // Actualizar estado local
-        const nuevoEntrenamiento = { ...entrenamiento };
-        nuevoEntrenamiento.ejercicios[ejercicioActual].series_realizadas.push({
-          numero: numeroSerie,
-          repeticiones: repsActuales,
-          peso_kg: pesoActual,
-          completada: true
-        });
+      // Actualizar estado local sin esperar a la red
+      const nuevoEntrenamiento = { ...entrenamiento };
+      nuevoEntrenamiento.ejercicios[ejercicioActual].series_realizadas.push(serie);
+      
+      // Marcar como completado si terminó todas las series
+      if (nuevoEntrenamiento.ejercicios[ejercicioActual].series_realizadas.length >= 
+          nuevoEntrenamiento.ejercicios[ejercicioActual].series_planificadas) {
+        nuevoEntrenamiento.ejercicios[ejercicioActual].completado = true;
         
-        // Marcar como completado si terminó todas las series
-        if (nuevoEntrenamiento.ejercicios[ejercicioActual].series_realizadas.length >= 
-            nuevoEntrenamiento.ejercicios[ejercicioActual].series_planificadas) {
-          nuevoEntrenamiento.ejercicios[ejercicioActual].completado = true;
-          
-          // Pasar al siguiente ejercicio si hay
-          if (ejercicioActual < nuevoEntrenamiento.ejercicios.length - 1) {
-            cambiarEjercicio(ejercicioActual + 1);
-          }
+        // Pasar al siguiente ejercicio si hay
+        if (ejercicioActual < nuevoEntrenamiento.ejercicios.length - 1) {
+          cambiarEjercicio(ejercicioActual + 1);
         }
-        
-        setEntrenamiento(nuevoEntrenamiento);
       }
-    } catch (error) {
-      console.error('Error guardando serie:', error);
+      
+      setEntrenamiento(nuevoEntrenamiento);
+      await sincronizar(entrenamiento._id, [...pendientes, { ejercicio_index: ejercicioActual, seq, serie }]);
     } finally {
       setGuardandoSerie(false);
     }
@@ -478,6 +576,14 @@ export default function EntrenamientoActivoPage() {
                   Completar Serie {seriesCompletadas + 1}
                 </button>
               )}
+              {pendientes.length > 0 && (
+                <p className="mt-2 text-center text-xs text-yellow-400">
+                  {pendientes.length} serie{pendientes.length > 1 ? 's' : ''} sin sincronizar · se enviarán al recuperar la señal
+                </p>
+              )}
+              {errorSincronizacion && (
+                <p className="mt-2 text-center text-xs text-red-400">{errorSincronizacion}</p>
+              )}
 
               {/* Series completadas */}
               {ejercicioSeleccionado.series_realizadas.length > 0 && (
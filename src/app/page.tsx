@@ -5,7 +5,7 @@ import Navbar from '@/components/Navbar';
 import WorkoutCard from '@/components/WorkoutCard';
 import LoadingScreen from '@/components/ui/LoadingScreen';
 import ErrorScreen from '@/components/ui/ErrorScreen';
-import { fetchEntrenamientos, fetchEstadisticas, fetchResumenInteligente, fetchComparativaSemanal } from '@/lib/api';
+import { fetchDashboard, fetchResumenInteligente } from '@/lib/api';
 import type { Entrenamiento, Estadisticas, ResumenAI, ComparativaSemanal } from '@/types';
 import { 
   ArrowRight, Sparkles, Dumbbell, Target, 
@@ -26,21 +26,14 @@ export default function Home() {
     setLoading(true);
     setError(null);
     try {
-      const [entrs, stats] = await Promise.all([
-        fetchEntrenamientos(),
-        fetchEstadisticas(),
-      ]);
-      setEntrenamientos(entrs);
-      setEstadisticas(stats);
+      // Widgets en una sola petición al backend
+      const dashboard = await fetchDashboard(['estadisticas', 'recientes', 'comparativa']);
+      setEntrenamientos(dashboard.recientes || []);
+      setEstadisticas(dashboard.estadisticas || null);
+      setComparativa(dashboard.comparativa || null);
       
-      // Cargar resumen AI y comparativa en paralelo (no-blocking)
-      Promise.all([
-        fetchResumenInteligente(),
-        fetchComparativaSemanal()
-      ]).then(([resumen, comp]) => {
-        setResumenAI(resumen);
-        setComparativa(comp);
-      }).catch(console.error);
+      // Cargar resumen AI en segundo plano (no-blocking)
+      fetchResumenInteligente().then(setResumenAI).catch(console.error);
       
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Error al cargar datos');
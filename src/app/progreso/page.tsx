@@ -4,11 +4,7 @@ import { useState, useEffect } from "react";
 import Navbar from "@/components/Navbar";
 import LoadingScreen from "@/components/ui/LoadingScreen";
 import {
-  fetchVolumenSemanal,
-  fetchProgresoGrupos,
-  fetchEjerciciosFrecuentes,
-  fetchOneRm,
-  fetchComparativaSemanal,
+  fetchDashboard,
   fetchProgresoEjercicio
 } from "@/lib/api";
 import type {
@@ -66,23 +62,18 @@ export default function ProgresoPage() {
 
   async function cargarDatos() {
     try {
-      const [volumenData, gruposData, frecuentesData, oneRmDataRes, compData] = await Promise.all([
-        fetchVolumenSemanal(),
-        fetchProgresoGrupos(),
-        fetchEjerciciosFrecuentes(),
-        fetchOneRm(),
-        fetchComparativaSemanal()
-      ]);
-
-      setVolumenSemanal(volumenData.volumen_semanal || []);
-      setPorGrupo(gruposData.por_grupo || {});
-      setEjerciciosFrecuentes(frecuentesData.ejercicios || []);
-      setOneRmData(oneRmDataRes.estimaciones || []);
-      setComparativa(compData);
+      const dashboard = await fetchDashboard(['volumen', 'grupos', 'ejercicios_frecuentes', '1rm', 'comparativa']);
+      const frecuentes = dashboard.ejercicios_frecuentes?.ejercicios || [];
+
+      setVolumenSemanal(dashboard.volumen?.volumen_semanal || []);
+      setPorGrupo(dashboard.grupos?.por_grupo || {});
+      setEjerciciosFrecuentes(frecuentes);
+      setOneRmData(dashboard['1rm']?.estimaciones || []);
+      setComparativa(dashboard.comparativa || null);
 
       // Seleccionar primer ejercicio por defecto
-      if (frecuentesData.ejercicios?.length > 0) {
-        setEjercicioSeleccionado(frecuentesData.ejercicios[0].nombre);
+      if (frecuentes.length > 0) {
+        setEjercicioSeleccionado(frecuentes[0].nombre);
       }
     } catch (error) {
       console.error("Error cargando datos:", error);
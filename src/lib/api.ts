@@ -17,7 +17,7 @@ import type {
 // En desarrollo local, se puede usar NEXT_PUBLIC_API_URL para apuntar al backend directamente.
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || '';
 
-class ApiError extends Error {
+export class ApiError extends Error {
   status: number;
   constructor(message: string, status: number) {
     super(message);
@@ -124,6 +124,50 @@ export async function actualizarSerie(data: {
   });
 }
 
+export interface SerieLote {
+  ejercicio_index: number;
+  seq: number;
+  serie: { numero: number; repeticiones: number; peso_kg: number; completada: boolean };
+}
+
+/** Registra varias series en una sola petición; los seq ya aplicados se ignoran */
+export async function registrarSeries(series: SerieLote[]): Promise<{
+  success: boolean;
+  aplicadas: number[];
+  duplicadas: number[];
+  entrenamiento: Record<string, unknown>;
+}> {
+  return apiFetch('/api/entrenamiento-activo/series', {
+    method: 'POST',
+    body: JSON.stringify({ series }),
+  });
+}
+
+/**
+ * Se suscribe a los cambios del entrenamiento activo (SSE). Recibe primero
+ * `estado` con el documento completo y luego solo deltas. Devuelve la función
+ * para cerrar la suscripción.
+ */
+export function suscribirEntrenamientoActivo(
+  onEvento: (evento: string, datos: Record<string, unknown>) => void
+): () => void {
+  const fuente = new EventSource(`${API_BASE_URL}/api/entrenamiento-activo/eventos`);
+  const eventos = [
+    'estado',
+    'iniciado',
+    'serie_agregada',
+    'series_agregadas',
+    'ejercicio_completado',
+    'pesos_recalculados',
+    'finalizado',
+    'cancelado',
+  ];
+  for (const evento of eventos) {
+    fuente.addEventListener(evento, (e) => onEvento(evento, JSON.parse((e as MessageEvent).data)));
+  }
+  return () => fuente.close();
+}
+
 export async function completarEjercicioActivo(
   index: number
 ): Promise<{ success: boolean }> {
@@ -191,6 +235,29 @@ export async function fetchEjerciciosFrecuentes(
   return apiFetch(`/api/progreso/ejercicios-frecuentes${query}`);
 }
 
+// ---- Dashboard ----
+
+export interface Dashboard {
+  estadisticas?: Estadisticas;
+  recientes?: Entrenamiento[];
+  volumen?: { volumen_semanal: VolumenSemanal[] };
+  grupos?: { por_grupo: Record<string, { entrenamientos: number; series: number }> };
+  ejercicios_frecuentes?: { ejercicios: EjercicioFrecuente[]; total: number };
+  '1rm'?: { estimaciones: OneRmEstimacion[] };
+  comparativa?: ComparativaSemanal;
+  perfil?: PerfilGamificacion;
+  tiempos_ms: Record<string, number>;
+  errores?: Record<string, string>;
+}
+
+export type SeccionDashboard = Exclude<keyof Dashboard, 'tiempos_ms' | 'errores'>;
+
+/** Varios widgets en una sola petición; sin secciones devuelve todos */
+export async function fetchDashboard(secciones?: SeccionDashboard[]): Promise<Dashboard> {
+  const query = secciones?.length ? `?secciones=${secciones.join(',')}` : '';
+  return apiFetch<Dashboard>(`/api/dashboard${query}`);
+}
+
 // ---- Métricas avanzadas ----
 
 export async function fetchOneRm(): Promise<{